@@ -1,4 +1,6 @@
 import os
+import json
+import hashlib
 import traceback
 import numpy as np
 
@@ -14,46 +16,141 @@ MODEL_PATHS = {
     "txgemma_predict": os.path.join(MODELS_DIR, "txgemma-2b-predict"),
 }
 
+# Prompts scored per forward pass by compute_choice_probabilities_batch (cohort triage).
+LOGPROB_BATCH_SIZE = int(os.environ.get("LOGPROB_BATCH_SIZE", "16"))
+
+# MedASR chunking: 20 s windows with a 2 s overlap, batched for the forward pass.
+ASR_SAMPLE_RATE = 16000
+ASR_CHUNK_S = 20
+ASR_STRIDE_S = 2
+ASR_BATCH_SIZE = int(os.environ.get("MEDASR_BATCH_SIZE", "8"))
+ASR_FRAME_SHIFT_S = 0.01  # fbank frame shift (10 ms)
+ASR_FRAME_LENGTH_S = 0.025  # fbank window (25 ms)
+ASR_WORKERS = int(os.environ.get("MEDASR_WORKERS", "1"))  # >1 fans chunks out to a process pool (CPU only)
+ASR_VAD = os.environ.get("MEDASR_VAD", "True") == "True"  # send only detected speech regions to the model
+
+# MedASR fallback stages in preference order; the working one is probed once and persisted.
+# "onnx" is the manual-feature path run through onnxruntime when an exported graph exists.
+ASR_STAGES = ("onnx", "pipeline", "direct", "manual")
+ASR_ONNX = os.environ.get("MEDASR_ONNX", "True") == "True"
+ASR_CAPABILITIES_PATH = os.environ.get(
+    "MEDASR_CAPABILITIES_PATH", os.path.join(BASE_DIR, "data", "cache", "asr_capabilities.json")
+)
+
 class ModelRegistry:
     _model_cache = {}
     _tokenizer_cache = {}
+    _asr_stage_cache = {}
 
     # ==================================================================
     # CTC Decoding Helper
     # ==================================================================
 
     @staticmethod
-    def _decode_ctc_greedy(processor, logits):
+    def _ctc_collapse(logits, blank_id, output_lengths=None):
         """
-        Manually implement greedy CTC decoding:
-        1. Argmax logits
-        2. Remove adjacent duplicates
-        3. remove blank token (id 0 or pad_token_id)
-        4. Decode
+        Vectorised greedy CTC collapse over a whole batch.
+        Argmax, drop adjacent repeats, drop blanks and padded frames with
+        tensor masks. Returns [(token_ids, frame_indices), ...] per row, where
+        frame_indices are the logit frames at which each token was emitted.
         """
         import torch
         predicted_ids = torch.argmax(logits, dim=-1)
-        
+        batch, frames = predicted_ids.shape
+
+        prev_ids = torch.full_like(predicted_ids, -1)
+        prev_ids[:, 1:] = predicted_ids[:, :-1]
+        keep = (predicted_ids != prev_ids) & (predicted_ids != blank_id)
+        if output_lengths is not None:
+            lengths = torch.as_tensor(output_lengths, device=predicted_ids.device)
+            keep &= torch.arange(frames, device=predicted_ids.device)[None, :] < lengths[:, None]
+
+        rows, frame_idx = keep.nonzero(as_tuple=True)
+        token_ids = predicted_ids[rows, frame_idx].tolist()
+        frame_idx = frame_idx.tolist()
+        counts = keep.sum(dim=1).tolist()
+
+        results = []
+        offset = 0
+        for n in counts:
+            results.append((token_ids[offset:offset + n], frame_idx[offset:offset + n]))
+            offset += n
+        return results
+
+    @staticmethod
+    def _ctc_word_spans(tokenizer, token_ids, token_times, frame_seconds):
+        """
+        Group emitted tokens into words ("▁" prefix or "|" delimiter).
+        `token_times` are absolute emission times in seconds; a word ends one
+        logit frame after its last token.
+        """
+        special = set(tokenizer.all_special_tokens) | {"<epsilon>"}
+        tokens = tokenizer.convert_ids_to_tokens(token_ids)
+
+        words = []
+        current, first_time, last_time = [], None, None
+
+        def flush():
+            if current:
+                text = tokenizer.convert_tokens_to_string(current).strip()
+                if text:
+                    words.append({
+                        "text": text,
+                        "start": round(first_time, 2),
+                        "end": round(last_time + frame_seconds, 2),
+                    })
+
+        for token, time_s in zip(tokens, token_times):
+            if token in special:
+                continue
+            if token == "|":
+                flush()
+                current, first_time = [], None
+                continue
+            if token.startswith("▁") and current:
+                flush()
+                current, first_time = [], None
+            if first_time is None:
+                first_time = time_s
+            current.append(token)
+            last_time = time_s
+        flush()
+        return words
+
+    @staticmethod
+    def _ctc_blank_id(processor):
         blank_id = processor.tokenizer.pad_token_id
-        if blank_id is None:
-            blank_id = 0
-
-        decoded_sequences = []
-        for sequence in predicted_ids:
-            unique_ids = []
-            prev_id = -1
-            for t_id in sequence:
-                t_id = t_id.item()
-                if t_id != prev_id:
-                    unique_ids.append(t_id)
-                    prev_id = t_id
-            
-            filtered_ids = [tid for tid in unique_ids if tid != blank_id]
-            text = processor.decode(filtered_ids, skip_special_tokens=True)
-            text = text.replace("<epsilon>", "").replace("<s>", "").replace("</s>", "").strip()
-            decoded_sequences.append(text)
-            
-        return decoded_sequences[0] if decoded_sequences else ""
+        return 0 if blank_id is None else blank_id
+
+    @staticmethod
+    def _clean_ctc_text(text):
+        return text.replace("<epsilon>", "").replace("<s>", "").replace("</s>", "").strip()
+
+    @staticmethod
+    def _decode_ctc_batch(processor, logits, output_lengths=None, frame_seconds=None, offsets=None):
+        """
+        Greedy CTC decoding of a whole batch.
+        Returns one {"text", "words"} dict per row. When `frame_seconds` (the
+        duration of one logit frame) is given, "words" carries start/end
+        times in seconds, shifted by the row's entry in `offsets`.
+        """
+        decoded = []
+        collapsed = ModelRegistry._ctc_collapse(logits, ModelRegistry._ctc_blank_id(processor), output_lengths)
+        for row, (token_ids, frame_idx) in enumerate(collapsed):
+            text = ModelRegistry._clean_ctc_text(processor.decode(token_ids, skip_special_tokens=True))
+            words = []
+            if frame_seconds is not None and token_ids:
+                offset = offsets[row] if offsets is not None else 0.0
+                token_times = [offset + f * frame_seconds for f in frame_idx]
+                words = ModelRegistry._ctc_word_spans(processor.tokenizer, token_ids, token_times, frame_seconds)
+            decoded.append({"text": text, "words": words})
+        return decoded
+
+    @staticmethod
+    def _decode_ctc_greedy(processor, logits):
+        """Greedy CTC decode; returns the text of the first sequence."""
+        decoded = ModelRegistry._decode_ctc_batch(processor, logits)
+        return decoded[0]["text"] if decoded else ""
 
     # ==================================================================
     # Model Path / Availability
@@ -68,6 +165,25 @@ class ModelRegistry:
         path = MODEL_PATHS.get(role)
         return path and os.path.exists(path)
 
+    @staticmethod
+    def get_model_revision(role):
+        """
+        Cheap identifier of the weights behind `role`: path plus the name,
+        size and mtime of its top-level files. Changes whenever the model is
+        re-downloaded or replaced; "unavailable" when it is missing.
+        """
+        path = MODEL_PATHS.get(role)
+        if not path or not os.path.exists(path):
+            return "unavailable"
+        if os.path.isdir(path):
+            entries = sorted(
+                (entry.name, entry.stat().st_size, int(entry.stat().st_mtime))
+                for entry in os.scandir(path) if entry.is_file()
+            )
+        else:
+            entries = [(os.path.basename(path), os.path.getsize(path), int(os.path.getmtime(path)))]
+        return f"{path}:{hashlib.sha1(repr(entries).encode()).hexdigest()[:12]}"
+
     # ==================================================================
     # General Inference (MedGemma, Gemma, TxGemma, etc.)
     # ==================================================================
@@ -166,6 +282,32 @@ class ModelRegistry:
     # Choice Probabilities (MedGemma logprobs)
     # ==================================================================
 
+    @staticmethod
+    def _get_causal_lm(path):
+        """Cached (model, tokenizer, device) for a local causal LM directory."""
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        torch_dtype = torch.float16 if device == "cuda" else torch.float32
+
+        if path in ModelRegistry._model_cache:
+            model = ModelRegistry._model_cache[path]
+            tokenizer = ModelRegistry._tokenizer_cache[path]
+        else:
+            print(f"Loading model for logprobs from {path}...")
+            tokenizer = AutoTokenizer.from_pretrained(path)
+            model = AutoModelForCausalLM.from_pretrained(
+                path,
+                torch_dtype=torch_dtype,
+                device_map=device,
+                low_cpu_mem_usage=True,
+            )
+            model.eval()
+            ModelRegistry._model_cache[path] = model
+            ModelRegistry._tokenizer_cache[path] = tokenizer
+        return model, tokenizer, device
+
     @staticmethod
     def compute_choice_probabilities(role, prompt, choices):
         """
@@ -180,28 +322,9 @@ class ModelRegistry:
         try:
             if os.path.isdir(path):
                 import torch
-                from transformers import AutoModelForCausalLM, AutoTokenizer
                 import torch.nn.functional as F
 
-                device = "cuda" if torch.cuda.is_available() else "cpu"
-                torch_dtype = torch.float16 if device == "cuda" else torch.float32
-
-                if path in ModelRegistry._model_cache:
-                    model = ModelRegistry._model_cache[path]
-                    tokenizer = ModelRegistry._tokenizer_cache[path]
-                else:
-                    print(f"Loading model for logprobs from {path}...")
-                    tokenizer = AutoTokenizer.from_pretrained(path)
-                    model = AutoModelForCausalLM.from_pretrained(
-                        path,
-                        torch_dtype=torch_dtype,
-                        device_map=device,
-                        low_cpu_mem_usage=True,
-                    )
-                    model.eval()
-                    ModelRegistry._model_cache[path] = model
-                    ModelRegistry._tokenizer_cache[path] = tokenizer
-
+                model, tokenizer, device = ModelRegistry._get_causal_lm(path)
                 prompt_inputs = tokenizer(prompt, return_tensors="pt").to(device)
                 
                 choice_scores = []
@@ -230,13 +353,105 @@ class ModelRegistry:
 
         return {c: 1.0/len(choices) for c in choices}
 
+    @staticmethod
+    def compute_choice_probabilities_batch(role, prompts, choices, batch_size=LOGPROB_BATCH_SIZE):
+        """
+        Batched `compute_choice_probabilities`: `choices[i]` are the options
+        for `prompts[i]`. Prompts are sorted by length and left-padded so each
+        forward pass scores `batch_size` prompts at once.
+        Returns a list of {choice: probability} dicts in prompt order.
+        """
+        uniform = [{c: 1.0/len(options) for c in options} for options in choices]
+        path = ModelRegistry.get_model_path(role)
+        if not prompts or not path or not os.path.isdir(path):
+            return uniform
+
+        try:
+            import torch
+            import torch.nn.functional as F
+
+            model, tokenizer, device = ModelRegistry._get_causal_lm(path)
+            first_token = {}
+            for options in choices:
+                for choice in options:
+                    if choice not in first_token:
+                        ids = tokenizer.encode(choice, add_special_tokens=False)
+                        first_token[choice] = ids[0] if ids else None
+
+            padding_side, pad_token = tokenizer.padding_side, tokenizer.pad_token
+            tokenizer.padding_side = "left"
+            if tokenizer.pad_token is None:
+                tokenizer.pad_token = tokenizer.eos_token
+
+            results = list(uniform)
+            order = sorted(range(len(prompts)), key=lambda i: len(prompts[i]))
+            try:
+                for start in range(0, len(order), batch_size):
+                    rows = order[start:start + batch_size]
+                    inputs = tokenizer([prompts[i] for i in rows], return_tensors="pt", padding=True).to(device)
+                    # Left padding: positions must start at 0 on each row's first real token.
+                    position_ids = (inputs["attention_mask"].cumsum(-1) - 1).clamp(min=0)
+                    with torch.no_grad():
+                        next_token_logits = model(**inputs, position_ids=position_ids).logits[:, -1, :].float().cpu()
+
+                    for row, i in enumerate(rows):
+                        scores = torch.tensor([
+                            next_token_logits[row, first_token[c]].item()
+                            if first_token[c] is not None else -float('inf')
+                            for c in choices[i]
+                        ])
+                        probs = F.softmax(scores, dim=0).tolist()
+                        results[i] = {choice: round(p, 4) for choice, p in zip(choices[i], probs)}
+            finally:
+                tokenizer.padding_side, tokenizer.pad_token = padding_side, pad_token
+            return results
+
+        except Exception as e:
+            print(f"Error computing batched probabilities: {e}")
+            return uniform
+
     # ==================================================================
     # MedASR Audio Transcription
     # ==================================================================
 
     @staticmethod
     def _load_audio(audio_path, target_sr=16000):
-        """Load audio file to float32 numpy array at target sample rate."""
+        """
+        Load audio file to float32 numpy array at target sample rate.
+        Decoded PCM is cached by content hash as a memory-mapped .npy, so
+        repeat transcriptions of the same recording skip decoding entirely.
+        The returned array is then a read-only memory map: copy it before
+        handing it to anything that may modify its input in place.
+        """
+        from utils import audio_cache
+
+        try:
+            cached = audio_cache.get_cached_pcm(audio_path, target_sr)
+            if cached is not None:
+                print(f"[MedASR] Audio loaded from PCM cache: shape={cached.shape}")
+                return cached
+        except Exception as e:
+            print(f"[MedASR] PCM cache lookup failed: {e}")
+
+        speech = ModelRegistry._decode_audio(audio_path, target_sr)
+        try:
+            return audio_cache.store_pcm(audio_path, speech, target_sr)
+        except Exception as e:
+            print(f"[MedASR] Could not write PCM cache: {e}")
+            return speech
+
+    @staticmethod
+    def _decode_audio(audio_path, target_sr=16000):
+        """Decode with an ffmpeg pipe, falling back to librosa, pydub, then soundfile."""
+        from utils import audio_cache
+
+        try:
+            speech = audio_cache.decode_with_ffmpeg(audio_path, target_sr)
+            print(f"[MedASR] Audio loaded with ffmpeg: shape={speech.shape}")
+            return speech
+        except Exception as e:
+            print(f"[MedASR] ffmpeg failed: {e}")
+
         try:
             import librosa
             speech, _ = librosa.load(audio_path, sr=target_sr, mono=True)
@@ -281,17 +496,74 @@ class ModelRegistry:
         raise RuntimeError(f"Could not load audio from {audio_path} with any backend.")
 
     @staticmethod
-    def _medasr_try_pipeline(model_path, speech, device):
+    def _get_ctc_model(model_path, device):
+        """Load (or reuse) the CTC model and processor for `model_path`."""
+        key = (model_path, "ctc", device)
+        if key in ModelRegistry._model_cache:
+            return ModelRegistry._model_cache[key], ModelRegistry._tokenizer_cache[key]
+        from transformers import AutoModelForCTC, AutoProcessor
+        print(f"[MedASR] Loading CTC model from {model_path}...")
+        processor = AutoProcessor.from_pretrained(model_path)
+        model = AutoModelForCTC.from_pretrained(model_path).to(device)
+        model.eval()
+        ModelRegistry._model_cache[key] = model
+        ModelRegistry._tokenizer_cache[key] = processor
+        return model, processor
+
+    @staticmethod
+    def _medasr_onnx_path(model_path):
+        """Exported graph under <model>/onnx (int8 preferred), or None."""
+        onnx_dir = os.path.join(model_path, "onnx")
+        for name in ("model.int8.onnx", "model.onnx"):
+            candidate = os.path.join(onnx_dir, name)
+            if os.path.exists(candidate):
+                return candidate
+        return None
+
+    @staticmethod
+    def _medasr_default_backend(model_path, device):
+        """'onnx' when an exported graph exists and we run on CPU, otherwise 'torch'."""
+        if ASR_ONNX and device == "cpu" and ModelRegistry._medasr_onnx_path(model_path):
+            return "onnx"
+        return "torch"
+
+    @staticmethod
+    def _get_asr_encoder(model_path, device, backend="torch", threads=None):
+        """
+        Model used for the manual-feature forward pass.
+        backend="onnx" returns an onnxruntime (CPU) session wrapped to look
+        like the torch model's forward; the processor always comes from HF.
+        """
+        if backend != "onnx":
+            return ModelRegistry._get_ctc_model(model_path, device)
+
+        onnx_path = ModelRegistry._medasr_onnx_path(model_path)
+        if not ASR_ONNX or onnx_path is None:
+            raise RuntimeError("No exported MedASR ONNX graph (run scripts/export_medasr_onnx.py)")
+        key = (onnx_path, "onnx", threads)
+        if key not in ModelRegistry._model_cache:
+            from transformers import AutoProcessor
+            print(f"[MedASR] Loading ONNX graph from {onnx_path}...")
+            ModelRegistry._model_cache[key] = _OnnxCTCEncoder(onnx_path, threads=threads)
+            ModelRegistry._tokenizer_cache[key] = AutoProcessor.from_pretrained(model_path)
+        return ModelRegistry._model_cache[key], ModelRegistry._tokenizer_cache[key]
+
+    @staticmethod
+    def _medasr_try_pipeline(model_path, speech, device, raise_errors=False):
         """Stage 1: HuggingFace pipeline."""
         try:
             from transformers import pipeline
             print("[MedASR] Stage 1: Trying pipeline approach...")
-            transcriber = pipeline(
-                "automatic-speech-recognition",
-                model=model_path,
-                device=device,
-                chunk_length_s=20,
-            )
+            key = (model_path, "pipeline", device)
+            transcriber = ModelRegistry._model_cache.get(key)
+            if transcriber is None:
+                transcriber = pipeline(
+                    "automatic-speech-recognition",
+                    model=model_path,
+                    device=device,
+                    chunk_length_s=20,
+                )
+                ModelRegistry._model_cache[key] = transcriber
             result = transcriber(
                 {"raw": speech, "sampling_rate": 16000},
                 stride_length_s=2,
@@ -303,20 +575,19 @@ class ModelRegistry:
             print("[MedASR] Pipeline returned empty text.")
             return None
         except Exception as e:
+            if raise_errors:
+                raise
             print(f"[MedASR] Pipeline failed: {e}")
             traceback.print_exc()
             return None
 
     @staticmethod
-    def _medasr_try_direct(model_path, speech, device):
+    def _medasr_try_direct(model_path, speech, device, raise_errors=False):
         """Stage 2: Direct model inference."""
         try:
-            from transformers import AutoModelForCTC, AutoProcessor
             import torch
             print("[MedASR] Stage 2: Trying direct inference...")
-            processor = AutoProcessor.from_pretrained(model_path)
-            model = AutoModelForCTC.from_pretrained(model_path).to(device)
-            model.eval()
+            model, processor = ModelRegistry._get_ctc_model(model_path, device)
             inputs = processor(speech, sampling_rate=16000, return_tensors="pt", padding=True)
             inputs = inputs.to(device)
             with torch.no_grad():
@@ -333,72 +604,406 @@ class ModelRegistry:
             print("[MedASR] Direct inference returned empty text.")
             return None
         except Exception as e:
+            if raise_errors:
+                raise
             print(f"[MedASR] Direct inference failed: {e}")
             traceback.print_exc()
             return None
 
     @staticmethod
-    def _medasr_try_manual_features(model_path, speech, device):
-        """Stage 3: Bypass LasrFeatureExtractor entirely."""
+    def _medasr_chunk_spans(total_samples, chunk_samples, stride_samples):
+        """Return (start, end) sample offsets of the overlapping ASR chunks."""
+        if total_samples <= chunk_samples:
+            return [(0, total_samples)]
+        step = chunk_samples - stride_samples
+        spans = []
+        start = 0
+        while start < total_samples:
+            end = min(start + chunk_samples, total_samples)
+            spans.append((start, end))
+            if end >= total_samples:
+                break
+            start += step
+        return spans
+
+    @staticmethod
+    def _medasr_fbank(chunk):
+        """Kaldi fbank (128 mel, 25 ms / 10 ms) with per-utterance mean/std normalisation."""
+        import torch
+        import torchaudio
+        # Copy: the recording may be a read-only memory map from the PCM cache.
+        waveform = torch.from_numpy(np.array(chunk, dtype=np.float32))
+        if waveform.dim() == 1:
+            waveform = waveform.unsqueeze(0)
+        features = torchaudio.compliance.kaldi.fbank(
+            waveform, num_mel_bins=128, sample_frequency=ASR_SAMPLE_RATE,
+            frame_length=ASR_FRAME_LENGTH_S * 1000, frame_shift=ASR_FRAME_SHIFT_S * 1000,
+        )
+        features = features - features.mean(dim=0, keepdim=True)
+        features = features / (features.std(dim=0, keepdim=True) + 1e-6)
+        return features
+
+    @staticmethod
+    def _medasr_features(speech, block_s=60):
+        """
+        Kaldi fbank over the whole recording, computed once.
+        The waveform is processed in `block_s` blocks (overlapping by one
+        window) into a preallocated tensor; fbank frames are independent, so
+        this equals a single pass while bounding temporary memory. Mean/std
+        normalisation uses whole-recording statistics, so features at chunk
+        edges match those in the middle.
+        """
+        import torch
+        import torchaudio
+
+        win = int(ASR_SAMPLE_RATE * ASR_FRAME_LENGTH_S)
+        hop = int(ASR_SAMPLE_RATE * ASR_FRAME_SHIFT_S)
+        total = len(speech)
+        n_frames = 0 if total < win else 1 + (total - win) // hop
+        features = torch.empty((n_frames, 128), dtype=torch.float32)
+
+        frames_per_block = max(1, int(block_s / ASR_FRAME_SHIFT_S))
+        for f0 in range(0, n_frames, frames_per_block):
+            f1 = min(n_frames, f0 + frames_per_block)
+            block = np.array(speech[f0 * hop:(f1 - 1) * hop + win], dtype=np.float32)
+            features[f0:f1] = torchaudio.compliance.kaldi.fbank(
+                torch.from_numpy(block).unsqueeze(0), num_mel_bins=128, sample_frequency=ASR_SAMPLE_RATE,
+                frame_length=ASR_FRAME_LENGTH_S * 1000, frame_shift=ASR_FRAME_SHIFT_S * 1000,
+            )
+
+        if n_frames:
+            features -= features.mean(dim=0, keepdim=True)
+            features /= features.std(dim=0, keepdim=True) + 1e-6
+        return features
+
+    @staticmethod
+    def _medasr_frame_spans(spans, n_frames):
+        """Convert sample spans to frame-index spans into the full-recording feature tensor."""
+        win = int(ASR_SAMPLE_RATE * ASR_FRAME_LENGTH_S)
+        hop = int(ASR_SAMPLE_RATE * ASR_FRAME_SHIFT_S)
+        frame_spans = []
+        for start, end in spans:
+            f0 = start // hop
+            f1 = f0 + max(1, 1 + (end - start - win) // hop)
+            frame_spans.append((f0, min(f1, n_frames)))
+        return frame_spans
+
+    @staticmethod
+    def _medasr_forward_batch(model, feature_list, device):
+        """
+        Pad a list of (frames, mel) feature tensors into one batch and run a
+        single forward pass with an attention mask.
+        Returns (logits, output_lengths, frame_seconds): the valid logit
+        frames of each row, and the duration of one logit frame (the encoder
+        subsamples the 10 ms feature frames).
+        """
+        import torch
+        lengths = torch.tensor([f.shape[0] for f in feature_list], dtype=torch.long)
+        max_len = int(lengths.max())
+        batch = torch.nn.utils.rnn.pad_sequence(feature_list, batch_first=True)
+        attention_mask = (torch.arange(max_len)[None, :] < lengths[:, None]).long()
+        with torch.no_grad():
+            logits = model(
+                input_features=batch.to(device),
+                attention_mask=attention_mask.to(device),
+            ).logits
+        out_frames = logits.shape[1]
+        output_lengths = torch.ceil(lengths.float() * out_frames / max_len).long().clamp(max=out_frames)
+        frame_seconds = ASR_FRAME_SHIFT_S * max_len / out_frames
+        return logits, output_lengths, frame_seconds
+
+    @staticmethod
+    def _medasr_collapse_batch(model, processor, features, device):
+        """One padded forward pass + CTC collapse over feature chunks -> [(token_ids, frame_idx, frame_seconds)]."""
+        logits, output_lengths, frame_seconds = ModelRegistry._medasr_forward_batch(model, features, device)
+        collapsed = ModelRegistry._ctc_collapse(logits, ModelRegistry._ctc_blank_id(processor), output_lengths)
+        return [(token_ids, frame_idx, frame_seconds) for token_ids, frame_idx in collapsed]
+
+    @staticmethod
+    def _medasr_collapse_chunks(
+        model_path, features, frame_spans, device, batch_size=None, workers=None, progress=None, backend="torch"
+    ):
+        """
+        Run every chunk (a frame-index view of `features`) through the model
+        and return the collapsed CTC output of each, in span order. Chunks are grouped into fixed batches of
+        `batch_size`; with `workers` > 1 on CPU the batches are fanned out
+        across a process pool. Batch composition never depends on the worker
+        count, so the output is identical for any number of workers.
+        `progress(done_chunks, total_chunks)` is called after every batch.
+        """
+        batch_size = max(1, int(batch_size or ASR_BATCH_SIZE))
+        workers = max(1, int(workers or ASR_WORKERS))
+        spans = frame_spans
+        batch_spans = [spans[b:b + batch_size] for b in range(0, len(spans), batch_size)]
+
+        if workers > 1 and device == "cpu" and len(batch_spans) > 1:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            workers = min(workers, len(batch_spans))
+            threads = max(1, (os.cpu_count() or 1) // workers)
+            print(f"[MedASR] Fanning {len(spans)} chunk(s) out to {workers} worker(s), {threads} thread(s) each...")
+            batches = [[features[f0:f1].clone() for f0, f1 in group] for group in batch_spans]
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_asr_pool_init,
+                initargs=(model_path, threads, backend),
+            ) as pool:
+                results = []
+                for batch in pool.map(_asr_pool_collapse, batches):
+                    results.extend(batch)
+                    if progress:
+                        progress(len(results), len(spans))
+                return results
+
+        model, processor = ModelRegistry._get_asr_encoder(model_path, device, backend)
+        results = []
+        for group in batch_spans:
+            chunks = [features[f0:f1] for f0, f1 in group]
+            results.extend(ModelRegistry._medasr_collapse_batch(model, processor, chunks, device))
+            if progress:
+                progress(len(results), len(spans))
+        return results
+
+    @staticmethod
+    def _medasr_try_manual_features(
+        model_path, speech, device, batch_size=None, raise_errors=False, workers=None, progress=None, backend="torch"
+    ):
+        """
+        Stage 3: Bypass LasrFeatureExtractor entirely.
+        fbank runs once over the whole recording; chunks are frame-index
+        views of that tensor. Chunks are padded and run through the model `batch_size` at a time
+        (default: MEDASR_BATCH_SIZE), optionally across `workers` processes
+        (default: MEDASR_WORKERS), then stitched at the overlap midpoints so
+        words in the 2 s stride are not duplicated.
+        With backend="onnx" the forward pass runs through onnxruntime.
+        Returns {"text", "segments"} with per-chunk and per-word timestamps.
+        """
         try:
-            from transformers import AutoModelForCTC, AutoProcessor
-            import torch
-            import torchaudio
-            print("[MedASR] Stage 3: Manual feature extraction...")
-            processor = AutoProcessor.from_pretrained(model_path)
-            model = AutoModelForCTC.from_pretrained(model_path).to(device)
-            model.eval()
+            print(f"[MedASR] Stage 3: Manual feature extraction ({backend})...")
+            model, processor = ModelRegistry._get_asr_encoder(model_path, device, backend)
 
-            chunk_samples = 20 * 16000
-            stride_samples = 2 * 16000
-            step = chunk_samples - stride_samples
-            total_samples = len(speech)
+            spans = ModelRegistry._medasr_chunk_spans(
+                len(speech), ASR_CHUNK_S * ASR_SAMPLE_RATE, ASR_STRIDE_S * ASR_SAMPLE_RATE
+            )
+            features = ModelRegistry._medasr_features(speech)
+            frame_spans = ModelRegistry._medasr_frame_spans(spans, features.shape[0])
+            print(f"[MedASR] Processing {len(spans)} chunk(s) over {features.shape[0]} feature frames...")
+            collapsed = ModelRegistry._medasr_collapse_chunks(
+                model_path, features, frame_spans, device,
+                batch_size=batch_size, workers=workers, progress=progress, backend=backend,
+            )
 
-            if total_samples <= chunk_samples:
-                chunks = [speech]
-            else:
-                chunks = []
-                start = 0
-                while start < total_samples:
-                    end = min(start + chunk_samples, total_samples)
-                    chunks.append(speech[start:end])
-                    if end >= total_samples:
-                        break
-                    start += step
-
-            print(f"[MedASR] Processing {len(chunks)} chunk(s)...")
-            all_texts = []
-
-            for i, chunk in enumerate(chunks):
-                waveform = torch.from_numpy(chunk).float()
-                if waveform.dim() == 1:
-                    waveform = waveform.unsqueeze(0)
-                features = torchaudio.compliance.kaldi.fbank(
-                    waveform, num_mel_bins=128, sample_frequency=16000,
-                    frame_length=25.0, frame_shift=10.0,
-                )
-                features = features - features.mean(dim=0, keepdim=True)
-                features = features / (features.std(dim=0, keepdim=True) + 1e-6)
-                input_features = features.unsqueeze(0).to(device)
-                with torch.no_grad():
-                    logits = model(input_features=input_features).logits
-                chunk_text = ModelRegistry._decode_ctc_greedy(processor, logits)
-                if chunk_text.strip():
-                    all_texts.append(chunk_text.strip())
+            stitcher = _CTCStitcher(processor)
+            segments = []
+            for i, ((start, _), (token_ids, frame_idx, frame_seconds)) in enumerate(zip(spans, collapsed)):
+                is_last = i == len(spans) - 1
+                stitcher.add(token_ids, frame_idx, frame_seconds, start / ASR_SAMPLE_RATE, i == 0, is_last)
+                segment = stitcher.pop_segment(final=is_last)
+                if segment:
+                    segments.append(segment)
 
-            text = " ".join(all_texts).strip()
+            text = stitcher.text()
             if text:
                 print(f"[MedASR] Manual features succeeded: '{text[:80]}...'")
-                return text
+                return {"text": text, "segments": segments}
             return None
         except Exception as e:
+            if raise_errors:
+                raise
             print(f"[MedASR] Manual feature extraction failed: {e}")
             traceback.print_exc()
             return None
 
+    # ==================================================================
+    # MedASR Stage Capability Probing
+    # ==================================================================
+
+    @staticmethod
+    def _asr_environment(model_path):
+        """Library versions and model revision a probe result is valid for."""
+        import importlib
+        env = {}
+        for lib in ("transformers", "torch", "torchaudio", "onnxruntime"):
+            try:
+                env[lib] = importlib.import_module(lib).__version__
+            except Exception:
+                env[lib] = None
+        config_path = os.path.join(model_path, "config.json")
+        env["model_config_mtime"] = os.path.getmtime(config_path) if os.path.exists(config_path) else None
+        onnx_path = ModelRegistry._medasr_onnx_path(model_path) if ASR_ONNX else None
+        env["onnx_graph"] = [os.path.basename(onnx_path), os.path.getmtime(onnx_path)] if onnx_path else None
+        return env
+
+    @staticmethod
+    def _read_asr_capabilities():
+        try:
+            with open(ASR_CAPABILITIES_PATH, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _write_asr_capabilities(records):
+        os.makedirs(os.path.dirname(ASR_CAPABILITIES_PATH), exist_ok=True)
+        tmp_path = f"{ASR_CAPABILITIES_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(records, f, indent=2)
+        os.replace(tmp_path, ASR_CAPABILITIES_PATH)
+
+    @staticmethod
+    def _medasr_run_stage(stage, model_path, speech, device, raise_errors=False):
+        if stage == "onnx":
+            if device != "cpu":
+                raise RuntimeError("ONNX backend is CPU-only")
+            return ModelRegistry._medasr_try_manual_features(
+                model_path, speech, device, raise_errors=raise_errors, backend="onnx"
+            )
+        if stage in ("pipeline", "direct") and not speech.flags.writeable:
+            # The HF pipeline and processor may normalise their input in place; never hand them the PCM cache mmap.
+            speech = np.array(speech, copy=True)
+        if stage == "pipeline":
+            return ModelRegistry._medasr_try_pipeline(model_path, speech, device, raise_errors=raise_errors)
+        if stage == "direct":
+            return ModelRegistry._medasr_try_direct(model_path, speech, device, raise_errors=raise_errors)
+        if stage == "manual":
+            return ModelRegistry._medasr_try_manual_features(model_path, speech, device, raise_errors=raise_errors)
+        raise ValueError(f"Unknown MedASR stage: {stage}")
+
+    @staticmethod
+    def _asr_has_text(output):
+        """True when a stage's output (text or {"text", "segments"}) holds any non-blank text."""
+        if isinstance(output, dict):
+            output = output.get("text")
+        return bool(output and output.strip())
+
+    @staticmethod
+    def _asr_well_formed(output):
+        """True for a stage result of the expected shape: text, or {"text", ...} with text (possibly empty)."""
+        if isinstance(output, dict):
+            output = output.get("text")
+        return isinstance(output, str)
+
+    @staticmethod
+    def probe_asr_stage(model_path, device, force=False):
+        """
+        Returns the first MedASR stage that runs without error and returns a
+        well-formed result for this model path, device and library versions.
+        The probe input is low-level noise, which a working CTC model decodes
+        as blanks, so empty text counts as capable; None does not. The answer,
+        including "no stage works" (None), is persisted to
+        ASR_CAPABILITIES_PATH and only re-probed when the environment changes
+        (or `force` is set), so requests skip stages known to fail.
+        """
+        key = f"{model_path}|{device}"
+        env = ModelRegistry._asr_environment(model_path)
+
+        cached = ModelRegistry._asr_stage_cache.get(key)
+        if not force and cached and cached["environment"] == env:
+            return cached["stage"]
+
+        records = ModelRegistry._read_asr_capabilities()
+        record = records.get(key)
+        if not force and record and record.get("environment") == env:
+            ModelRegistry._asr_stage_cache[key] = record
+            return record["stage"]
+
+        print(f"[MedASR] Probing working stage for {model_path} ({device})...")
+        probe_speech = (np.random.default_rng(0).standard_normal(ASR_SAMPLE_RATE) * 0.01).astype(np.float32)
+        for stage in ASR_STAGES:
+            try:
+                output = ModelRegistry._medasr_run_stage(stage, model_path, probe_speech, device, raise_errors=True)
+            except Exception as e:
+                print(f"[MedASR] Probe: stage '{stage}' unavailable: {e}")
+                continue
+            if not ModelRegistry._asr_well_formed(output):
+                print(f"[MedASR] Probe: stage '{stage}' returned no result")
+                continue
+            print(f"[MedASR] Probe: using stage '{stage}'")
+            break
+        else:
+            stage = None
+            print("[MedASR] Probe: no stage works in this environment.")
+
+        record = {"stage": stage, "environment": env}
+        ModelRegistry._asr_stage_cache[key] = record
+        records[key] = record
+        try:
+            ModelRegistry._write_asr_capabilities(records)
+        except OSError as e:
+            print(f"[MedASR] Could not persist probe result: {e}")
+        return stage
+
+    @staticmethod
+    def _forget_asr_stage(model_path, device):
+        key = f"{model_path}|{device}"
+        ModelRegistry._asr_stage_cache.pop(key, None)
+        records = ModelRegistry._read_asr_capabilities()
+        if records.pop(key, None) is not None:
+            try:
+                ModelRegistry._write_asr_capabilities(records)
+            except OSError:
+                pass
+
+    @staticmethod
+    def warmup_asr(role="medasr"):
+        """Probe (and thereby load) the working MedASR stage ahead of the first request."""
+        path = ModelRegistry.get_model_path(role)
+        if not path or not os.path.exists(path):
+            return None
+        import torch
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        return ModelRegistry.probe_asr_stage(path, device)
+
+    @staticmethod
+    def _apply_vad(speech):
+        """
+        Energy VAD pre-pass: returns (speech_only_waveform, SpeechMap). The map
+        is None when VAD is disabled or nearly everything is speech, in which
+        case the waveform is returned unchanged.
+        """
+        if not ASR_VAD:
+            return speech, None
+        from utils import vad
+
+        regions = vad.detect_speech_regions(speech, sr=ASR_SAMPLE_RATE)
+        kept = sum(e - s for s, e in regions)
+        if regions and kept >= 0.95 * len(speech):
+            return speech, None
+        print(f"[MedASR] VAD: {len(regions)} speech region(s), "
+              f"{kept / ASR_SAMPLE_RATE:.1f}s of {len(speech) / ASR_SAMPLE_RATE:.1f}s")
+        return vad.compact_speech(speech, regions, sr=ASR_SAMPLE_RATE)
+
+    @staticmethod
+    def _remap_segment(segment, speech_map):
+        """Shift a segment's (and its words') times from the speech-only timeline to the recording."""
+        if speech_map is None:
+            return segment
+        words = [
+            {**w, "start": speech_map.to_original(w["start"]), "end": speech_map.to_original(w["end"])}
+            for w in segment.get("words", [])
+        ]
+        start, end = segment["timestamp"]
+        remapped = {**segment, "timestamp": (speech_map.to_original(start), speech_map.to_original(end))}
+        if words:
+            remapped["words"] = words
+        return remapped
+
+    @staticmethod
+    def _asr_result(output, duration, speech_map=None):
+        """Normalise a stage's output (text or {"text", "segments"}) to the API shape."""
+        if isinstance(output, dict):
+            segments = [ModelRegistry._remap_segment(seg, speech_map) for seg in output["segments"]]
+            return {"text": output["text"], "segments": segments}
+        return {"text": output, "segments": [{"text": output, "timestamp": (0.0, duration)}]}
+
     @staticmethod
     def transcribe_audio(role, audio_path):
-        """Transcribes audio using MedASR with 3-stage fallback."""
+        """
+        Transcribes audio using MedASR. Goes straight to the probed working
+        stage; falls back to the remaining stages in order if that stage
+        errors or returns no text.
+        """
         path = ModelRegistry.get_model_path(role)
         if not path or not os.path.exists(path):
             return {"text": "ASR Model not found.", "segments": []}
@@ -414,16 +1019,272 @@ class ModelRegistry:
         except Exception as e:
             return {"text": f"Error loading audio: {e}", "segments": []}
 
-        text = ModelRegistry._medasr_try_pipeline(path, speech, device)
-        if text:
-            return {"text": text, "segments": [{"text": text, "timestamp": (0.0, None)}]}
+        duration = round(len(speech) / ASR_SAMPLE_RATE, 2)
+        speech, speech_map = ModelRegistry._apply_vad(speech)
+        if len(speech) == 0:
+            return {"text": "", "segments": []}
+
+        stage = ModelRegistry.probe_asr_stage(path, device)
+        if stage:
+            try:
+                output = ModelRegistry._medasr_run_stage(stage, path, speech, device, raise_errors=True)
+                if ModelRegistry._asr_has_text(output):
+                    return ModelRegistry._asr_result(output, duration, speech_map)
+                print(f"[MedASR] Probed stage '{stage}' returned no text, falling back")
+            except Exception as e:
+                print(f"[MedASR] Probed stage '{stage}' failed, falling back: {e}")
+                ModelRegistry._forget_asr_stage(path, device)
+
+        for fallback in ASR_STAGES:
+            if fallback == stage:
+                continue
+            output = ModelRegistry._medasr_run_stage(fallback, path, speech, device)
+            if ModelRegistry._asr_has_text(output):
+                return ModelRegistry._asr_result(output, duration, speech_map)
+
+        return {"text": "Transcription failed at all stages.", "segments": []}
+
+    @staticmethod
+    def transcribe_long_audio(role, audio_path, workers=None, batch_size=None, progress=None):
+        """
+        Long-form mode for hour-long recordings: always uses the chunked
+        manual-feature path (through ONNX when exported) with chunks fanned
+        out across `workers` processes and overlap-aware stitching.
+        `progress(done, total)` is called as chunk batches complete.
+        """
+        path = ModelRegistry.get_model_path(role)
+        if not path or not os.path.exists(path):
+            return {"text": "ASR Model not found.", "segments": []}
+        if not os.path.exists(audio_path):
+            return {"text": f"Audio file not found: {audio_path}", "segments": []}
+
+        import torch
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+
+        try:
+            speech = ModelRegistry._load_audio(audio_path, target_sr=ASR_SAMPLE_RATE)
+        except Exception as e:
+            return {"text": f"Error loading audio: {e}", "segments": []}
+
+        duration = round(len(speech) / ASR_SAMPLE_RATE, 2)
+        speech, speech_map = ModelRegistry._apply_vad(speech)
+        if len(speech) == 0:
+            return {"text": "", "segments": []}
+
+        backend = ModelRegistry._medasr_default_backend(path, device)
+        result = ModelRegistry._medasr_try_manual_features(
+            path, speech, device, batch_size=batch_size, workers=workers, progress=progress, backend=backend
+        )
+        if not result:
+            return {"text": "Transcription failed at all stages.", "segments": []}
+        return ModelRegistry._asr_result(result, duration, speech_map)
+
+    # ==================================================================
+    # MedASR Streaming Transcription
+    # ==================================================================
+
+    @staticmethod
+    def _iter_pcm_windows(source, chunk_samples, stride_samples):
+        """
+        Yield (start_sample, window, is_last) overlapping windows as soon as
+        enough audio is available.
+
+        `source` is either a float32 numpy array (a fully decoded recording)
+        or an iterable of PCM blocks (numpy arrays or raw little-endian
+        float32 bytes, 16 kHz mono) arriving from a live stream.
+        """
+        if isinstance(source, np.ndarray):
+            spans = ModelRegistry._medasr_chunk_spans(len(source), chunk_samples, stride_samples)
+            for i, (start, end) in enumerate(spans):
+                yield start, source[start:end], i == len(spans) - 1
+            return
+
+        step = chunk_samples - stride_samples
+        buffer = np.zeros(0, dtype=np.float32)
+        offset = 0  # absolute sample index of buffer[0]
+        for block in source:
+            if isinstance(block, (bytes, bytearray, memoryview)):
+                block = np.frombuffer(block, dtype=np.float32)
+            buffer = np.concatenate([buffer, np.asarray(block, dtype=np.float32).ravel()])
+            while len(buffer) >= chunk_samples:
+                yield offset, buffer[:chunk_samples], False
+                buffer = buffer[step:]
+                offset += step
+
+        # The tail owns the second half of the last overlap, so always flush it.
+        if len(buffer):
+            yield offset, buffer, True
+
+    @staticmethod
+    def transcribe_audio_stream(role, source):
+        """
+        Generator variant of `transcribe_audio` for live consults.
+
+        `source` is an audio file path, a decoded float32 array, or an
+        iterable of 16 kHz mono PCM blocks. Each chunk is decoded as soon as
+        its window is complete and yielded as a segment dict
+        {"index", "text", "timestamp": (start_s, end_s), "words"}, stitched
+        at the overlap midpoints; chunks that complete no words are skipped.
+        Uses the manual-feature path, the only stage that can run on partial
+        audio.
+        """
+        path = ModelRegistry.get_model_path(role)
+        if not path or not os.path.exists(path):
+            raise RuntimeError("ASR Model not found.")
+
+        import torch
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+
+        if isinstance(source, (str, os.PathLike)):
+            if not os.path.exists(source):
+                raise FileNotFoundError(f"Audio file not found: {source}")
+            source = ModelRegistry._load_audio(source, target_sr=ASR_SAMPLE_RATE)
+
+        # VAD needs the whole recording, so it only applies to file/array sources.
+        speech_map = None
+        if isinstance(source, np.ndarray):
+            source, speech_map = ModelRegistry._apply_vad(source)
+
+        model, processor = ModelRegistry._get_asr_encoder(
+            path, device, ModelRegistry._medasr_default_backend(path, device)
+        )
+        windows = ModelRegistry._iter_pcm_windows(
+            source, ASR_CHUNK_S * ASR_SAMPLE_RATE, ASR_STRIDE_S * ASR_SAMPLE_RATE
+        )
+
+        stitcher = _CTCStitcher(processor)
+        index = 0
+        first = True
+        for start, window, is_last in windows:
+            token_ids, frame_idx, frame_seconds = ModelRegistry._medasr_collapse_batch(
+                model, processor, [ModelRegistry._medasr_fbank(window)], device
+            )[0]
+            stitcher.add(token_ids, frame_idx, frame_seconds, start / ASR_SAMPLE_RATE, first, is_last)
+            first = False
+            segment = stitcher.pop_segment(final=is_last)
+            if segment:
+                yield {"index": index, **ModelRegistry._remap_segment(segment, speech_map)}
+                index += 1
+
+
+# ======================================================================
+# Overlap-aware chunk stitching
+# ======================================================================
+
+class _CTCStitcher:
+    """
+    Merges the CTC output of overlapping chunks into one token stream.
+
+    Each chunk only contributes tokens emitted inside the region it owns:
+    the overlap with a neighbour is split at its midpoint, so words in the
+    stride are kept exactly once. The trailing word is held back until the
+    next chunk shows whether it continues across the cut.
+    """
+
+    def __init__(self, processor, chunk_s=ASR_CHUNK_S, stride_s=ASR_STRIDE_S):
+        self.processor = processor
+        self.tokenizer = processor.tokenizer
+        self.chunk_s = chunk_s
+        self.stride_s = stride_s
+        self.token_ids = []
+        self.token_times = []
+        self.pending = 0  # index of the first token not yet emitted as a word
+        self.frame_seconds = ASR_FRAME_SHIFT_S
+
+    def add(self, token_ids, frame_idx, frame_seconds, start_s, is_first, is_last):
+        left = float("-inf") if is_first else start_s + self.stride_s / 2
+        right = float("inf") if is_last else start_s + self.chunk_s - self.stride_s / 2
+        self.frame_seconds = frame_seconds
+        for token_id, frame in zip(token_ids, frame_idx):
+            time_s = start_s + frame * frame_seconds
+            if not left <= time_s < right:
+                continue
+            # Both chunks emitted the same token at the cut: keep one. Genuine
+            # repeats are always separated by a blank frame.
+            if (
+                self.token_ids
+                and token_id == self.token_ids[-1]
+                and time_s - self.token_times[-1] < 2 * frame_seconds
+            ):
+                continue
+            self.token_ids.append(token_id)
+            self.token_times.append(time_s)
+
+    def pop_segment(self, final=False):
+        """Return the words completed since the last call as a UI segment, or None."""
+        end = len(self.token_ids)
+        if not final:
+            tokens = self.tokenizer.convert_ids_to_tokens(self.token_ids[self.pending:])
+            for i in range(len(tokens) - 1, 0, -1):
+                if tokens[i].startswith("▁") or tokens[i] == "|":
+                    end = self.pending + i
+                    break
+            else:
+                return None  # everything pending may still be one unfinished word
+
+        words = ModelRegistry._ctc_word_spans(
+            self.tokenizer,
+            self.token_ids[self.pending:end],
+            self.token_times[self.pending:end],
+            self.frame_seconds,
+        )
+        self.pending = end
+        if not words:
+            return None
+        return {
+            "text": " ".join(w["text"] for w in words),
+            "timestamp": (words[0]["start"], words[-1]["end"]),
+            "words": words,
+        }
+
+    def text(self):
+        return ModelRegistry._clean_ctc_text(self.processor.decode(self.token_ids, skip_special_tokens=True))
+
+
+# ======================================================================
+# onnxruntime backend for the MedASR encoder
+# ======================================================================
+
+class _OnnxCTCEncoder:
+    """
+    Wraps an exported MedASR graph so it can stand in for the torch model's
+    forward pass: called with input_features / attention_mask tensors, it
+    returns an object with a torch `.logits` tensor.
+    """
+
+    def __init__(self, onnx_path, threads=None):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def __call__(self, input_features, attention_mask=None):
+        import torch
+        from types import SimpleNamespace
+        feeds = {"input_features": input_features.detach().cpu().numpy()}
+        if attention_mask is not None and "attention_mask" in self.input_names:
+            feeds["attention_mask"] = attention_mask.detach().cpu().numpy().astype(np.int64)
+        logits = self.session.run(["logits"], feeds)[0]
+        return SimpleNamespace(logits=torch.from_numpy(logits))
+
+
+# ======================================================================
+# Process-pool workers for long-form transcription
+# ======================================================================
+
+_asr_worker = {}
+
 
-        text = ModelRegistry._medasr_try_direct(path, speech, device)
-        if text:
-            return {"text": text, "segments": [{"text": text, "timestamp": (0.0, None)}]}
+def _asr_pool_init(model_path, threads, backend="torch"):
+    import torch
+    torch.set_num_threads(threads)
+    _asr_worker["model"], _asr_worker["processor"] = ModelRegistry._get_asr_encoder(
+        model_path, "cpu", backend, threads=threads
+    )
 
-        text = ModelRegistry._medasr_try_manual_features(path, speech, device)
-        if text:
-            return {"text": text, "segments": [{"text": text, "timestamp": (0.0, None)}]}
 
-        return {"text": "Transcription failed at all stages.", "segments": []}
\ No newline at end of file
+def _asr_pool_collapse(chunks):
+    return ModelRegistry._medasr_collapse_batch(_asr_worker["model"], _asr_worker["processor"], chunks, "cpu")
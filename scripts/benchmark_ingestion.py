@@ -0,0 +1,140 @@
+"""
+Reproducible ingestion / triage-metrics benchmark on synthetic Fitbit data.
+
+For every scale (a multiple of --users), a synthetic export is generated
+(scripts/generate_fitbit_data.py), ingested into a fresh SQLite database
+under the work directory, and HomeTriageStrategy._fetch_patient_data is
+timed per user. The application database is never touched. At the
+defaults 1x is ~25 MB of CSV; 100x is ~2.6 GB and needs as much free disk
+(plus ~8 GB for its database).
+
+USAGE:
+  python scripts/benchmark_ingestion.py                                 # 1x, 10x, 100x of 3 users x 14 days
+  python scripts/benchmark_ingestion.py --scales 1 10 --users 5 --days 31 --workers 4
+  python scripts/benchmark_ingestion.py --json bench.json --keep --work-dir /tmp/fitbit-bench
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from datetime import date
+
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.database as database
+from utils.columnar import COLUMNAR_STORE
+from scripts.generate_fitbit_data import generate
+from scripts.ingest_fitbit import ingest_directory, prepare_database
+from strategies.home_triage import HomeTriageStrategy
+
+
+def _use_database(path):
+    """Point the shared engines at a benchmark database (they are created lazily from DATABASE_URL)."""
+    database.dispose_engines()
+    database.DATABASE_URL = f"sqlite:///{path}"
+
+
+def run_scale(scale, args, work_dir):
+    users = args.users * scale
+    scale_dir = os.path.join(work_dir, f"{scale}x")
+    csv_dir = os.path.join(scale_dir, "csv")
+    db_path = os.path.join(scale_dir, "health_companion.db")
+    shutil.rmtree(scale_dir, ignore_errors=True)
+    print(f"\n── {scale}x: {users} users x {args.days} days ──")
+
+    started = time.perf_counter()
+    generated = generate(csv_dir, users, args.start, args.days, args.hr_interval, args.seed)
+    generate_s = time.perf_counter() - started
+    csv_mb = sum(os.path.getsize(os.path.join(csv_dir, name)) for name in generated) / 1e6
+    print(f"Generated {sum(generated.values()):,} rows ({csv_mb:.1f} MB) in {generate_s:.1f}s")
+
+    _use_database(db_path)
+    started = time.perf_counter()
+    results, changed_users = ingest_directory(prepare_database(), csv_dir, workers=args.workers)
+    ingest_s = time.perf_counter() - started
+    errors = {name: rows for name, rows in results.items() if isinstance(rows, str)}
+    if errors:
+        raise RuntimeError(f"Ingestion failed: {errors}")
+    ingested = sum(sum(rows.values()) for rows in results.values() if isinstance(rows, dict))
+    print(f"Ingested {ingested:,} rows in {ingest_s:.1f}s ({ingested / ingest_s:,.0f} rows/s)")
+
+    strategy = HomeTriageStrategy()
+    sample = sorted(changed_users)[: args.fetch_users]
+    timings = []
+    for user_id in sample:
+        started = time.perf_counter()
+        strategy._fetch_patient_data(user_id, window_days=args.window_days)
+        timings.append((time.perf_counter() - started) * 1000)
+    fetch_ms = np.array(timings)
+    print(
+        f"_fetch_patient_data: {len(sample)} users, "
+        f"mean {fetch_ms.mean():.1f} ms, p95 {np.percentile(fetch_ms, 95):.1f} ms"
+    )
+
+    database.dispose_engines()
+    return {
+        "scale": scale,
+        "users": users,
+        "days": args.days,
+        "rows": generated,
+        "csv_mb": round(csv_mb, 1),
+        "generate_s": round(generate_s, 2),
+        "ingest_s": round(ingest_s, 2),
+        "ingest_rows_per_s": round(ingested / ingest_s),
+        "db_mb": round(os.path.getsize(db_path) / 1e6, 1),
+        "fetch_users": len(sample),
+        "fetch_mean_ms": round(float(fetch_ms.mean()), 2),
+        "fetch_p95_ms": round(float(np.percentile(fetch_ms, 95)), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Fitbit ingestion and triage metric queries")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100], help="Multiples of --users")
+    parser.add_argument("--users", type=int, default=3, help="Users at 1x")
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--start", type=date.fromisoformat, default=date(2016, 4, 12))
+    parser.add_argument("--hr-interval", type=float, default=5, help="Mean seconds between heart-rate samples")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, help="Ingestion parser processes (default: INGEST_WORKERS)")
+    parser.add_argument("--window-days", type=int, default=7, help="Triage window for _fetch_patient_data")
+    parser.add_argument("--fetch-users", type=int, default=20, help="Users timed per scale")
+    parser.add_argument("--work-dir", help="Where exports and databases are written (default: a temp dir)")
+    parser.add_argument("--keep", action="store_true", help="Keep the work dir")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    if COLUMNAR_STORE:
+        # The columnar tier lives under data/columnar, shared with the application.
+        print("❌ Unset COLUMNAR_STORE: the benchmark measures the SQLite path.")
+        sys.exit(1)
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="fitbit-bench-")
+    try:
+        results = [run_scale(scale, args, work_dir) for scale in args.scales]
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"\n{'Scale':>6} | {'Users':>6} | {'CSV MB':>8} | {'Ingest s':>9} | {'Rows/s':>10} | "
+          f"{'DB MB':>8} | {'Fetch ms (mean/p95)':>20}")
+    for r in results:
+        print(f"{r['scale']:>5}x | {r['users']:>6} | {r['csv_mb']:>8.1f} | {r['ingest_s']:>9.2f} | "
+              f"{r['ingest_rows_per_s']:>10,} | {r['db_mb']:>8.1f} | "
+              f"{r['fetch_mean_ms']:>9.1f} / {r['fetch_p95_ms']:<8.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✅ Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
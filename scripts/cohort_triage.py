@@ -0,0 +1,49 @@
+"""
+Batch Home Triage across a panel of patients.
+
+USAGE:
+  python scripts/cohort_triage.py                      # every user in the database
+  python scripts/cohort_triage.py --users 1503960366 1624580081
+  python scripts/cohort_triage.py --no-save --json     # print results, skip the vault
+"""
+
+import os
+import sys
+import json
+import argparse
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from strategies.home_triage import HomeTriageStrategy
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run Home Triage for many patients in batched passes")
+    parser.add_argument("--users", nargs="*", help="User ids to screen (default: all users)")
+    parser.add_argument("--window-days", type=int, default=7)
+    parser.add_argument("--no-save", action="store_true", help="Do not write results to the Medical Vault")
+    parser.add_argument("--json", action="store_true", help="Print the full results as JSON")
+    args = parser.parse_args()
+
+    result = HomeTriageStrategy().batch_triage(args.users, save=not args.no_save, window_days=args.window_days)
+    if result["status"] != "success":
+        print(f"❌ {result['message']}")
+        sys.exit(1)
+
+    if args.json:
+        print(json.dumps(result["data"], indent=2))
+    elif result["data"]:
+        print(f"{'User':<12} | " + " | ".join(f"{d['dimension'][:18]:<18}" for d in result["data"][0]["data"]))
+        for patient in result["data"]:
+            print(f"{patient['user_id']:<12} | " + " | ".join(f"{d['status']:<18}" for d in patient["data"]))
+
+    throughput = result["throughput"]
+    print(
+        f"\n✅ {throughput['patients']} patients in {throughput['seconds']}s "
+        f"({throughput['patients_per_min']} patients/min)"
+    )
+
+
+if __name__ == "__main__":
+    main()
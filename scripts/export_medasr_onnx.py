@@ -0,0 +1,135 @@
+"""
+Export the local MedASR CTC model to ONNX for the onnxruntime backend.
+
+USAGE:
+  python scripts/export_medasr_onnx.py                # export ml_models/medasr/onnx/model.onnx
+  python scripts/export_medasr_onnx.py --quantize     # also write model.int8.onnx (dynamic int8)
+  python scripts/export_medasr_onnx.py --check-only   # parity check of existing graph(s)
+
+The registry picks up <model>/onnx/model.int8.onnx (preferred) or
+model.onnx automatically on CPU; set MEDASR_ONNX=False to disable. An
+exported graph that fails the parity check is deleted again.
+"""
+
+import os
+import sys
+import argparse
+
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model_registry import ModelRegistry, _OnnxCTCEncoder
+
+
+def export(model_path, onnx_path, opset):
+    import torch
+    from transformers import AutoModelForCTC
+
+    print(f"Loading {model_path}...")
+    model = AutoModelForCTC.from_pretrained(model_path)
+    model.eval()
+
+    class Encoder(torch.nn.Module):
+        def __init__(self, inner):
+            super().__init__()
+            self.inner = inner
+
+        def forward(self, input_features, attention_mask):
+            return self.inner(input_features=input_features, attention_mask=attention_mask).logits
+
+    features = torch.randn(2, 2000, 128)
+    attention_mask = torch.ones(2, 2000, dtype=torch.long)
+
+    os.makedirs(os.path.dirname(onnx_path), exist_ok=True)
+    print(f"Exporting to {onnx_path} (opset {opset})...")
+    with torch.no_grad():
+        torch.onnx.export(
+            Encoder(model),
+            (features, attention_mask),
+            onnx_path,
+            input_names=["input_features", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes={
+                "input_features": {0: "batch", 1: "frames"},
+                "attention_mask": {0: "batch", 1: "frames"},
+                "logits": {0: "batch", 1: "logit_frames"},
+            },
+            opset_version=opset,
+            do_constant_folding=True,
+        )
+    print("✅ Export complete.")
+
+
+def quantize(onnx_path, int8_path):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    print(f"Quantizing to {int8_path} (dynamic int8)...")
+    quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QInt8)
+    print("✅ Quantization complete.")
+
+
+def parity_check(model_path, onnx_path, seconds=20, seed=0):
+    """Compare ONNX logits with the PyTorch path on the same fbank features."""
+    rng = np.random.default_rng(seed)
+    speech = (rng.standard_normal(seconds * 16000) * 0.05).astype(np.float32)
+    features = [ModelRegistry._medasr_fbank(speech), ModelRegistry._medasr_fbank(speech[: len(speech) // 2])]
+
+    model, _ = ModelRegistry._get_ctc_model(model_path, "cpu")
+    torch_logits, lengths, _ = ModelRegistry._medasr_forward_batch(model, features, "cpu")
+    onnx_logits, _, _ = ModelRegistry._medasr_forward_batch(_OnnxCTCEncoder(onnx_path), features, "cpu")
+
+    max_diff = 0.0
+    agreement = []
+    for row, n in enumerate(lengths.tolist()):
+        t, o = torch_logits[row, :n], onnx_logits[row, :n]
+        max_diff = max(max_diff, (t - o).abs().max().item())
+        agreement.append((t.argmax(-1) == o.argmax(-1)).float().mean().item())
+
+    print(f"--- Parity: {os.path.basename(onnx_path)} ---")
+    print(f"Max |logit diff|: {max_diff:.5f}")
+    print(f"Argmax agreement: {min(agreement) * 100:.2f}% (worst row)")
+    return min(agreement)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export MedASR to ONNX and check parity with PyTorch")
+    parser.add_argument("--model-path", type=str, default=ModelRegistry.get_model_path("medasr"))
+    parser.add_argument("--opset", type=int, default=17)
+    parser.add_argument("--quantize", action="store_true", help="Also write a dynamic int8 graph")
+    parser.add_argument("--check-only", action="store_true", help="Skip export; only run the parity check")
+    parser.add_argument("--min-agreement", type=float, default=0.98, help="Fail if argmax agreement is lower")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.model_path):
+        print(f"❌ Model not found at {args.model_path}")
+        sys.exit(1)
+
+    onnx_dir = os.path.join(args.model_path, "onnx")
+    onnx_path = os.path.join(onnx_dir, "model.onnx")
+    int8_path = os.path.join(onnx_dir, "model.int8.onnx")
+
+    if not args.check_only:
+        export(args.model_path, onnx_path, args.opset)
+        if args.quantize:
+            quantize(onnx_path, int8_path)
+        elif os.path.exists(int8_path):
+            # Quantized from an earlier export; the registry would prefer it over the new graph.
+            os.remove(int8_path)
+
+    failed = False
+    for path in (onnx_path, int8_path):
+        if os.path.exists(path) and parity_check(args.model_path, path) < args.min_agreement:
+            failed = True
+            if args.check_only:
+                print(f"❌ {os.path.basename(path)} diverges from PyTorch; remove it to keep the torch backend.")
+            else:
+                # Never leave a diverging graph where the registry would pick it up.
+                os.remove(path)
+                print(f"❌ {os.path.basename(path)} diverges from PyTorch; removed.")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
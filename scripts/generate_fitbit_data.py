@@ -0,0 +1,233 @@
+"""
+Synthetic Fitbit export with the files and columns scripts/ingest_fitbit.py reads.
+
+Every user gets their own chronotype (wake time, sleep need), activity level
+and resting heart rate. Days follow a diurnal pattern: sleep at night with
+jittered bed/wake times, commute and evening activity peaks, occasional walks
+and workouts, and a heart rate that tracks activity and dips during sleep.
+
+USAGE:
+  python scripts/generate_fitbit_data.py                               # 10 users, 31 days -> data/uploads/fitbit_data
+  python scripts/generate_fitbit_data.py --users 100 --start 2016-03-12 --days 62 --out /tmp/fitbit
+  python scripts/generate_fitbit_data.py --hr-interval 10 --seed 7     # sparser heart rate, other cohort
+"""
+
+import os
+import time
+import argparse
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUT_DIR = os.path.join(BASE_DIR, "data", "uploads", "fitbit_data")
+
+# Column order of the Fitabase "merged" export files.
+FILES = {
+    "dailyActivity_merged.csv": [
+        "Id", "ActivityDate", "TotalSteps", "TotalDistance", "TrackerDistance", "LoggedActivitiesDistance",
+        "VeryActiveDistance", "ModeratelyActiveDistance", "LightActiveDistance", "SedentaryActiveDistance",
+        "VeryActiveMinutes", "FairlyActiveMinutes", "LightlyActiveMinutes", "SedentaryMinutes", "Calories",
+    ],
+    "hourlySteps_merged.csv": ["Id", "ActivityHour", "StepTotal"],
+    "minuteStepsNarrow_merged.csv": ["Id", "ActivityMinute", "Steps"],
+    "sleepDay_merged.csv": ["Id", "SleepDay", "TotalSleepRecords", "TotalMinutesAsleep", "TotalTimeInBed"],
+    "heartrate_seconds_merged.csv": ["Id", "Time", "Value"],
+}
+
+MINUTES_PER_DAY = 1440
+STRIDE_KM = 0.00072          # distance per step
+VERY_ACTIVE_STEPS = 100      # steps/min thresholds for the activity-minute buckets
+FAIRLY_ACTIVE_STEPS = 60
+
+# "12:00:00 AM" ... "11:59:59 PM", indexed by second of day (Fitbit's unpadded 12-hour clock).
+_SECONDS = np.arange(86400)
+_CLOCK = np.array([
+    f"{(s // 3600 + 11) % 12 + 1}:{s // 60 % 60:02d}:{s % 60:02d} {'AM' if s < 43200 else 'PM'}" for s in _SECONDS
+])
+
+
+def _fitbit_date(day):
+    return f"{day.month}/{day.day}/{day.year}"
+
+
+def _timestamps(day, seconds):
+    """Fitbit-style 'M/D/YYYY H:MM:SS AM' strings for seconds-of-day on one date."""
+    return np.char.add(_fitbit_date(day) + " ", _CLOCK[seconds])
+
+
+def _diurnal_rate(minute_of_day, wake_min):
+    """Baseline steps/min while awake: morning commute, lunch and evening peaks around the wake time."""
+    hours = (minute_of_day - wake_min) / 60.0
+    peaks = (
+        14 * np.exp(-0.5 * ((hours - 1.5) / 0.6) ** 2)      # morning routine / commute
+        + 8 * np.exp(-0.5 * ((hours - 5.5) / 0.8) ** 2)     # lunch
+        + 12 * np.exp(-0.5 * ((hours - 10.5) / 1.0) ** 2)   # evening
+    )
+    return 3.0 + peaks
+
+
+def _user_profile(rng, user_id):
+    return {
+        "id": user_id,
+        "wake_h": rng.normal(7.0, 0.9),
+        "sleep_h": float(np.clip(rng.normal(7.4, 0.7), 5.0, 9.5)),
+        "activity": float(np.clip(rng.lognormal(0.0, 0.35), 0.4, 2.5)),
+        "resting_hr": float(np.clip(rng.normal(63, 6), 48, 85)),
+        "bmr": float(rng.normal(1650, 180)),
+        "wear": float(np.clip(rng.normal(0.93, 0.04), 0.75, 1.0)),
+    }
+
+
+def _simulate_user(rng, profile, start, days, hr_interval_s):
+    """Minute steps (days x 1440), asleep mask and heart-rate samples (seconds, values) for one user."""
+    n = days + 1  # one extra day so the last night is complete
+    minute = np.arange(MINUTES_PER_DAY)
+
+    # Night before day d: bedtime and wake time with day-to-day jitter (later on weekends).
+    weekend = np.array([(start + timedelta(days=d)).weekday() >= 5 for d in range(n)])
+    wake = profile["wake_h"] * 60 + rng.normal(0, 25, n) + weekend * rng.normal(60, 20, n)
+    sleep_len = profile["sleep_h"] * 60 + rng.normal(0, 35, n)
+    bedtime = wake - sleep_len  # minutes relative to midnight of day d (negative = previous evening)
+
+    absolute = np.arange(n * MINUTES_PER_DAY)
+    asleep = np.zeros(n * MINUTES_PER_DAY, dtype=bool)
+    for d in range(n):
+        lo = int(max(d * MINUTES_PER_DAY + bedtime[d], 0))
+        hi = int(max(d * MINUTES_PER_DAY + wake[d], 0))
+        asleep[lo:hi] = True
+
+    rate = np.concatenate([_diurnal_rate(minute, wake[d]) for d in range(n)]) * profile["activity"]
+    # Walks and workouts: a few bursts a day of sustained cadence.
+    bursts = np.zeros_like(rate)
+    for d in range(n):
+        for _ in range(rng.poisson(2.0 * profile["activity"])):
+            begin = d * MINUTES_PER_DAY + int(wake[d] + rng.uniform(30, 900))
+            bursts[begin:begin + int(rng.uniform(8, 45))] = rng.uniform(70, 125)
+    steps = rng.poisson(np.where(asleep, 0.0, rate + bursts))
+    # Sedentary stretches: the device records nothing for many awake minutes.
+    steps[rng.random(steps.size) < 0.45] = 0
+
+    # Heart rate: resting + activity load + night-time dip, smoothed, sampled every ~hr_interval_s.
+    load = pd.Series(steps.astype(float)).rolling(3, min_periods=1).mean().to_numpy()
+    minute_hr = profile["resting_hr"] + 0.42 * load - 7 * asleep + rng.normal(0, 2.5, absolute.size)
+    gaps = rng.gamma(4.0, hr_interval_s / 4.0, int(n * 86400 / hr_interval_s * 1.2)).clip(1).round()
+    seconds = np.cumsum(gaps).astype(np.int64)
+    seconds = seconds[seconds < n * 86400]
+    worn = rng.random(n * 24) < profile["wear"]  # hours the device was on the wrist
+    seconds = seconds[worn[seconds // 3600]]
+    hr = np.interp(seconds / 60.0, absolute, minute_hr) + rng.normal(0, 1.5, seconds.size)
+    hr = np.clip(np.round(hr), 38, 200).astype(np.int16)
+
+    keep = slice(0, days * MINUTES_PER_DAY)
+    in_range = seconds < days * 86400
+    return steps[keep].reshape(days, MINUTES_PER_DAY), asleep, bedtime, wake, seconds[in_range], hr[in_range]
+
+
+def _user_frames(rng, profile, start, days, hr_interval_s):
+    """{file name: DataFrame} for one user, sorted by time like the export."""
+    steps, asleep, bedtime, wake, hr_seconds, hr_values = _simulate_user(rng, profile, start, days, hr_interval_s)
+    user_id = profile["id"]
+    dates = [start + timedelta(days=d) for d in range(days)]
+    frames = {}
+
+    minute_seconds = np.arange(MINUTES_PER_DAY) * 60
+    frames["minuteStepsNarrow_merged.csv"] = pd.DataFrame({
+        "Id": user_id,
+        "ActivityMinute": np.concatenate([_timestamps(day, minute_seconds) for day in dates]),
+        "Steps": steps.ravel(),
+    })
+
+    hourly = steps.reshape(days, 24, 60).sum(axis=2)
+    hour_seconds = np.arange(24) * 3600
+    frames["hourlySteps_merged.csv"] = pd.DataFrame({
+        "Id": user_id,
+        "ActivityHour": np.concatenate([_timestamps(day, hour_seconds) for day in dates]),
+        "StepTotal": hourly.ravel(),
+    })
+
+    day_of = hr_seconds // 86400
+    frames["heartrate_seconds_merged.csv"] = pd.DataFrame({
+        "Id": user_id,
+        "Time": np.concatenate([_timestamps(day, hr_seconds[day_of == d] % 86400) for d, day in enumerate(dates)]),
+        "Value": hr_values,
+    })
+
+    awake = ~asleep[: days * MINUTES_PER_DAY].reshape(days, MINUTES_PER_DAY)
+    very = (steps >= VERY_ACTIVE_STEPS).sum(axis=1)
+    fairly = ((steps >= FAIRLY_ACTIVE_STEPS) & (steps < VERY_ACTIVE_STEPS)).sum(axis=1)
+    light = ((steps > 0) & (steps < FAIRLY_ACTIVE_STEPS)).sum(axis=1)
+    sedentary = awake.sum(axis=1) - very - fairly - light
+    total = steps.sum(axis=1)
+    distance = lambda mask: np.round((steps * mask).sum(axis=1) * STRIDE_KM, 2)  # noqa: E731
+    frames["dailyActivity_merged.csv"] = pd.DataFrame({
+        "Id": user_id,
+        "ActivityDate": [_fitbit_date(day) for day in dates],
+        "TotalSteps": total,
+        "TotalDistance": np.round(total * STRIDE_KM, 2),
+        "TrackerDistance": np.round(total * STRIDE_KM, 2),
+        "LoggedActivitiesDistance": 0.0,
+        "VeryActiveDistance": distance(steps >= VERY_ACTIVE_STEPS),
+        "ModeratelyActiveDistance": distance((steps >= FAIRLY_ACTIVE_STEPS) & (steps < VERY_ACTIVE_STEPS)),
+        "LightActiveDistance": distance((steps > 0) & (steps < FAIRLY_ACTIVE_STEPS)),
+        "SedentaryActiveDistance": 0.0,
+        "VeryActiveMinutes": very,
+        "FairlyActiveMinutes": fairly,
+        "LightlyActiveMinutes": light,
+        "SedentaryMinutes": sedentary,
+        "Calories": np.round(profile["bmr"] + total * 0.045 + very * 6 + fairly * 3).astype(int),
+    })
+
+    # Sleep is reported on the morning the night ends; a few nights are not tracked.
+    nights = rng.random(days) < profile["wear"]
+    asleep_mins = np.round(wake[:days] - bedtime[:days] - rng.uniform(10, 45, days)).astype(int)
+    frames["sleepDay_merged.csv"] = pd.DataFrame({
+        "Id": user_id,
+        "SleepDay": [f"{_fitbit_date(day)} 12:00:00 AM" for day in dates],
+        "TotalSleepRecords": 1 + (rng.random(days) < 0.08),
+        "TotalMinutesAsleep": asleep_mins,
+        "TotalTimeInBed": np.round(wake[:days] - bedtime[:days] + rng.uniform(5, 30, days)).astype(int),
+    })[nights]
+    return frames
+
+
+def generate(out_dir, users=10, start=date(2016, 4, 12), days=31, hr_interval_s=5, seed=42):
+    """
+    Write the five export CSVs for `users` users over `days` days into
+    `out_dir` (replacing existing files). Users are simulated and appended
+    one at a time, so memory does not grow with the cohort. Returns
+    {file name: rows written}.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    rows = dict.fromkeys(FILES, 0)
+    for i in range(users):
+        profile = _user_profile(rng, 1000000000 + i * 7919)
+        for name, frame in _user_frames(rng, profile, start, days, hr_interval_s).items():
+            frame[FILES[name]].to_csv(os.path.join(out_dir, name), mode="w" if i == 0 else "a", header=i == 0,
+                                      index=False)
+            rows[name] += len(frame)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic Fitbit (Fitabase merged CSV) export")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--start", type=date.fromisoformat, default=date(2016, 4, 12), help="First day (YYYY-MM-DD)")
+    parser.add_argument("--days", type=int, default=31)
+    parser.add_argument("--hr-interval", type=float, default=5, help="Mean seconds between heart-rate samples")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default=DEFAULT_OUT_DIR)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    rows = generate(args.out, args.users, args.start, args.days, args.hr_interval, args.seed)
+    for name, count in rows.items():
+        size_mb = os.path.getsize(os.path.join(args.out, name)) / 1e6
+        print(f"{name:<32} {count:>12,} rows {size_mb:>10.1f} MB")
+    print(f"✅ {args.users} users x {args.days} days in {time.perf_counter() - started:.1f}s -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,30 @@
 import os
+import sys
+import time
+import shutil
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from queue import Empty
 import pandas as pd
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Date
-from sqlalchemy.orm import declarative_base, sessionmaker
-from datetime import datetime
+from sqlalchemy import Column, Integer, String, Float, DateTime, Date, Index, text
+from sqlalchemy.orm import declarative_base
 
 # --- Configuration ---
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from utils.database import DB_DIR, get_write_engine
+from utils.columnar import COLUMNAR_STORE, write_series
+from utils.hr_rollups import update_hr_rollups
+from utils.migrations import run_migrations
+from utils.triage_cache import mark_triage_stale
+from utils.uploads import extract_csv_members
+from utils.ingest_manifest import ALL_USERS, append_watermarks, get_manifest, is_unchanged, record_ingest
+from utils.ingest_manifest import prefix_digests
+
 DATA_DIR = os.path.join(BASE_DIR, "data")
-DB_DIR = os.path.join(DATA_DIR, "db")
 UPLOADS_DIR = os.path.join(DATA_DIR, "uploads", "fitbit_data")
-DB_PATH = os.path.join(DB_DIR, "health_companion.db")
-DATABASE_URL = f"sqlite:///{DB_PATH}"
 
 # Ensure DB directory exists
 os.makedirs(DB_DIR, exist_ok=True)
@@ -20,8 +34,9 @@ Base = declarative_base()
 
 class DailyActivity(Base):
     __tablename__ = 'daily_activity'
+    __table_args__ = (Index('ux_daily_activity_user_date', 'user_id', 'activity_date', unique=True),)
     id = Column(Integer, primary_key=True)
-    user_id = Column(String, index=True)
+    user_id = Column(String)
     activity_date = Column(Date)
     total_steps = Column(Integer)
     total_distance = Column(Float)
@@ -39,22 +54,25 @@ class DailyActivity(Base):
 
 class HourlySteps(Base):
     __tablename__ = 'hourly_steps'
+    __table_args__ = (Index('ux_hourly_steps_user_hour', 'user_id', 'activity_hour', unique=True),)
     id = Column(Integer, primary_key=True)
-    user_id = Column(String, index=True)
+    user_id = Column(String)
     activity_hour = Column(DateTime)
     step_total = Column(Integer)
 
 class MinuteSteps(Base):
     __tablename__ = 'minute_steps'
+    __table_args__ = (Index('ux_minute_steps_user_minute', 'user_id', 'activity_minute', unique=True),)
     id = Column(Integer, primary_key=True)
-    user_id = Column(String, index=True)
+    user_id = Column(String)
     activity_minute = Column(DateTime)
     steps = Column(Integer)
 
 class SleepLog(Base):
     __tablename__ = 'sleep_log'
+    __table_args__ = (Index('ux_sleep_log_user_day', 'user_id', 'sleep_day', unique=True),)
     id = Column(Integer, primary_key=True)
-    user_id = Column(String, index=True)
+    user_id = Column(String)
     sleep_day = Column(Date) # Note: sleepDay_merged.csv has time but it's usually 12:00:00 AM
     total_sleep_records = Column(Integer)
     total_minutes_asleep = Column(Integer)
@@ -62,198 +80,509 @@ class SleepLog(Base):
 
 class HeartRate(Base):
     __tablename__ = 'heart_rate'
+    __table_args__ = (Index('ux_heart_rate_user_time', 'user_id', 'time', unique=True),)
     id = Column(Integer, primary_key=True)
-    user_id = Column(String, index=True)
+    user_id = Column(String)
     time = Column(DateTime)
     value = Column(Integer)
 
 # --- Ingestion Logic ---
 
-def get_primary_user_id(uploads_dir):
+# Timestamp formats found in Fitbit exports, most specific first.
+TIME_FORMATS = ("%m/%d/%Y %I:%M:%S %p", "%m/%d/%Y")
+# Storage formats SQLAlchemy uses for SQLite Date / DateTime columns.
+SQLITE_DATE_FORMAT = "%Y-%m-%d"
+SQLITE_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+INSERT_BATCH_ROWS = 50_000
+# Rows per CSV read; bounds ingestion memory independently of the export size.
+INGEST_CHUNK_ROWS = int(os.environ.get("INGEST_CHUNK_ROWS", 250_000))
+# >1 parses files in a process pool; a single writer (this process) owns the SQLite connection.
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", "1"))
+# Prepared chunks buffered per file between a parser process and the writer.
+INGEST_QUEUE_CHUNKS = 4
+
+def get_primary_user_id(conn):
     """
-    Scans all CSVs to find the most frequent User ID.
+    User with the most ingested rows, from the ingestion manifest (no CSV
+    scan needed).
     """
-    user_counts = {}
-    
-    for filename in os.listdir(uploads_dir):
-        if not filename.endswith(".csv"):
-            continue
-            
-        file_path = os.path.join(uploads_dir, filename)
+    row = conn.execute(text("""
+        SELECT user_id, SUM(rows) FROM ingest_manifest WHERE user_id != :all_users
+        GROUP BY user_id ORDER BY SUM(rows) DESC LIMIT 1
+    """), {"all_users": ALL_USERS}).fetchone()
+    return row[0] if row else None
+
+# One entry per Fitbit CSV: target model, timestamp column (csv, db, kind) and value columns (csv -> db).
+FILE_SPECS = [
+    {
+        "name": "Daily Activity",
+        "file": "dailyActivity_merged.csv",
+        "model": DailyActivity,
+        "time": ("ActivityDate", "activity_date", "date"),
+        "columns": {
+            "TotalSteps": "total_steps",
+            "TotalDistance": "total_distance",
+            "TrackerDistance": "tracker_distance",
+            "LoggedActivitiesDistance": "logged_activities_distance",
+            "VeryActiveDistance": "very_active_distance",
+            "ModeratelyActiveDistance": "moderately_active_distance",
+            "LightActiveDistance": "light_active_distance",
+            "SedentaryActiveDistance": "sedentary_active_distance",
+            "VeryActiveMinutes": "very_active_minutes",
+            "FairlyActiveMinutes": "fairly_active_minutes",
+            "LightlyActiveMinutes": "lightly_active_minutes",
+            "SedentaryMinutes": "sedentary_minutes",
+            "Calories": "calories",
+        },
+    },
+    {
+        "name": "Hourly Steps",
+        "file": "hourlySteps_merged.csv",
+        "model": HourlySteps,
+        "time": ("ActivityHour", "activity_hour", "datetime"),
+        "columns": {"StepTotal": "step_total"},
+    },
+    {
+        "name": "Minute Steps",
+        "file": "minuteStepsNarrow_merged.csv",
+        "model": MinuteSteps,
+        "time": ("ActivityMinute", "activity_minute", "datetime"),
+        "columns": {"Steps": "steps"},
+        "columnar": "minute_steps",
+    },
+    {
+        "name": "Sleep Logs",
+        "file": "sleepDay_merged.csv",
+        "model": SleepLog,
+        "time": ("SleepDay", "sleep_day", "date"),
+        "columns": {
+            "TotalSleepRecords": "total_sleep_records",
+            "TotalMinutesAsleep": "total_minutes_asleep",
+            "TotalTimeInBed": "total_time_in_bed",
+        },
+    },
+    {
+        "name": "Heart Rate",
+        "file": "heartrate_seconds_merged.csv",
+        "model": HeartRate,
+        "time": ("Time", "time", "datetime"),
+        "columns": {"Value": "value"},
+        "columnar": "heart_rate",
+        "rollups": True,
+    },
+]
+
+def detect_time_format(values, sample_size=200):
+    """First format in TIME_FORMATS that parses a sample of the column, or None (let pandas infer)."""
+    sample = values.dropna().astype(str).head(sample_size)
+    for fmt in TIME_FORMATS:
         try:
-            # Read only the 'Id' column to be fast
-            df = pd.read_csv(file_path, usecols=['Id'])
-            counts = df['Id'].value_counts().to_dict()
-            
-            for user_id, count in counts.items():
-                user_id_str = str(user_id)
-                user_counts[user_id_str] = user_counts.get(user_id_str, 0) + count
-                
-        except Exception as e:
-            print(f"Skipping check of {filename} due to error: {e}")
+            pd.to_datetime(sample, format=fmt)
+            return fmt
+        except (ValueError, TypeError):
             continue
+    return None
 
-    if not user_counts:
-        return None
+def parse_times(values):
+    """Vectorised timestamp parsing: one pd.to_datetime call with the detected format."""
+    fmt = detect_time_format(values)
+    return pd.to_datetime(values, format=fmt) if fmt else pd.to_datetime(values, format="mixed")
 
-    # Return the user ID with the highest total row count across all files
-    primary_user = max(user_counts, key=user_counts.get)
-    print(f"Identified primary User ID: {primary_user} (found {user_counts[primary_user]} records)")
-    return primary_user
+def prepare_frame(df, spec):
+    """CSV frame -> frame with the model's column names and parsed timestamps."""
+    csv_time, db_time, _ = spec["time"]
+    frame = pd.DataFrame({"user_id": df["Id"].astype(str), db_time: parse_times(df[csv_time])})
+    for csv_column, db_column in spec["columns"].items():
+        frame[db_column] = df[csv_column].to_numpy()
+    return frame
 
-def parse_date(date_str):
-    """Parses various date formats found in Fitbit CSVs."""
-    try:
-        return pd.to_datetime(date_str, format="%m/%d/%Y")
-    except:
-        pass
-    try:
-        return pd.to_datetime(date_str, format="%m/%d/%Y %I:%M:%S %p")
-    except:
-        return pd.to_datetime(date_str) # Let pandas guess as fallback
+def driver_rows(spec, frame):
+    """
+    Frame -> DBAPI rows: timestamps formatted once per column into
+    SQLAlchemy's SQLite storage format, plain Python scalars for sqlite3
+    (no numpy int64 / NaN).
+    """
+    _, db_time, kind = spec["time"]
+    rows = frame.copy()
+    rows[db_time] = rows[db_time].dt.strftime(SQLITE_DATE_FORMAT if kind == "date" else SQLITE_DATETIME_FORMAT)
+    rows = rows.astype(object).where(rows.notna(), None)
+    return list(rows.columns), list(rows.itertuples(index=False, name=None))
 
-def ingest_data():
-    engine = create_engine(DATABASE_URL)
-    Base.metadata.create_all(engine)
-    Session = sessionmaker(bind=engine)
-    session = Session()
-
-    print(f"Scanning {UPLOADS_DIR}...")
-    primary_user_id = get_primary_user_id(UPLOADS_DIR)
-    
-    if not primary_user_id:
-        print("No CSV files or user IDs found.")
-        return
+def insert_frame(conn, spec, frame):
+    """
+    Core-level bulk upsert: rows go to the DBAPI executemany in
+    INSERT_BATCH_ROWS batches.
+    """
+    _, db_time, _ = spec["time"]
+    columns, records = driver_rows(spec, frame)
+    table = spec["model"].__tablename__
+    updates = ", ".join(f"{column} = excluded.{column}" for column in spec["columns"].values())
+    # Upsert on the (user_id, time) natural key: re-imported rows replace what is stored.
+    sql = (
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)}) "
+        f"ON CONFLICT (user_id, {db_time}) DO UPDATE SET {updates}"
+    )
+    for start in range(0, len(records), INSERT_BATCH_ROWS):
+        conn.exec_driver_sql(sql, records[start:start + INSERT_BATCH_ROWS])
+    return len(records)
 
-    # 1. Daily Activity
-    try:
-        file_path = os.path.join(UPLOADS_DIR, "dailyActivity_merged.csv")
-        if os.path.exists(file_path):
-            print("Importing Daily Activity...")
-            df = pd.read_csv(file_path)
-            df['Id'] = df['Id'].astype(str)
-            df = df[df['Id'] == primary_user_id]
-            
-            for _, row in df.iterrows():
-                record = DailyActivity(
-                    user_id=row['Id'],
-                    activity_date=parse_date(row['ActivityDate']).date(),
-                    total_steps=row['TotalSteps'],
-                    total_distance=row['TotalDistance'],
-                    tracker_distance=row['TrackerDistance'],
-                    logged_activities_distance=row['LoggedActivitiesDistance'],
-                    very_active_distance=row['VeryActiveDistance'],
-                    moderately_active_distance=row['ModeratelyActiveDistance'],
-                    light_active_distance=row['LightActiveDistance'],
-                    sedentary_active_distance=row['SedentaryActiveDistance'],
-                    very_active_minutes=row['VeryActiveMinutes'],
-                    fairly_active_minutes=row['FairlyActiveMinutes'],
-                    lightly_active_minutes=row['LightlyActiveMinutes'],
-                    sedentary_minutes=row['SedentaryMinutes'],
-                    calories=row['Calories']
-                )
-                session.add(record)
-            session.commit()
-    except Exception as e:
-        print(f"Error importing Daily Activity: {e}")
-        session.rollback()
+def insert_new_frame(conn, spec, frame):
+    """
+    Insert only the rows whose (user_id, time) is not stored yet and return
+    them. Rows are staged in a TEMP table first, so the new ones can be told
+    apart in one indexed anti-join before the `ON CONFLICT DO NOTHING` insert.
+    """
+    _, db_time, _ = spec["time"]
+    frame = frame.drop_duplicates(["user_id", db_time], keep="last")
+    columns, records = driver_rows(spec, frame)
+    table = spec["model"].__tablename__
+    staging = f"temp.{table}_staging"
+    conn.exec_driver_sql(f"CREATE TEMP TABLE IF NOT EXISTS {table}_staging (pos, {', '.join(columns)})")
+    conn.exec_driver_sql(f"DELETE FROM {staging}")
+    sql = f"INSERT INTO {staging} VALUES (?, {', '.join('?' for _ in columns)})"
+    staged = [(pos, *record) for pos, record in enumerate(records)]
+    for start in range(0, len(staged), INSERT_BATCH_ROWS):
+        conn.exec_driver_sql(sql, staged[start:start + INSERT_BATCH_ROWS])
+    positions = [row[0] for row in conn.exec_driver_sql(f"""
+        SELECT s.pos FROM {staging} s
+        WHERE NOT EXISTS (SELECT 1 FROM {table} t WHERE t.user_id = s.user_id AND t.{db_time} = s.{db_time})
+    """)]
+    # `WHERE true` keeps SQLite from reading ON CONFLICT as a join constraint.
+    conn.exec_driver_sql(f"""
+        INSERT INTO {table} ({', '.join(columns)}) SELECT {', '.join(columns)} FROM {staging} WHERE true
+        ON CONFLICT (user_id, {db_time}) DO NOTHING
+    """)
+    conn.exec_driver_sql(f"DELETE FROM {staging}")
+    return frame.iloc[sorted(positions)]
 
-    # 2. Hourly Steps
-    try:
-        file_path = os.path.join(UPLOADS_DIR, "hourlySteps_merged.csv")
-        if os.path.exists(file_path):
-            print("Importing Hourly Steps...")
-            df = pd.read_csv(file_path)
-            df['Id'] = df['Id'].astype(str)
-            df = df[df['Id'] == primary_user_id]
-
-            for _, row in df.iterrows():
-                record = HourlySteps(
-                    user_id=row['Id'],
-                    activity_hour=parse_date(row['ActivityHour']),
-                    step_total=row['StepTotal']
-                )
-                session.add(record)
-            session.commit()
-    except Exception as e:
-        print(f"Error importing Hourly Steps: {e}")
-        session.rollback()
+def csv_dtypes(spec):
+    """Explicit read dtypes: categorical ids, nullable ints / floats from the model columns, timestamps as text."""
+    columns = spec["model"].__table__.columns
+    dtypes = {"Id": "category", spec["time"][0]: "str"}
+    for csv_column, db_column in spec["columns"].items():
+        dtypes[csv_column] = "Int32" if isinstance(columns[db_column].type, Integer) else "float64"
+    return dtypes
 
-    # 3. Minute Steps
-    try:
-        file_path = os.path.join(UPLOADS_DIR, "minuteStepsNarrow_merged.csv")
-        if os.path.exists(file_path):
-            print("Importing Minute Steps...")
-            df = pd.read_csv(file_path)
-            df['Id'] = df['Id'].astype(str)
-            df = df[df['Id'] == primary_user_id]
-
-            for _, row in df.iterrows():
-                record = MinuteSteps(
-                    user_id=row['Id'],
-                    activity_minute=parse_date(row['ActivityMinute']),
-                    steps=row['Steps']
-                )
-                session.add(record)
-            session.commit()
-    except Exception as e:
-        print(f"Error importing Minute Steps: {e}")
-        session.rollback()
-        
-    # 4. Sleep Log
+def read_chunks(path, spec):
+    """Fixed-size chunks of only the columns `spec` needs, so memory does not grow with the file."""
+    dtypes = csv_dtypes(spec)
+    return pd.read_csv(path, usecols=list(dtypes), dtype=dtypes, chunksize=INGEST_CHUNK_ROWS)
+
+def write_chunk(conn, spec, frame):
+    """
+    Store one prepared chunk and return the rows it added or replaced. Heart
+    rate is insert-only (stored samples win), so only samples that were not
+    stored before are folded into the additive rollups, whatever the watermark.
+    """
+    if COLUMNAR_STORE and spec.get("columnar"):
+        # Samples go to Parquet; SQLite keeps only the rollups.
+        _, db_time, _ = spec["time"]
+        value_column = next(iter(spec["columns"].values()))
+        added = write_series(
+            spec["columnar"], frame.rename(columns={db_time: "time", value_column: "value"}), replace=False
+        )
+        written = frame.loc[added.index]
+    elif spec.get("rollups"):
+        written = insert_new_frame(conn, spec, frame)
+    else:
+        insert_frame(conn, spec, frame)
+        written = frame
+    if spec.get("rollups"):
+        update_hr_rollups(conn, written)
+    return written
+
+def new_rows(frame, spec, watermarks):
+    """
+    Fast path for append-only re-runs: rows after each user's watermark.
+    Tables without rollups keep the watermark row itself, so a partial last
+    day/hour from the previous export is refreshed by the upsert. Correctness
+    does not depend on it; the natural-key writes in write_chunk do.
+    """
+    if not watermarks:
+        return frame
+    times = frame[spec["time"][1]]
+    marks = pd.to_datetime(frame["user_id"].map(watermarks))
+    after = times > marks if spec.get("rollups") else times >= marks
+    return frame[marks.isna() | after]
+
+def parse_file(spec, path, user_ids=None, watermarks=None):
+    """
+    Parser side: stream one Fitbit CSV in INGEST_CHUNK_ROWS chunks and yield
+    messages for the writer: ("chunk", frame) per prepared chunk of rows past
+    the watermarks, then ("done", None). Every user is kept unless
+    `user_ids` (an allow-list) is given.
+    """
+    for chunk in read_chunks(path, spec):
+        if user_ids is not None:
+            chunk = chunk[chunk["Id"].isin(user_ids)]
+        if chunk.empty:
+            continue
+        frame = new_rows(prepare_frame(chunk, spec), spec, watermarks)
+        if not frame.empty:
+            yield "chunk", frame
+    yield "done", None
+
+def write_file(engine, spec, file_hash, file_size, messages, user_ids=None, watermarks=None, progress=None):
+    """
+    Writer side: apply one file's parser messages in a single transaction,
+    together with its manifest entries (one per user, plus ALL_USERS when no
+    allow-list was applied). Returns {user_id: rows written}; a parser error
+    rolls the file back.
+    """
+    rows, last_times = {}, {}
+    time_column = spec["time"][1]
+    # Users the parser skipped entirely keep the watermark they came with.
+    last_times.update({user: pd.Timestamp(last) for user, last in (watermarks or {}).items()})
+
+    def record(conn, user, last, count):
+        record_ingest(conn, spec["file"], file_hash, file_size, user, last.isoformat(sep=" ") if last else None,
+                      count)
+
+    with engine.begin() as conn:
+        for kind, payload in messages:
+            if kind == "error":
+                raise RuntimeError(payload)
+            if kind == "done":
+                users = set(rows) | {str(user_id) for user_id in user_ids or ()}
+                for user in users:
+                    record(conn, user, last_times.get(user), rows.get(user, 0))
+                if user_ids is None:
+                    record(conn, ALL_USERS, max(last_times.values(), default=None), sum(rows.values()))
+                return rows
+            written = write_chunk(conn, spec, payload)
+            sizes = written.groupby("user_id", sort=False).size()
+            for user, chunk_last in payload.groupby("user_id", sort=False)[time_column].max().items():
+                rows[user] = rows.get(user, 0) + int(sizes.get(user, 0))
+                last_times[user] = max(last_times.get(user, chunk_last), chunk_last)
+            if progress:
+                progress(spec["name"], sum(rows.values()))
+    raise RuntimeError(f"{spec['file']}: parser stopped without finishing")
+
+def _parse_to_queue(index, path, user_ids, watermarks, queue):
+    """Pool worker: run parse_file and forward its messages (or the error) to the writer."""
     try:
-        file_path = os.path.join(UPLOADS_DIR, "sleepDay_merged.csv")
-        if os.path.exists(file_path):
-            print("Importing Sleep Logs...")
-            df = pd.read_csv(file_path)
-            df['Id'] = df['Id'].astype(str)
-            df = df[df['Id'] == primary_user_id]
-
-            for _, row in df.iterrows():
-                record = SleepLog(
-                    user_id=row['Id'],
-                    sleep_day=parse_date(row['SleepDay']).date(),
-                    total_sleep_records=row['TotalSleepRecords'],
-                    total_minutes_asleep=row['TotalMinutesAsleep'],
-                    total_time_in_bed=row['TotalTimeInBed']
-                )
-                session.add(record)
-            session.commit()
+        for message in parse_file(FILE_SPECS[index], path, user_ids, watermarks):
+            queue.put(message)
     except Exception as e:
-        print(f"Error importing Sleep Logs: {e}")
-        session.rollback()
+        queue.put(("error", f"{type(e).__name__}: {e}"))
+
+def _queue_messages(queue, future):
+    """Messages of one file from its queue, up to and including the terminal one."""
+    while True:
+        try:
+            message = queue.get(timeout=1)
+        except Empty:
+            if future.done() and queue.empty():
+                # The worker died without reporting (e.g. killed); its terminal message never comes.
+                yield "error", f"parser process failed: {future.exception()}"
+                return
+            continue
+        yield message
+        if message[0] != "chunk":
+            return
+
+def ingest_files(engine, uploads_dir, user_ids=None, workers=None, progress=None):
+    """
+    Ingest every Fitbit CSV present in `uploads_dir` for all users in it, or
+    only those in the `user_ids` allow-list. With `workers` > 1 the files are
+    parsed in a process pool and the prepared chunks stream back through
+    bounded queues to this process, the only SQLite writer; files are written
+    (one transaction each) largest first, so the run takes about as long as
+    the slowest file. Returns {file name: {user_id: rows written}, None if
+    skipped, or an error message}.
+    """
+    workers = max(1, int(workers or INGEST_WORKERS))
+    user_ids = sorted({str(user_id) for user_id in user_ids}) if user_ids else None
+    jobs = [
+        (index, os.path.join(uploads_dir, spec["file"]))
+        for index, spec in enumerate(FILE_SPECS)
+        if os.path.exists(os.path.join(uploads_dir, spec["file"]))
+    ]
+    jobs.sort(key=lambda job: os.path.getsize(job[1]), reverse=True)
+    results, hashes, sizes, watermarks = {}, {}, {}, {}
+    for index, path in list(jobs):
+        # Unchanged files are skipped here, before any parser is started.
+        with engine.connect() as conn:
+            manifest = get_manifest(conn, FILE_SPECS[index]["file"])
+        sizes[index] = os.path.getsize(path)
+        hashes[index], prefixes = prefix_digests(
+            path, {entry["file_size"] for entry in manifest.values() if entry["file_size"] is not None}
+        )
+        watermarks[index] = {
+            user: pd.Timestamp(last) for user, last in append_watermarks(manifest, prefixes).items()
+        }
+        if is_unchanged(manifest, hashes[index], user_ids):
+            results[FILE_SPECS[index]["name"]] = None
+            jobs.remove((index, path))
+
+    def write(index, messages, drain=False):
+        spec = FILE_SPECS[index]
+        try:
+            results[spec["name"]] = write_file(
+                engine, spec, hashes[index], sizes[index], messages, user_ids, watermarks[index], progress
+            )
+        except Exception as e:
+            results[spec["name"]] = f"{type(e).__name__}: {e}"
+        if drain:
+            # Consume what is left so a parser is never blocked on a full queue.
+            for _ in messages:
+                pass
+
+    if workers == 1 or len(jobs) < 2:
+        for index, path in jobs:
+            write(index, parse_file(FILE_SPECS[index], path, user_ids, watermarks[index]))
+        return results
+
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager, ProcessPoolExecutor(
+        max_workers=min(workers, len(jobs)), mp_context=context
+    ) as pool:
+        queues = {index: manager.Queue(maxsize=INGEST_QUEUE_CHUNKS) for index, _ in jobs}
+        futures = {
+            index: pool.submit(_parse_to_queue, index, path, user_ids, watermarks[index], queues[index])
+            for index, path in jobs
+        }
+        for index, _ in jobs:
+            write(index, _queue_messages(queues[index], futures[index]), drain=True)
+    return results
+
+def prepare_database():
+    """Write engine with the ORM tables and all migrations applied."""
+    engine = get_write_engine()
+    Base.metadata.create_all(engine)
+    run_migrations(engine)
+    return engine
+
+def ingest_directory(engine, uploads_dir, user_ids=None, workers=None, progress=None):
+    """ingest_files() plus triage-cache invalidation; returns (results, ids of users whose rows changed)."""
+    results = ingest_files(engine, uploads_dir, user_ids, workers, progress)
+    changed_users = {
+        user for rows in results.values() if isinstance(rows, dict) for user, count in rows.items() if count
+    }
+    # Cached triage results of these users no longer reflect the database.
+    with engine.begin() as conn:
+        mark_triage_stale(conn, changed_users)
+    return results, changed_users
+
+def estimate_rows(path, sample_bytes=1 << 16):
+    """Approximate data rows of a CSV from the line length of its first `sample_bytes`."""
+    with open(path, "rb") as f:
+        sample = f.read(sample_bytes)
+    lines = sample.count(b"\n")
+    if not lines:
+        return 0
+    return max(int(os.path.getsize(path) / (len(sample) / lines)) - 1, 0)
 
-    # 5. Heart Rate
+def run_ingest_job(payload, report):
+    """
+    Background job for uploaded exports (POST /api/ingest/fitbit).
+    payload: {"upload_dir", "users": optional allow-list, "workers": optional}.
+    ZIPs are unpacked first; every directory with Fitbit CSVs is then
+    ingested in turn. Progress details carry rows written per table.
+    The upload directory (archives and extracted copies) is removed once
+    the job succeeds or fails; the ingested data lives in the database.
+    """
+    upload_dir = payload["upload_dir"]
     try:
-        file_path = os.path.join(UPLOADS_DIR, "heartrate_seconds_merged.csv")
-        if os.path.exists(file_path):
-            print("Importing Heart Rate (this might take a while)...")
-            df = pd.read_csv(file_path)
-            df['Id'] = df['Id'].astype(str)
-            df = df[df['Id'] == primary_user_id]
-            
-            # Batch insert for performance
-            batch = []
-            for _, row in df.iterrows():
-                batch.append(HeartRate(
-                    user_id=row['Id'],
-                    time=parse_date(row['Time']),
-                    value=row['Value']
-                ))
-                if len(batch) >= 1000:
-                    session.add_all(batch)
-                    session.commit()
-                    batch = []
-            if batch:
-                session.add_all(batch)
-                session.commit()
-                
-    except Exception as e:
-        print(f"Error importing Heart Rate: {e}")
-        session.rollback()
+        return _ingest_upload(upload_dir, payload, report)
+    finally:
+        shutil.rmtree(upload_dir, ignore_errors=True)
+
+
+def _ingest_upload(upload_dir, payload, report):
+    report(0.0, "Unpacking upload")
+    directories = extract_csv_members(upload_dir, {spec["file"] for spec in FILE_SPECS})
+    if not directories:
+        raise ValueError("No Fitbit CSV files found in the upload")
+
+    engine = prepare_database()
+    expected = sum(
+        estimate_rows(os.path.join(directory, spec["file"]))
+        for directory in directories
+        for spec in FILE_SPECS
+        if os.path.exists(os.path.join(directory, spec["file"]))
+    )
+    started = time.perf_counter()
+    summary, tables, done_before, changed_users = {}, {}, {}, set()
+
+    def progress(name, rows):
+        tables[name] = done_before.get(name, 0) + rows
+        total = sum(tables.values())
+        report(min(total / max(expected, 1), 0.99), f"{total} rows ingested", {"tables": dict(tables)})
+
+    for directory in directories:
+        results, changed = ingest_directory(engine, directory, payload.get("users"), payload.get("workers"), progress)
+        changed_users |= changed
+        for name, rows in results.items():
+            entry = summary.setdefault(name, {"rows": 0, "skipped": 0, "errors": []})
+            if rows is None:
+                entry["skipped"] += 1
+            elif isinstance(rows, str):
+                entry["errors"].append(rows)
+            else:
+                entry["rows"] += sum(rows.values())
+        done_before = {name: entry["rows"] for name, entry in summary.items()}
+        tables.update(done_before)
+
+    if all(entry["errors"] and not entry["rows"] and not entry["skipped"] for entry in summary.values()):
+        raise RuntimeError("; ".join(error for entry in summary.values() for error in entry["errors"]))
+
+    total_rows = sum(entry["rows"] for entry in summary.values())
+    elapsed = time.perf_counter() - started
+    report(1.0, f"{total_rows} rows ingested", {"tables": done_before})
+    return {
+        "tables": summary,
+        "rows": total_rows,
+        "users": sorted(changed_users),
+        "seconds": round(elapsed, 2),
+        "rows_per_s": round(total_rows / max(elapsed, 1e-9)),
+    }
+
+def ingest_data(uploads_dir=UPLOADS_DIR, user_ids=None, workers=None):
+    engine = prepare_database()
+
+    if not any(os.path.exists(os.path.join(uploads_dir, spec["file"])) for spec in FILE_SPECS):
+        print(f"No Fitbit CSV files found in {uploads_dir}.")
+        return
+
+    scope = f"users {', '.join(map(str, user_ids))}" if user_ids else "all users"
+    print(f"Importing {uploads_dir} ({scope})...")
+    started = time.perf_counter()
+    counts = {}
+
+    def progress(name, rows):
+        counts[name] = rows
+        total = sum(counts.values())
+        elapsed = time.perf_counter() - started
+        tables = ", ".join(f"{table} {done}" for table, done in counts.items())
+        print(f"  {total} rows ({total / max(elapsed, 1e-9):,.0f} rows/s): {tables}")
+
+    results, changed_users = ingest_directory(engine, uploads_dir, user_ids, workers, progress)
+    for name, rows in results.items():
+        if rows is None:
+            print(f"{name}: unchanged since last import, skipped")
+        elif isinstance(rows, str):
+            print(f"Error importing {name}: {rows}")
+        else:
+            print(f"{name}: {sum(rows.values())} rows, {len(rows)} users")
+
+    total_rows = sum(sum(rows.values()) for rows in results.values() if isinstance(rows, dict))
+    with engine.connect() as conn:
+        primary_user_id = get_primary_user_id(conn)
+
+    elapsed = time.perf_counter() - started
+    print(f"Ingestion complete: {total_rows} rows for {len(changed_users)} users in {elapsed:.2f}s "
+          f"({total_rows / max(elapsed, 1e-9):,.0f} rows/s).")
+    if primary_user_id:
+        print(f"Primary User ID: {primary_user_id}")
 
-    print("Ingestion complete.")
-    session.close()
+def main():
+    parser = argparse.ArgumentParser(description="Import Fitbit CSV exports into the local database")
+    parser.add_argument("--users", nargs="*", help="Only import these user ids (default: all users)")
+    parser.add_argument("--uploads-dir", default=UPLOADS_DIR)
+    parser.add_argument("--workers", type=int, help=f"Parser processes (default: INGEST_WORKERS={INGEST_WORKERS})")
+    args = parser.parse_args()
+    ingest_data(args.uploads_dir, args.users, args.workers)
 
 if __name__ == "__main__":
-    ingest_data()
+    main()
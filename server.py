@@ -1,4 +1,5 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
@@ -6,13 +7,35 @@ from typing import Dict, Any, Optional
 from contextlib import asynccontextmanager
 import strategies
 import os
+import json
+import uuid
+import queue
+import shutil
+import asyncio
 from utils.logger import logger
+from utils.jobs import job_manager
+from utils.database import dispose_engines, get_read_engine, get_write_engine
+from utils.metrics import METRIC_SERIES, query_metrics
+from utils.migrations import run_migrations
+from utils.uploads import save_multipart_files
+from scripts.ingest_fitbit import run_ingest_job
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Starting ArcVault Health Companion Server...")
+    try:
+        run_migrations(get_write_engine())
+    except Exception as e:
+        logger.error(f"Database migrations failed: {e}")
+    if os.environ.get("MEDASR_WARMUP") == "True":
+        # Probe the working MedASR stage in the background so startup is not blocked.
+        from model_registry import ModelRegistry
+        asyncio.get_running_loop().run_in_executor(None, ModelRegistry.warmup_asr)
+    job_manager.resume()
     yield
     logger.info("Shutting down ArcVault Health Companion Server...")
+    job_manager.shutdown()
+    dispose_engines()
 
 app = FastAPI(title="ArcVault Health Companion", lifespan=lifespan)
 
@@ -46,9 +69,23 @@ loaded_strategies = {
     "monitoring": strategies.MonitoringStrategy()
 }
 
+# Background jobs (long-running actions)
+job_manager.register(
+    "transcribe",
+    loaded_strategies["consult"].run_transcription_job,
+    vault_category="transcript",
+    vault_tags=["consultation", "MedASR", "CAR0001"],
+)
+# Cohort triage writes one vault entry per patient itself.
+job_manager.register("cohort_triage", loaded_strategies["home_triage"].run_cohort_triage_job)
+job_manager.register("fitbit_ingest", run_ingest_job)
+
 class ActionRequest(BaseModel):
     data: Dict[str, Any]
 
+class JobRequest(BaseModel):
+    payload: Dict[str, Any] = {}
+
 @app.get("/api/strategies")
 async def get_strategies():
     """Returns a list of available strategies with their metadata."""
@@ -79,6 +116,161 @@ async def run_strategy(strategy_id: str, request: ActionRequest):
         logger.error(f"Error executing strategy '{strategy_id}': {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# ── Background jobs ──
+
+@app.post("/api/jobs/{kind}")
+async def submit_job(kind: str, request: JobRequest):
+    """Queues a long-running action and returns its job id immediately."""
+    logger.info(f"API Request: Submit job '{kind}'")
+    try:
+        job_id = job_manager.submit(kind, request.payload)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Unknown job kind")
+    return {"status": "queued", "job_id": job_id}
+
+@app.get("/api/jobs")
+async def list_jobs(limit: int = 20):
+    return job_manager.list(limit=limit)
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Returns status, progress and (once finished) the result of a job."""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+# ── Wearable data upload ──
+
+@app.post("/api/ingest/fitbit")
+async def upload_fitbit(request: Request, users: Optional[str] = None):
+    """
+    Streams Fitbit CSV/ZIP files (multipart/form-data) to disk and queues an
+    ingestion job; poll /api/jobs/{job_id} for rows per table. `users` is an
+    optional comma-separated allow-list of user ids.
+    """
+    upload_dir = os.path.join(UPLOADS_DIR, "fitbit", uuid.uuid4().hex)
+    try:
+        files = await save_multipart_files(request, upload_dir)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not files:
+        shutil.rmtree(upload_dir, ignore_errors=True)
+        raise HTTPException(status_code=400, detail="No files in upload")
+
+    payload = {"upload_dir": upload_dir, "files": files}
+    if users:
+        payload["users"] = [user.strip() for user in users.split(",") if user.strip()]
+    job_id = job_manager.submit("fitbit_ingest", payload)
+    total_bytes = sum(f["bytes"] for f in files)
+    logger.info(f"API Request: Fitbit upload ({len(files)} file(s), {total_bytes} bytes) -> job {job_id}")
+    return {"status": "queued", "job_id": job_id, "files": files}
+
+# ── Wearable metrics ──
+
+@app.get("/api/metrics/{series}")
+def get_metrics(
+    series: str,
+    user: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    points: int = 1000,
+    method: str = "lttb",
+    field: Optional[str] = None,
+):
+    """Time-range query of a stored wearable series, downsampled server-side (LTTB or min/max buckets)."""
+    if series not in METRIC_SERIES:
+        raise HTTPException(status_code=404, detail="Unknown series")
+    try:
+        with get_read_engine().connect() as conn:
+            return query_metrics(conn, series, user, start, end, points=points, method=method, field=field)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# ── Streaming transcription (Consult) ──
+
+def _sse_event(event: str, payload) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+@app.get("/api/stream/consult/transcribe")
+def stream_consult_transcription():
+    """Streams transcript segments of the consult recording as Server-Sent Events."""
+    logger.info("API Request: Stream consult transcription")
+    strategy = loaded_strategies["consult"]
+
+    def events():
+        segments = []
+        try:
+            for segment in strategy.stream_transcription():
+                segments.append(segment)
+                yield _sse_event("segment", segment)
+            yield _sse_event("done", {"text": " ".join(s["text"] for s in segments), "segments": segments})
+        except Exception as e:
+            logger.error(f"Streaming transcription failed: {e}")
+            yield _sse_event("error", {"message": str(e)})
+
+    # Sync generator: Starlette iterates it in a worker thread, so inference does not block the loop.
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.websocket("/api/ws/consult/transcribe")
+async def live_consult_transcription(websocket: WebSocket):
+    """
+    Live consult transcription. The client sends binary frames of 16 kHz mono
+    float32 PCM and a text frame "end" when done; each decoded segment is sent
+    back as JSON as soon as it is finalized.
+    """
+    await websocket.accept()
+    strategy = loaded_strategies["consult"]
+    loop = asyncio.get_running_loop()
+    pcm_blocks = queue.Queue()
+    outgoing = asyncio.Queue()
+
+    def pcm_source():
+        while True:
+            block = pcm_blocks.get()
+            if block is None:
+                return
+            yield block
+
+    def run_transcription():
+        try:
+            for segment in strategy.stream_transcription(pcm_source()):
+                loop.call_soon_threadsafe(outgoing.put_nowait, {"event": "segment", **segment})
+            loop.call_soon_threadsafe(outgoing.put_nowait, {"event": "done"})
+        except Exception as e:
+            logger.error(f"Live transcription failed: {e}")
+            loop.call_soon_threadsafe(outgoing.put_nowait, {"event": "error", "message": str(e)})
+
+    async def send_results():
+        while True:
+            message = await outgoing.get()
+            await websocket.send_json(message)
+            if message["event"] in ("done", "error"):
+                return
+
+    worker = loop.run_in_executor(None, run_transcription)
+    sender = asyncio.create_task(send_results())
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes"):
+                pcm_blocks.put(message["bytes"])
+            elif message.get("text") == "end":
+                break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        pcm_blocks.put(None)
+
+    await worker
+    try:
+        await sender
+        await websocket.close()
+    except (WebSocketDisconnect, RuntimeError):
+        sender.cancel()
+
 # ... mount static ...
 
 # Serve static files with no-cache headers for development
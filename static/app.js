@@ -175,18 +175,39 @@ function renderTable(item) {
     `;
 }
 
-function renderChart(canvasId, config) {
-    const ctx = document.getElementById(canvasId).getContext('2d');
+async function renderChart(canvasId, config) {
+    let points = config.data.map(d => ({ label: `Day ${d.x}`, y: d.y }));
+
+    // Charts with a `source` are filled from the metrics API (already downsampled server-side)
+    if (config.source) {
+        const params = new URLSearchParams({
+            points: config.source.points || 1000,
+            method: config.source.method || 'lttb'
+        });
+        try {
+            const response = await fetch(`/api/metrics/${config.source.series}?${params}`);
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            const series = await response.json();
+            points = series.t.map((t, i) => ({ label: t.replace('T', ' ').slice(5, 16), y: series.v[i] }));
+        } catch (e) {
+            console.error(`Failed to load ${config.source.series} metrics:`, e);
+        }
+    }
+
+    const canvas = document.getElementById(canvasId);
+    if (!canvas) return; // View changed while loading
+    const ctx = canvas.getContext('2d');
     new Chart(ctx, {
         type: config.chart_type,
         data: {
-            labels: config.data.map(d => `Day ${d.x}`),
+            labels: points.map(p => p.label),
             datasets: [{
                 label: config.label,
-                data: config.data.map(d => d.y),
+                data: points.map(p => p.y),
                 borderColor: config.color,
                 backgroundColor: config.color + '20',
-                tension: 0.4,
+                tension: config.source ? 0 : 0.4,
+                pointRadius: config.source ? 0 : 3,
                 fill: true
             }]
         },
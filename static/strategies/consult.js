@@ -83,20 +83,21 @@ export class ConsultStrategy extends BaseStrategy {
                 return;
             }
 
-            // 2. Start Transcription (Background)
-            // Ideally we'd stream, but for now we wait for valid segments
+            // 2. Stream Transcription (segments arrive as each chunk is decoded)
             const view = container.querySelector('#transcript-view');
             view.innerHTML = `<div class="flex items-center justify-center h-full text-brand-accent animate-pulse">Transcribing... (This may take a moment)</div>`;
 
-            const transResp = await this.runAction('transcribe');
+            let transResp = await this.streamTranscription(view);
+            if (transResp.status === 'unavailable') {
+                // No stream (unsupported, proxied or dropped): fall back to one blocking request.
+                view.innerHTML = `<div class="flex items-center justify-center h-full text-brand-accent animate-pulse">Transcribing... (This may take a moment)</div>`;
+                transResp = await this.runAction('transcribe');
+            }
 
             if (transResp.status === 'success') {
                 this.transcriptSegments = transResp.data.segments;
                 status.innerHTML = `<span class="text-green-400">✓ Transcription Ready</span>`;
 
-                // Reset view
-                view.innerHTML = '';
-
                 // Enable actions
                 container.querySelector('#consult-actions').classList.remove('opacity-50', 'pointer-events-none');
 
@@ -115,6 +116,46 @@ export class ConsultStrategy extends BaseStrategy {
         }
     }
 
+    streamTranscription(view) {
+        // Server-Sent Events: render each finalized chunk as soon as it is decoded.
+        // Resolves { status: 'unavailable' } when the stream itself fails.
+        if (typeof EventSource === 'undefined') {
+            return Promise.resolve({ status: 'unavailable' });
+        }
+        return new Promise((resolve) => {
+            const source = new EventSource('/api/stream/consult/transcribe');
+            let first = true;
+
+            source.addEventListener('segment', (e) => {
+                const seg = JSON.parse(e.data);
+                if (first) {
+                    view.innerHTML = '';
+                    first = false;
+                }
+                const p = document.createElement('p');
+                p.className = "p-2 rounded text-slate-400 animate-fade-in";
+                p.textContent = seg.text;
+                view.appendChild(p);
+                p.scrollIntoView({ behavior: 'smooth', block: 'end' });
+            });
+
+            source.addEventListener('done', (e) => {
+                source.close();
+                resolve({ status: 'success', data: JSON.parse(e.data) });
+            });
+
+            source.addEventListener('error', (e) => {
+                source.close();
+                if (e.data) {
+                    // Error event sent by the server: transcription itself failed.
+                    resolve({ status: 'error', message: JSON.parse(e.data).message });
+                } else {
+                    resolve({ status: 'unavailable' });
+                }
+            });
+        });
+    }
+
     startSyncLoop(audio, view) {
         // Clear view first
         view.innerHTML = '';
@@ -1,6 +1,12 @@
+import os
 from .base import CareStageStrategy
 from model_registry import ModelRegistry
 
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONSULT_AUDIO_PATH = os.path.join(
+    BASE_DIR, "data", "uploads", "Medical_conversations", "Data", "Audio Recordings", "CAR0001.mp3"
+)
+
 class ConsultStrategy(CareStageStrategy):
     def get_metadata(self) -> dict:
         return {
@@ -54,10 +60,8 @@ class ConsultStrategy(CareStageStrategy):
              return {"status": "success", "data": result}
 
     def transcribe_audio(self):
-        import os
         # Locate the file
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        audio_path = os.path.join(base_dir, "data", "uploads", "Medical_conversations", "Data", "Audio Recordings", "CAR0001.mp3")
+        audio_path = CONSULT_AUDIO_PATH
         
         if not os.path.exists(audio_path):
             return {"status": "error", "message": f"Audio file not found at {audio_path}"}
@@ -74,8 +78,36 @@ class ConsultStrategy(CareStageStrategy):
             "data": result # Contains text and segments
         }
 
+    def run_transcription_job(self, payload, report):
+        """
+        Background job handler: long-form transcription of the consult
+        recording with per-chunk progress. The job queue stores the result
+        in the vault.
+        """
+        audio_path = CONSULT_AUDIO_PATH
+        if not os.path.exists(audio_path):
+            raise FileNotFoundError(f"Audio file not found at {audio_path}")
+
+        def on_progress(done, total):
+            report(done / total, f"Transcribed chunk {done}/{total}")
+
+        result = ModelRegistry.transcribe_long_audio("medasr", audio_path, progress=on_progress)
+        # Errors come back as text without segments (e.g. "ASR Model not found.")
+        if result.get("text") and not result.get("segments"):
+            raise RuntimeError(result["text"])
+        return result
+
+    def stream_transcription(self, source=None):
+        """
+        Yields transcript segments as each chunk is decoded.
+        `source` defaults to the consult recording; pass an iterable of
+        16 kHz mono float32 PCM blocks for a live consult.
+        """
+        if source is None:
+            source = CONSULT_AUDIO_PATH
+        yield from ModelRegistry.transcribe_audio_stream("medasr", source)
+
     def generate_clinical_note(self, transcript):
-        import os
         if os.environ.get("DEMO_MODE") == "True":
             from data.medical_vault import vault
             entries = vault.get_entries(category="clinical_note", limit=10)
@@ -1,15 +1,19 @@
 import os
 import json
-from sqlalchemy import create_engine, text
+import time
+from sqlalchemy import bindparam, text
 from .base import CareStageStrategy
 from model_registry import ModelRegistry
 from data.medical_vault import vault
+from utils.circadian import RHYTHM_KEYS, compute_cohort_rhythm_features
+from utils.database import get_read_engine
+from utils.hr_rollups import HR_ZONES
 from utils.logger import logger
+from utils.triage_cache import fingerprint, triage_cache
 
-# Database configuration
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DB_PATH = os.path.join(BASE_DIR, "data", "db", "health_companion.db")
-DATABASE_URL = f"sqlite:///{DB_PATH}"
+HR_ZONE_NAMES = [name for name, _, _ in HR_ZONES]
+# Days of timestamped data behind the circadian features (IS/IV need more than one week to be stable).
+RHYTHM_WINDOW_DAYS = int(os.environ.get("RHYTHM_WINDOW_DAYS", "14"))
 
 
 class HomeTriageStrategy(CareStageStrategy):
@@ -55,57 +59,35 @@ class HomeTriageStrategy(CareStageStrategy):
             logger.error(f"Save failed: {e}")
             return {"status": "error", "message": f"Save failed: {str(e)}"}
 
-    def analyze_trends(self):
-        """Queries DB and uses AI logprobs to classify patient status across 5 dimensions."""
-        import os
-        if os.environ.get("DEMO_MODE") == "True":
-            logger.info("Demo Mode: Fetching Home Triage from Vault")
-            entries = vault.get_entries(category="Home Triage", limit=1)
-            if entries:
-                return {
-                    "status": "success",
-                    "message": "Multi-dimensional Health Analysis Complete (DEMO)",
-                    "data": entries[0]["content"],
-                    "metrics": self._fetch_patient_data()
-                }
-
+    def analyze_trends(self, window_days=7):
+        """
+        Queries DB and uses AI logprobs to classify patient status across 5 dimensions.
+        Results are cached per user under a fingerprint of the metrics, prompt
+        templates and model revision; ingestion marks a user's entry stale.
+        Results scored by the uniform fallback (model missing or failed) are
+        not cached, and a failed cache write never fails the analysis.
+        """
         try:
+            with get_read_engine().connect() as conn:
+                user_id = self._resolve_user_id(conn)
+            context = self._triage_context()
+            cached = triage_cache.get(user_id, window_days)
+            if cached and not cached["stale"] and cached["context"] == context:
+                logger.info("Home Triage served from cache")
+                return self._cached_response(cached["result"])
+
             logger.info("Starting Home Triage Analysis...")
-            data = self._fetch_patient_data()
-            
-            # ... dimensions definition ...
-            dimensions = [
-                {
-                    "name": "Metabolic Engine",
-                    "focus": "Activity Volume",
-                    "choices": ["Sedentary", "Maintenance", "Active", "Athletic"],
-                    "prompt": self._build_metabolic_prompt(data)
-                },
-                {
-                    "name": "Recovery Index",
-                    "focus": "Sleep Health",
-                    "choices": ["Deprived", "Fragmented", "Restored", "Excessive"],
-                    "prompt": self._build_recovery_prompt(data)
-                },
-                {
-                    "name": "Cardio Load",
-                    "focus": "Heart Rate Zones",
-                    "choices": ["Bradycardic", "Normal", "Elevated", "Strain"],
-                    "prompt": self._build_cardio_prompt(data)
-                },
-                {
-                    "name": "Circadian Rhythm",
-                    "focus": "Routine Stability",
-                    "choices": ["Chaotic", "Shifted", "Rhythmic", "Rigid"],
-                    "prompt": self._build_circadian_prompt(data)
-                },
-                {
-                    "name": "Medical Checkup Necessity",
-                    "focus": "Risk Assessment",
-                    "choices": ["Unnecessary", "Routine", "Recommended", "Urgent", "Critical"],
-                    "prompt": self._build_checkup_prompt(data)
-                }
-            ]
+            data = self._fetch_patient_data(user_id, window_days)
+            data_fingerprint = fingerprint(context, data)
+            if cached and cached["fingerprint"] == data_fingerprint:
+                logger.info("Home Triage inputs unchanged since ingestion; reusing cached result")
+                try:
+                    triage_cache.refresh(user_id, window_days)
+                except Exception as e:
+                    logger.warning(f"Could not refresh Home Triage cache entry: {e}")
+                return self._cached_response(cached["result"])
+
+            dimensions = self._build_dimensions(data)
             
             results = []
             for dim in dimensions:
@@ -117,13 +99,12 @@ class HomeTriageStrategy(CareStageStrategy):
             
             logger.info(f"Analysis complete. Metrics: {data}")
 
-            return {
+            response = {
                 "status": "success",
                 "message": "Multi-dimensional Health Analysis Complete",
                 "data": results,
                 "metrics": data
             }
-
         except Exception as e:
             logger.error(f"Trend analysis failed: {e}")
             return {
@@ -132,40 +113,236 @@ class HomeTriageStrategy(CareStageStrategy):
                 "data": []
             }
 
-    def _fetch_patient_data(self):
-        engine = create_engine(DATABASE_URL)
-        data = {}
+        if any(self._is_fallback(analysis["all_probs"]) for analysis in results):
+            logger.warning("Home Triage used fallback probabilities; result not cached")
+            return response
+        try:
+            # Best-effort: the single write connection may be held by an ingestion job.
+            triage_cache.put(user_id, window_days, context, data_fingerprint, response)
+        except Exception as e:
+            logger.warning(f"Could not cache Home Triage result: {e}")
+        return response
+
+    @staticmethod
+    def _is_fallback(probs):
+        """True for the exact uniform distribution ModelRegistry returns when no model could score the prompt."""
+        return all(p == 1.0 / len(probs) for p in probs.values())
+
+    def _cached_response(self, response):
+        return {**response, "message": f"{response['message']} (cached)", "cached": True}
+
+    def _triage_context(self):
+        """Fingerprint of everything but the metrics: rendered prompt templates and model revision."""
+        placeholders = {
+            key: {zone: f"<{key}.{zone}>" for zone in value} if isinstance(value, dict) else f"<{key}>"
+            for key, value in self._empty_metrics("<user_id>").items()
+        }
+        templates = [
+            {"name": dim["name"], "choices": dim["choices"], "prompt": dim["prompt"]}
+            for dim in self._build_dimensions(placeholders)
+        ]
+        return fingerprint(templates, ModelRegistry.get_model_revision("consult_reasoning"))
+
+    def batch_triage(self, user_ids=None, save=True, window_days=7, report=None):
+        """
+        Cohort triage: metrics for all `user_ids` (default: every user) from
+        set-based SQL, every dimension prompt of every patient scored in
+        batched logprob passes, then one vault entry per patient. Blocking:
+        run it through the "cohort_triage" job or scripts/cohort_triage.py.
+        """
+        try:
+            started = time.perf_counter()
+            with get_read_engine().connect() as conn:
+                if not user_ids:
+                    user_ids = self._list_user_ids(conn)
+                cohort = self._fetch_cohort_data(conn, user_ids, window_days)
+            if report:
+                report(0.1, f"Metrics computed for {len(cohort)} patients")
+
+            jobs = [(user_id, dim) for user_id, data in cohort.items() for dim in self._build_dimensions(data)]
+            logger.info(f"Cohort triage: scoring {len(jobs)} prompts for {len(cohort)} patients")
+            probs = ModelRegistry.compute_choice_probabilities_batch(
+                "consult_reasoning", [dim["prompt"] for _, dim in jobs], [dim["choices"] for _, dim in jobs]
+            )
+            if report:
+                report(0.8, "Dimensions scored")
+
+            patients = {user_id: {"user_id": user_id, "metrics": data, "data": []} for user_id, data in cohort.items()}
+            for (user_id, dim), dim_probs in zip(jobs, probs):
+                analysis = self._classify(dim["name"], dim_probs)
+                analysis["focus"] = dim["focus"]
+                patients[user_id]["data"].append(analysis)
+
+            if save:
+                for patient in patients.values():
+                    patient["vault_entry_id"] = vault.store_entry(
+                        category="Home Triage",
+                        content={"data": patient["data"], "metrics": patient["metrics"]},
+                        tags=["AI", "Triage", "Cohort", patient["user_id"]]
+                    )
+
+            elapsed = time.perf_counter() - started
+            per_minute = round(len(patients) / elapsed * 60, 1) if elapsed > 0 else 0.0
+            logger.info(f"Cohort triage: {len(patients)} patients in {elapsed:.1f}s ({per_minute} patients/min)")
+            return {
+                "status": "success",
+                "message": f"Cohort triage complete: {len(patients)} patients ({per_minute} patients/min)",
+                "data": list(patients.values()),
+                "throughput": {"patients": len(patients), "seconds": round(elapsed, 2), "patients_per_min": per_minute}
+            }
+
+        except Exception as e:
+            logger.error(f"Cohort triage failed: {e}")
+            return {"status": "error", "message": f"Cohort triage failed: {str(e)}", "data": []}
+
+    def run_cohort_triage_job(self, payload, report):
+        """Job handler for overnight cohort screening (see utils.jobs)."""
+        result = self.batch_triage(payload.get("user_ids"), save=payload.get("save", True), report=report)
+        if result["status"] != "success":
+            raise RuntimeError(result["message"])
+        return {"message": result["message"], "throughput": result["throughput"]}
+
+    def _build_dimensions(self, data):
+        return [
+            {
+                "name": "Metabolic Engine",
+                "focus": "Activity Volume",
+                "choices": ["Sedentary", "Maintenance", "Active", "Athletic"],
+                "prompt": self._build_metabolic_prompt(data)
+            },
+            {
+                "name": "Recovery Index",
+                "focus": "Sleep Health",
+                "choices": ["Deprived", "Fragmented", "Restored", "Excessive"],
+                "prompt": self._build_recovery_prompt(data)
+            },
+            {
+                "name": "Cardio Load",
+                "focus": "Heart Rate Zones",
+                "choices": ["Bradycardic", "Normal", "Elevated", "Strain"],
+                "prompt": self._build_cardio_prompt(data)
+            },
+            {
+                "name": "Circadian Rhythm",
+                "focus": "Routine Stability",
+                "choices": ["Chaotic", "Shifted", "Rhythmic", "Rigid"],
+                "prompt": self._build_circadian_prompt(data)
+            },
+            {
+                "name": "Medical Checkup Necessity",
+                "focus": "Risk Assessment",
+                "choices": ["Unnecessary", "Routine", "Recommended", "Urgent", "Critical"],
+                "prompt": self._build_checkup_prompt(data)
+            }
+        ]
+
+    def _resolve_user_id(self, conn):
+        """The implicit triage user: the one with the most daily records."""
+        row = conn.execute(text("""
+            SELECT user_id FROM daily_activity GROUP BY user_id ORDER BY COUNT(*) DESC LIMIT 1
+        """)).fetchone()
+        return row[0] if row else None
+
+    def _list_user_ids(self, conn):
+        return [row[0] for row in conn.execute(text("SELECT DISTINCT user_id FROM daily_activity ORDER BY user_id"))]
+
+    def _fetch_patient_data(self, user_id=None, window_days=7):
+        """
+        Per-user averages over the last `window_days` of that user's data.
+        Windows are anchored at the user's latest record (exports are
+        historical) and resolved through the (user_id, date/time) indexes,
+        so cost scales with the window, not total history.
+        """
+        engine = get_read_engine()
         with engine.connect() as conn:
-            # 1. Activity (Last 7 days)
-            res_act = conn.execute(text("""
-                SELECT AVG(total_steps), AVG(calories), AVG(sedentary_minutes), AVG(very_active_minutes)
-                FROM daily_activity ORDER BY activity_date DESC LIMIT 7
-            """)).fetchone()
-            data["avg_steps"] = round(res_act[0] or 0, 0)
-            data["avg_cals"] = round(res_act[1] or 0, 0)
-            data["avg_sedentary"] = round(res_act[2] or 0, 0)
-            data["avg_active_mins"] = round(res_act[3] or 0, 0)
-            
-            # 2. Sleep (Last 7 days)
-            res_sleep = conn.execute(text("""
-                SELECT AVG(total_minutes_asleep), AVG(total_time_in_bed)
-                FROM sleep_log ORDER BY sleep_day DESC LIMIT 7
-            """)).fetchone()
-            data["avg_sleep_mins"] = round(res_sleep[0] or 0, 0)
-            data["avg_bed_mins"] = round(res_sleep[1] or 0, 0)
+            if user_id is None:
+                user_id = self._resolve_user_id(conn)
+            if user_id is None:
+                return self._empty_metrics(None)
+            return self._fetch_cohort_data(conn, [user_id], window_days)[str(user_id)]
+
+    def _empty_metrics(self, user_id):
+        return {
+            "user_id": user_id, "avg_steps": 0, "avg_cals": 0, "avg_sedentary": 0, "avg_active_mins": 0,
+            "avg_sleep_mins": 0, "avg_bed_mins": 0, "sleep_hours": 0.0,
+            "max_hr": 0, "avg_hr": 0, "hr_zone_mins": {zone: 0 for zone in HR_ZONE_NAMES},
+            "rhythm": dict.fromkeys(RHYTHM_KEYS),
+        }
+
+    def _fetch_cohort_data(self, conn, user_ids, window_days=7):
+        """
+        `_fetch_patient_data` for many users at once: one grouped query per
+        table, each joined to a per-user window start. Returns {user_id: data}.
+        """
+        user_ids = [str(user_id) for user_id in user_ids]
+        params = {"user_ids": user_ids, "day_offset": f"-{window_days - 1} days"}
+        cohort = {user_id: self._empty_metrics(user_id) for user_id in user_ids}
+
+        # 1. Activity (Last 7 days)
+        res_act = conn.execute(text("""
+            SELECT d.user_id, AVG(d.total_steps), AVG(d.calories), AVG(d.sedentary_minutes), AVG(d.very_active_minutes)
+            FROM daily_activity d
+            JOIN (
+                SELECT user_id, date(MAX(activity_date), :day_offset) AS since
+                FROM daily_activity WHERE user_id IN :user_ids GROUP BY user_id
+            ) w ON d.user_id = w.user_id AND d.activity_date >= w.since
+            GROUP BY d.user_id
+        """).bindparams(bindparam("user_ids", expanding=True)), params)
+        for user_id, steps, cals, sedentary, active in res_act:
+            data = cohort[user_id]
+            data["avg_steps"] = round(steps or 0, 0)
+            data["avg_cals"] = round(cals or 0, 0)
+            data["avg_sedentary"] = round(sedentary or 0, 0)
+            data["avg_active_mins"] = round(active or 0, 0)
+
+        # 2. Sleep (Last 7 days)
+        res_sleep = conn.execute(text("""
+            SELECT s.user_id, AVG(s.total_minutes_asleep), AVG(s.total_time_in_bed)
+            FROM sleep_log s
+            JOIN (
+                SELECT user_id, date(MAX(sleep_day), :day_offset) AS since
+                FROM sleep_log WHERE user_id IN :user_ids GROUP BY user_id
+            ) w ON s.user_id = w.user_id AND s.sleep_day >= w.since
+            GROUP BY s.user_id
+        """).bindparams(bindparam("user_ids", expanding=True)), params)
+        for user_id, asleep, in_bed in res_sleep:
+            data = cohort[user_id]
+            data["avg_sleep_mins"] = round(asleep or 0, 0)
+            data["avg_bed_mins"] = round(in_bed or 0, 0)
             data["sleep_hours"] = round(data["avg_sleep_mins"] / 60, 1)
-            
-            # 3. Heart Rate (Recent)
-            res_hr = conn.execute(text("SELECT MAX(value), AVG(value) FROM heart_rate")).fetchone()
-            data["max_hr"] = res_hr[0] or 0
-            data["avg_hr"] = round(res_hr[1] or 0, 0)
-            
-        return data
+
+        # 3. Heart Rate (Last 7 days, from the daily rollup)
+        res_hr = conn.execute(text("""
+            SELECT h.user_id, MAX(h.hr_max), SUM(h.hr_sum) / SUM(h.n),
+                   SUM(h.zone_rest_s), SUM(h.zone_fat_burn_s), SUM(h.zone_cardio_s), SUM(h.zone_peak_s)
+            FROM heart_rate_day h
+            JOIN (
+                SELECT user_id, date(MAX(bucket), :day_offset) AS since
+                FROM heart_rate_day WHERE user_id IN :user_ids GROUP BY user_id
+            ) w ON h.user_id = w.user_id AND h.bucket >= w.since
+            GROUP BY h.user_id
+        """).bindparams(bindparam("user_ids", expanding=True)), params)
+        for user_id, max_hr, avg_hr, *zone_seconds in res_hr:
+            data = cohort[user_id]
+            data["max_hr"] = max_hr or 0
+            data["avg_hr"] = round(avg_hr or 0, 0)
+            data["hr_zone_mins"] = {
+                zone: round((seconds or 0) / 60 / window_days, 0)
+                for zone, seconds in zip(HR_ZONE_NAMES, zone_seconds)
+            }
+
+        # 4. Circadian / activity rhythm (timestamped steps and the HR minute rollup)
+        for user_id, rhythm in compute_cohort_rhythm_features(conn, user_ids, RHYTHM_WINDOW_DAYS).items():
+            cohort[user_id]["rhythm"] = rhythm
+
+        return cohort
 
     def _analyze_dimension(self, name, choices, prompt):
         # Call AI for logprobs
         probs = ModelRegistry.compute_choice_probabilities("consult_reasoning", prompt, choices)
-        
+        return self._classify(name, probs)
+
+    def _classify(self, name, probs):
         # Determine best fit
         best_choice = max(probs, key=probs.get)
         confidence = probs[best_choice]
@@ -214,19 +391,32 @@ class HomeTriageStrategy(CareStageStrategy):
         return f"<start_of_turn>user\n{prompt}<end_of_turn>\n<start_of_turn>model\n"
 
     def _build_cardio_prompt(self, data):
+        zones = data["hr_zone_mins"]
         prompt = (
             f"Analyze user cardio load.\n"
-            f"Data: Max HR {data['max_hr']}, Avg HR {data['avg_hr']}.\n"
+            f"Data: Max HR {data['max_hr']}, Avg HR {data['avg_hr']}, "
+            f"Resting HR {data['rhythm']['resting_hr'] or 'n/a'}.\n"
+            f"Daily mins by zone: {zones['fat_burn']} fat burn, {zones['cardio']} cardio, {zones['peak']} peak.\n"
             f"Classify strictly as one of: [Bradycardic, Normal, Elevated, Strain].\n"
             f"Classification:"
         )
         return f"<start_of_turn>user\n{prompt}<end_of_turn>\n<start_of_turn>model\n"
     
     def _build_circadian_prompt(self, data):
-        # Note: Approximation due to lack of timestamps
+        rhythm = data["rhythm"]
+        if rhythm["interdaily_stability"] is None:
+            rhythm_line = "(Not enough timestamped activity, assume average stability)."
+        else:
+            rhythm_line = (
+                f"Interdaily stability {rhythm['interdaily_stability']} (0-1, higher = steadier day-to-day), "
+                f"intradaily variability {rhythm['intradaily_variability']} (0-2, higher = more fragmented), "
+                f"relative amplitude {rhythm['relative_amplitude']}, "
+                f"least active 5h from {rhythm['l5_onset_h']}:00, most active 10h from {rhythm['m10_onset_h']}:00, "
+                f"sleep midpoint {rhythm['sleep_midpoint_h']}h with variance {rhythm['sleep_midpoint_var_h2']}h^2."
+            )
         prompt = (
             f"Analyze user circadian rhythm stability.\n"
-            f"Data: Avg sleep {data['sleep_hours']}h. (Timestamps unavailable, assume average stability).\n"
+            f"Data: Avg sleep {data['sleep_hours']}h. {rhythm_line}\n"
             f"Classify strictly as one of: [Chaotic, Shifted, Rhythmic, Rigid].\n"
             f"Classification:"
         )
@@ -9,17 +9,13 @@ class MonitoringStrategy(CareStageStrategy):
                {
                    "type": "chart",
                    "chart_type": "line",
-                   "label": "Recovery Trajectory",
-                   "data": [
-                       {"x": 1, "y": 80},
-                       {"x": 2, "y": 70},
-                       {"x": 3, "y": 40},
-                       {"x": 4, "y": 30},
-                       {"x": 5, "y": 10}
-                   ],
+                   "label": "Heart Rate (bpm)",
+                   # Filled by the client from /api/metrics, downsampled server-side.
+                   "source": {"series": "heart_rate", "points": 500, "method": "minmax"},
+                   "data": [],
                    "color": "#64FFDA"
                },
-               {"type": "text", "text": "Recovery Trajectory: On Track", "style": "success"}
+               {"type": "text", "text": "Heart rate over the last 7 days of recorded data", "style": "success"}
             ]
         }
 
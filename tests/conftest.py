@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def temp_database(tmp_path, monkeypatch):
+    """Point the shared engines at an empty SQLite file for the duration of a test."""
+    import utils.database as database
+
+    database.dispose_engines()
+    monkeypatch.setattr(database, "DATABASE_URL", f"sqlite:///{tmp_path / 'health_companion.db'}")
+    yield database
+    database.dispose_engines()
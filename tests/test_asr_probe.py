@@ -0,0 +1,41 @@
+import pytest
+
+import model_registry
+from model_registry import ModelRegistry
+
+
+@pytest.fixture
+def probe(monkeypatch, tmp_path):
+    """probe_asr_stage against fake stages; returns the list of stages each call ran."""
+    monkeypatch.setattr(model_registry, "ASR_CAPABILITIES_PATH", str(tmp_path / "asr_capabilities.json"))
+    monkeypatch.setattr(ModelRegistry, "_asr_stage_cache", {})
+    monkeypatch.setattr(ModelRegistry, "_asr_environment", staticmethod(lambda model_path: {"torch": "x"}))
+    calls, outputs = [], {}
+
+    def run_stage(stage, model_path, speech, device, raise_errors=False):
+        calls.append(stage)
+        output = outputs.get(stage)
+        if isinstance(output, Exception):
+            raise output
+        return output
+
+    monkeypatch.setattr(ModelRegistry, "_medasr_run_stage", staticmethod(run_stage))
+    return calls, outputs
+
+
+def test_blank_transcript_of_noise_counts_as_capable(probe):
+    calls, outputs = probe
+    outputs.update(onnx=RuntimeError("no graph"), pipeline={"text": "", "segments": []})
+    assert ModelRegistry.probe_asr_stage("/models/medasr", "cpu") == "pipeline"
+    assert calls == ["onnx", "pipeline"]
+
+
+def test_negative_result_is_persisted(probe):
+    calls, outputs = probe
+    outputs.update(onnx=RuntimeError("no graph"))
+    assert ModelRegistry.probe_asr_stage("/models/medasr", "cpu") is None
+    assert calls == list(model_registry.ASR_STAGES)
+
+    ModelRegistry._asr_stage_cache.clear()
+    assert ModelRegistry.probe_asr_stage("/models/medasr", "cpu") is None
+    assert calls == list(model_registry.ASR_STAGES)  # read back from disk, not re-probed
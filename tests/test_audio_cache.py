@@ -0,0 +1,46 @@
+import os
+
+import numpy as np
+import pytest
+
+from utils import audio_cache
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(audio_cache, "PCM_CACHE_DIR", str(tmp_path / "pcm"))
+    return tmp_path
+
+
+def _recording(directory, name, seconds=1):
+    path = directory / name
+    path.write_bytes(name.encode() * 100)
+    return str(path), np.zeros(seconds * 16000, dtype=np.float32)
+
+
+def test_cached_pcm_is_a_read_only_map(cache_dir):
+    path, pcm = _recording(cache_dir, "a.wav")
+    assert audio_cache.get_cached_pcm(path) is None
+    audio_cache.store_pcm(path, pcm)
+    cached = audio_cache.get_cached_pcm(path)
+    assert isinstance(cached, np.memmap) and not cached.flags.writeable
+    assert np.array_equal(cached, pcm)
+
+
+def test_least_recently_used_entries_are_pruned(cache_dir, monkeypatch):
+    entry_bytes = 16000 * 4 + 128  # one second of float32 plus the .npy header
+    monkeypatch.setattr(audio_cache, "PCM_CACHE_MAX_BYTES", 2 * entry_bytes)
+    recordings = [_recording(cache_dir, f"{name}.wav") for name in "abc"]
+    for i, (path, pcm) in enumerate(recordings[:2]):
+        audio_cache.store_pcm(path, pcm)
+        cache_file = audio_cache._cache_path(audio_cache.file_digest(path), 16000)
+        os.utime(cache_file, ns=(i * 10**9, i * 10**9))
+
+    # Reading "a" makes "b" the least recently used entry.
+    assert audio_cache.get_cached_pcm(recordings[0][0]) is not None
+    audio_cache.store_pcm(*recordings[2])
+
+    assert audio_cache.get_cached_pcm(recordings[0][0]) is not None
+    assert audio_cache.get_cached_pcm(recordings[1][0]) is None
+    assert audio_cache.get_cached_pcm(recordings[2][0]) is not None
+    assert len(os.listdir(audio_cache.PCM_CACHE_DIR)) == 2
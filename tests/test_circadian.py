@@ -0,0 +1,108 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from scripts.ingest_fitbit import prepare_database
+from utils.circadian import (
+    RHYTHM_KEYS,
+    _nonparametric_rhythm,
+    _resting_hr_from_bins,
+    _sleep_midpoints,
+    compute_cohort_rhythm_features,
+)
+from utils.hr_rollups import update_hr_rollups
+
+DAYS = 14
+# Steps per clock hour: asleep 00-05, quiet 05-08 and 22-24, active 08-22.
+PROFILE = np.array([0] * 5 + [10] * 3 + [100] * 14 + [10] * 2, dtype=np.float64)
+
+
+def _hourly(days=DAYS):
+    return np.tile(PROFILE, days)
+
+
+def _minute_bins(daily_low, low_start=120):
+    """(sums, counts) per minute: 60 bpm all day with a 30 min dip to `daily_low[d]` on day d."""
+    values = np.full((len(daily_low), 1440), 60.0)
+    for day, low in enumerate(daily_low):
+        values[day, low_start:low_start + 30] = low
+    return values.ravel(), np.ones(values.size)
+
+
+def test_periodic_series_rhythm_metrics():
+    features = _nonparametric_rhythm(_hourly())
+    # A day repeated exactly is perfectly stable.
+    assert features["interdaily_stability"] == 1.0
+    # Squared hour-to-hour changes per day: 0->10, 10->100, 100->10, 10->0 (the last one not after the final day).
+    n, mean = 24 * DAYS, PROFILE.mean()
+    variance = DAYS * np.sum((PROFILE - mean) ** 2)
+    squared_steps = DAYS * (100 + 8100 + 8100 + 100) - 100
+    assert features["intradaily_variability"] == round(n * squared_steps / ((n - 1) * variance), 3)
+    assert (features["l5"], features["l5_onset_h"]) == (0.0, 0)
+    assert (features["m10"], features["m10_onset_h"]) == (100.0, 8)
+    assert features["relative_amplitude"] == 1.0
+
+
+def test_flat_or_short_series_has_no_rhythm():
+    assert _nonparametric_rhythm(np.full(24 * DAYS, 50.0)) == {}
+    assert _nonparametric_rhythm(_hourly(days=1)) == {}
+
+
+def test_sleep_midpoint_of_a_regular_sleeper():
+    assert _sleep_midpoints(_hourly()) == (2.5, 0.0)
+
+
+def test_sleep_midpoint_variance_of_a_shifting_sleeper():
+    # Every other night the quiet hours move two hours later: midpoints alternate 02:30 / 04:30.
+    late = np.roll(PROFILE, 2)
+    hourly = np.concatenate([PROFILE if day % 2 else late for day in range(DAYS + 1)])
+    mean_h, var_h2 = _sleep_midpoints(hourly)
+    assert mean_h == 3.5
+    # Circular spread of +-1 h: resultant length cos(pi / 12).
+    assert var_h2 == round(-2 * math.log(math.cos(math.pi / 12)) * (24 / (2 * math.pi)) ** 2, 3)
+
+
+def test_resting_hr_is_the_median_daily_low():
+    assert _resting_hr_from_bins(_minute_bins([55, 50, 58])) == 55.0
+    assert _resting_hr_from_bins(_minute_bins([55, 50])) == 52.5
+
+
+def test_resting_hr_ignores_sparse_windows():
+    sums, counts = _minute_bins([55, 50])
+    # Ten isolated minutes at 40 bpm, with nothing recorded 20 min either side: too few samples for any window.
+    counts[580:640] = 0
+    sums[580:640] = 0
+    sums[600:610], counts[600:610] = 40, 1
+    assert _resting_hr_from_bins((sums, counts)) == 52.5
+    assert _resting_hr_from_bins(None) is None
+
+
+def test_cohort_features_from_the_database(temp_database):
+    engine = prepare_database()
+    hours = pd.date_range("2016-04-01", periods=24 * DAYS, freq="h")
+    minutes = pd.date_range("2016-04-13", periods=2 * 1440, freq="min")
+    low_day = minutes.normalize() == pd.Timestamp("2016-04-14")
+    heart = np.where(minutes.hour == 3, np.where(low_day, 50, 55), 60)
+    with engine.begin() as conn:
+        conn.execute(
+            text("INSERT INTO hourly_steps (user_id, activity_hour, step_total) VALUES ('1', :hour, :steps)"),
+            [
+                {"hour": hour.strftime("%Y-%m-%d %H:%M:%S.%f"), "steps": int(steps)}
+                for hour, steps in zip(hours, _hourly())
+            ],
+        )
+        update_hr_rollups(conn, pd.DataFrame({"user_id": "1", "time": minutes, "value": heart}))
+
+    with engine.connect() as conn:
+        features = compute_cohort_rhythm_features(conn, ["1", "404"], window_days=DAYS)
+
+    assert features["404"] == dict.fromkeys(RHYTHM_KEYS)
+    user = features["1"]
+    assert user["days"] == DAYS
+    assert user["interdaily_stability"] == 1.0
+    assert (user["l5_onset_h"], user["m10_onset_h"]) == (0, 8)
+    assert (user["sleep_midpoint_h"], user["sleep_midpoint_var_h2"]) == (2.5, 0.0)
+    assert user["resting_hr"] == pytest.approx(52.5)
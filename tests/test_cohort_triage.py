@@ -0,0 +1,71 @@
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from scripts.ingest_fitbit import prepare_database
+from strategies.home_triage import HomeTriageStrategy
+
+
+def _days(last, count):
+    return [last - timedelta(days=i) for i in range(count)][::-1]
+
+
+@pytest.fixture
+def cohort_db(temp_database):
+    """User 1 has 20 days of data up to 2016-04-20, user 2 has 10 days up to 2016-04-10."""
+    engine = prepare_database()
+    with engine.begin() as conn:
+        for user_id, last, count in (("1", date(2016, 4, 20), 20), ("2", date(2016, 4, 10), 10)):
+            for day in _days(last, count):
+                params = {"user_id": user_id, "day": day.isoformat(), "d": day.day}
+                conn.execute(text("""
+                    INSERT INTO daily_activity (user_id, activity_date, total_steps, calories, sedentary_minutes,
+                                                very_active_minutes)
+                    VALUES (:user_id, :day, :d * 100, 2000, 600, :d)
+                """), params)
+                conn.execute(text("""
+                    INSERT INTO sleep_log (user_id, sleep_day, total_sleep_records, total_minutes_asleep,
+                                           total_time_in_bed)
+                    VALUES (:user_id, :day, 1, 400 + :d, 450)
+                """), params)
+                # The hottest day sits outside user 1's window and must not reach max_hr.
+                conn.execute(text("""
+                    INSERT INTO heart_rate_day (user_id, bucket, n, hr_min, hr_max, hr_mean, hr_sum, hr_sumsq,
+                                                zone_rest_s, zone_fat_burn_s, zone_cardio_s, zone_peak_s)
+                    VALUES (:user_id, :day, 1000, 50, CASE WHEN :d = 5 THEN 199 ELSE 100 + :d END, 70, 70000, 0,
+                            420, 0, 0, 0)
+                """), params)
+    return temp_database
+
+
+def test_cohort_windows_are_anchored_at_each_users_latest_day(cohort_db):
+    with cohort_db.get_read_engine().connect() as conn:
+        cohort = HomeTriageStrategy()._fetch_cohort_data(conn, ["1", "2"], window_days=7)
+
+    # User 1: 2016-04-14 .. 2016-04-20; user 2: 2016-04-04 .. 2016-04-10.
+    assert cohort["1"]["avg_steps"] == 1700
+    assert cohort["2"]["avg_steps"] == 700
+    assert cohort["1"]["avg_active_mins"] == 17
+    assert cohort["1"]["avg_sleep_mins"] == 417
+    assert cohort["2"]["avg_sleep_mins"] == 407
+    assert cohort["1"]["max_hr"] == 120
+    assert cohort["2"]["max_hr"] == 199
+    assert cohort["1"]["avg_hr"] == 70
+    assert cohort["1"]["hr_zone_mins"]["rest"] == 7
+
+
+def test_cohort_window_length_changes_the_bounds(cohort_db):
+    with cohort_db.get_read_engine().connect() as conn:
+        cohort = HomeTriageStrategy()._fetch_cohort_data(conn, ["1"], window_days=3)
+    # 2016-04-18 .. 2016-04-20
+    assert cohort["1"]["avg_steps"] == 1900
+    assert cohort["1"]["avg_sleep_mins"] == 419
+
+
+def test_users_without_data_get_empty_metrics(cohort_db):
+    strategy = HomeTriageStrategy()
+    with cohort_db.get_read_engine().connect() as conn:
+        cohort = strategy._fetch_cohort_data(conn, ["1", "404"], window_days=7)
+    assert cohort["404"] == strategy._empty_metrics("404")
+    assert cohort["1"]["rhythm"]["days"] is None  # no timestamped steps were loaded
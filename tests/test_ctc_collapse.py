@@ -0,0 +1,28 @@
+import torch
+
+from model_registry import ModelRegistry
+
+
+def _logits(rows, vocab=8):
+    """One-hot logits whose argmax per frame is the given id."""
+    return torch.nn.functional.one_hot(torch.tensor(rows), vocab).float()
+
+
+def test_collapse_drops_blanks_and_adjacent_repeats():
+    [(tokens, frames)] = ModelRegistry._ctc_collapse(_logits([[0, 3, 3, 0, 3, 5, 5, 0]]), blank_id=0)
+    assert tokens == [3, 3, 5]
+    assert frames == [1, 4, 5]
+
+
+def test_collapse_ignores_padded_frames():
+    logits = _logits([
+        [2, 2, 0, 6, 7, 7, 1, 1],
+        [4, 0, 4, 6, 1, 2, 3, 5],
+    ])
+    collapsed = ModelRegistry._ctc_collapse(logits, blank_id=0, output_lengths=[8, 4])
+    assert collapsed[0] == ([2, 6, 7, 1], [0, 3, 4, 6])
+    assert collapsed[1] == ([4, 4, 6], [0, 2, 3])
+
+
+def test_collapse_of_all_blank_row_is_empty():
+    assert ModelRegistry._ctc_collapse(_logits([[0, 0, 0]]), blank_id=0) == [([], [])]
@@ -0,0 +1,53 @@
+from model_registry import _CTCStitcher
+
+VOCAB = {1: "▁heart", 2: "▁rate", 3: "▁is", 4: "▁fine", 5: "s"}
+
+
+class FakeTokenizer:
+    all_special_tokens = []
+
+    def convert_ids_to_tokens(self, ids):
+        return [VOCAB[i] for i in ids]
+
+    def convert_tokens_to_string(self, tokens):
+        return "".join(tokens).replace("▁", " ")
+
+
+class FakeProcessor:
+    tokenizer = FakeTokenizer()
+
+    def decode(self, ids, skip_special_tokens=True):
+        return self.tokenizer.convert_tokens_to_string(self.tokenizer.convert_ids_to_tokens(ids))
+
+
+def _stitcher():
+    return _CTCStitcher(FakeProcessor(), chunk_s=20, stride_s=2)
+
+
+def test_overlap_is_cut_at_its_midpoint():
+    stitcher = _stitcher()
+    # Both chunks see the 18-20 s overlap; the first owns up to 19 s, the second from 19 s.
+    stitcher.add([1, 2, 3], [100, 1850, 1950], 0.01, start_s=0, is_first=True, is_last=False)
+    stitcher.add([2, 3, 4], [50, 150, 300], 0.01, start_s=18, is_first=False, is_last=True)
+    assert stitcher.token_ids == [1, 2, 3, 4]
+    assert stitcher.token_times == [1.0, 18.5, 19.5, 21.0]
+    assert stitcher.text() == "heart rate is fine"
+
+
+def test_token_emitted_by_both_chunks_at_the_cut_is_kept_once():
+    stitcher = _stitcher()
+    stitcher.add([1], [1899], 0.01, start_s=0, is_first=True, is_last=False)
+    stitcher.add([1, 2], [100, 200], 0.01, start_s=18, is_first=False, is_last=True)
+    assert stitcher.token_ids == [1, 2]
+
+
+def test_trailing_word_is_held_back_until_the_next_chunk():
+    stitcher = _stitcher()
+    stitcher.add([1, 2], [100, 1800], 0.01, start_s=0, is_first=True, is_last=False)
+    segment = stitcher.pop_segment()
+    assert segment["text"] == "heart"
+    # "rate" continues as "rates" across the cut.
+    stitcher.add([5, 3], [160, 300], 0.01, start_s=18, is_first=False, is_last=True)
+    segment = stitcher.pop_segment(final=True)
+    assert segment["text"] == "rates is"
+    assert segment["timestamp"] == (18.0, 21.01)
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+from utils.hr_rollups import RESOLUTIONS, ensure_rollup_tables, query_hr_rollup, update_hr_rollups
+
+EXACT = ["n", "hr_min", "hr_max", "hr_sum", "hr_sumsq"]
+
+
+def _samples(users=("1", "2"), hours=3, step_s=5, seed=0):
+    rng = np.random.default_rng(seed)
+    times = pd.date_range("2016-04-12 22:00:00", periods=hours * 3600 // step_s, freq=f"{step_s}s")
+    return pd.concat([
+        pd.DataFrame({"user_id": user, "time": times, "value": rng.integers(55, 180, len(times))})
+        for user in users
+    ], ignore_index=True)
+
+
+def _rollups(batches):
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        ensure_rollup_tables(conn)
+        for batch in batches:
+            update_hr_rollups(conn, batch)
+        return {
+            (user, resolution): query_hr_rollup(conn, user, resolution)
+            for user in ("1", "2")
+            for resolution in RESOLUTIONS
+        }
+
+
+def test_rollups_are_additive_across_batches():
+    samples = _samples()
+    whole = _rollups([samples])
+    # Uneven batches cut through minutes, hours and the midnight day boundary, fed out of order.
+    cuts = [0, 1234, 2160, 3001, 4444, len(samples)]
+    batches = [samples.iloc[a:b] for a, b in zip(cuts, cuts[1:])]
+    split = _rollups(batches[::-1])
+
+    for key, rows in whole.items():
+        assert [row["bucket"] for row in split[key]] == [row["bucket"] for row in rows]
+        for merged, expected in zip(split[key], rows):
+            for column in EXACT:
+                assert merged[column] == pytest.approx(expected[column]), (key, merged["bucket"], column)
+            assert merged["hr_mean"] == pytest.approx(expected["hr_sum"] / expected["n"])
+
+
+def test_day_rollup_matches_raw_samples():
+    samples = _samples(users=("1",))
+    [day] = [row for row in _rollups([samples])[("1", "day")] if row["bucket"] == "2016-04-12"]
+    raw = samples[samples["time"] < "2016-04-13"]["value"]
+    assert day["n"] == len(raw)
+    assert (day["hr_min"], day["hr_max"]) == (raw.min(), raw.max())
+    assert day["hr_mean"] == pytest.approx(raw.mean())
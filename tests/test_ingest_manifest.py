@@ -0,0 +1,96 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+
+from scripts.generate_fitbit_data import generate
+from scripts.ingest_fitbit import FILE_SPECS, ingest_directory, prepare_database
+from utils.ingest_manifest import ALL_USERS, get_manifest, is_unchanged
+
+TABLES = [spec["model"].__tablename__ for spec in FILE_SPECS]
+
+
+@pytest.fixture
+def export_dir(tmp_path):
+    generate(str(tmp_path / "export"), 2, date(2016, 4, 12), 2, 60, 7)
+    return tmp_path / "export"
+
+
+def _counts(engine):
+    with engine.connect() as conn:
+        return {table: conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar() for table in TABLES}
+
+
+def test_rerun_skips_unchanged_files_and_writes_nothing(temp_database, export_dir):
+    engine = prepare_database()
+    results, changed = ingest_directory(engine, str(export_dir))
+    assert all(isinstance(rows, dict) and sum(rows.values()) for rows in results.values())
+    assert len(changed) == 2
+    before = _counts(engine)
+
+    results, changed = ingest_directory(engine, str(export_dir))
+    assert set(results) == {spec["name"] for spec in FILE_SPECS}
+    assert all(rows is None for rows in results.values())
+    assert changed == set()
+    assert _counts(engine) == before
+
+
+def test_appended_rows_are_ingested_incrementally(temp_database, export_dir):
+    engine = prepare_database()
+    ingest_directory(engine, str(export_dir))
+    before = _counts(engine)
+
+    path = export_dir / "heartrate_seconds_merged.csv"
+    user_id = path.read_text().splitlines()[1].split(",")[0]
+    with open(path, "a") as f:
+        f.write(f"{user_id},4/14/2016 12:00:00 AM,70\n{user_id},4/14/2016 12:00:05 AM,72\n")
+
+    results, changed = ingest_directory(engine, str(export_dir))
+    assert results["Heart Rate"] == {user_id: 2}
+    assert changed == {user_id}
+    assert _counts(engine)["heart_rate"] == before["heart_rate"] + 2
+
+
+def test_manifest_records_file_hash_for_all_users(temp_database, export_dir):
+    engine = prepare_database()
+    ingest_directory(engine, str(export_dir))
+    with engine.connect() as conn:
+        manifest = get_manifest(conn, "dailyActivity_merged.csv")
+    file_hash = manifest[ALL_USERS]["file_hash"]
+    assert is_unchanged(manifest, file_hash)
+    assert not is_unchanged(manifest, "0" * 64)
+
+
+def _rollups_match_samples(engine):
+    with engine.connect() as conn:
+        samples = conn.execute(text("SELECT COUNT(*), SUM(value) FROM heart_rate")).one()
+        for table in ("heart_rate_minute", "heart_rate_hour", "heart_rate_day"):
+            assert tuple(conn.execute(text(f"SELECT SUM(n), SUM(hr_sum) FROM {table}")).one()) == tuple(samples)
+
+
+def test_older_export_ingested_second_is_not_lost(temp_database, export_dir, tmp_path):
+    engine = prepare_database()
+    ingest_directory(engine, str(export_dir))
+    april = _counts(engine)
+
+    # Same file names and users, earlier dates: nothing in it is past the April watermarks.
+    march_dir = tmp_path / "march"
+    generate(str(march_dir), 2, date(2016, 3, 12), 2, 60, 7)
+    results, changed = ingest_directory(engine, str(march_dir))
+    assert len(changed) == 2
+
+    with engine.connect() as conn:
+        march_days = conn.execute(text(
+            "SELECT COUNT(*) FROM daily_activity WHERE activity_date < '2016-04-01'"
+        )).scalar()
+    assert march_days == april["daily_activity"]
+    march_samples = len((march_dir / "heartrate_seconds_merged.csv").read_text().splitlines()) - 1
+    assert sum(results["Heart Rate"].values()) == march_samples
+    assert _counts(engine)["heart_rate"] == april["heart_rate"] + march_samples
+    _rollups_match_samples(engine)
+
+    # Re-importing April in full upserts every row but folds no sample into the rollups twice.
+    results, changed = ingest_directory(engine, str(export_dir))
+    assert results["Heart Rate"] == {user: 0 for user in results["Heart Rate"]}
+    assert _counts(engine)["heart_rate"] == april["heart_rate"] + march_samples
+    _rollups_match_samples(engine)
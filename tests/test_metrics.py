@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, text
+
+from utils.metrics import lttb, minmax, query_metrics
+
+
+def _series(n=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    x = np.arange(n, dtype=np.float64) * 60
+    y = np.cumsum(rng.normal(0, 1, n))
+    return x, y
+
+
+def test_lttb_keeps_endpoints_and_threshold_points():
+    x, y = _series()
+    kept = lttb(x, y, 200)
+    assert len(kept) == 200
+    assert kept[0] == 0 and kept[-1] == len(x) - 1
+    assert np.all(np.diff(kept) > 0)
+
+
+def test_lttb_returns_everything_below_threshold():
+    x, y = _series(50)
+    assert np.array_equal(lttb(x, y, 100), np.arange(50))
+
+
+def test_lttb_keeps_an_isolated_spike():
+    x, y = np.arange(1000, dtype=np.float64), np.zeros(1000)
+    y[637] = 100
+    assert 637 in lttb(x, y, 50)
+
+
+def test_minmax_keeps_extremes_of_every_bucket():
+    x, y = _series()
+    lo, hi = minmax(x, y, y, 100)
+    assert len(lo) == len(hi) <= 100
+    assert y[lo].min() == y.min() and y[hi].max() == y.max()
+    assert lo[0] < len(x) / 100 and hi[-1] >= len(x) - len(x) / 100
+
+
+@pytest.fixture
+def steps_conn():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE minute_steps (user_id TEXT, activity_minute TEXT, steps INTEGER)"))
+        rng = np.random.default_rng(1)
+        start = np.datetime64("2016-04-12T00:00")
+        conn.execute(
+            text("INSERT INTO minute_steps VALUES ('1', :t, :v)"),
+            [
+                {"t": str(start + np.timedelta64(i, "m")).replace("T", " ") + ":00", "v": int(v)}
+                for i, v in enumerate(rng.poisson(20, 3 * 1440))
+            ],
+        )
+    with engine.connect() as conn:
+        yield conn
+
+
+@pytest.mark.parametrize("method", ["lttb", "minmax"])
+def test_query_metrics_respects_points(steps_conn, method):
+    result = query_metrics(
+        steps_conn, "minute_steps", user_id="1", start="2016-04-12", end="2016-04-15", points=300, method=method
+    )
+    assert result["raw_points"] == 3 * 1440
+    assert 0 < len(result["v"]) <= 300
+    assert len(result["t"]) == len(result["v"])
+    assert result["t"] == sorted(result["t"])
+
+
+def test_query_metrics_lttb_keeps_window_endpoints(steps_conn):
+    result = query_metrics(steps_conn, "minute_steps", user_id="1", start="2016-04-12", end="2016-04-15", points=300)
+    assert result["t"][0] == "2016-04-12T00:00:00"
+    assert result["t"][-1] == "2016-04-14T23:59:00"
@@ -0,0 +1,25 @@
+import time
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from scripts.ingest_fitbit import prepare_database
+from utils.triage_cache import triage_cache
+
+
+def test_cache_write_round_trip(temp_database):
+    prepare_database()
+    triage_cache.put("1", 7, "ctx", "fp", {"data": [1]})
+    entry = triage_cache.get("1", 7)
+    assert (entry["context"], entry["fingerprint"], entry["result"], entry["stale"]) == ("ctx", "fp", {"data": [1]}, 0)
+
+
+def test_cache_write_fails_fast_while_ingestion_holds_the_writer(temp_database):
+    engine = prepare_database()
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO ingest_manifest VALUES ('x.csv', '1', 'h', 1, NULL, 0, 'now')"))
+        started = time.perf_counter()
+        with pytest.raises(OperationalError, match="locked"):
+            triage_cache.put("1", 7, "ctx", "fp", {})
+        assert time.perf_counter() - started < 5
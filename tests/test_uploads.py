@@ -0,0 +1,111 @@
+import os
+import zipfile
+
+import pytest
+from starlette.requests import Request
+
+from utils.uploads import extract_csv_members, save_multipart_files
+
+BOUNDARY = "testboundary"
+
+
+def _multipart_request(files, chunk_size=64):
+    """A Starlette request whose body is a multipart/form-data upload of {filename: bytes}, streamed in chunks."""
+    body = b""
+    for filename, content in files.items():
+        body += (
+            f"--{BOUNDARY}\r\n"
+            f'Content-Disposition: form-data; name="files"; filename="{filename}"\r\n'
+            "Content-Type: application/octet-stream\r\n\r\n"
+        ).encode() + content + b"\r\n"
+    body += f"--{BOUNDARY}--\r\n".encode()
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+
+    async def receive():
+        chunk = chunks.pop(0)
+        return {"type": "http.request", "body": chunk, "more_body": bool(chunks)}
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/api/ingest/fitbit",
+        "headers": [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())],
+    }
+    return Request(scope, receive)
+
+
+async def test_save_multipart_files_sanitises_names(tmp_path):
+    dest = tmp_path / "upload"
+    csv = b"Id,Time,Value\n1,4/12/2016 7:21:00 AM,97\n"
+    request = _multipart_request({
+        "../../etc/heart rate.csv": csv,
+        "C:\\exports\\fitbit.zip": b"PK",
+        ".hidden.csv": b"x",
+    })
+    saved = await save_multipart_files(request, str(dest))
+    assert saved == [
+        {"name": "heart_rate.csv", "bytes": len(csv)},
+        {"name": "fitbit.zip", "bytes": 2},
+        {"name": "hidden.csv", "bytes": 1},
+    ]
+    assert sorted(os.listdir(dest)) == ["fitbit.zip", "heart_rate.csv", "hidden.csv"]
+    assert (dest / "heart_rate.csv").read_bytes() == csv
+
+
+async def test_save_multipart_files_rejects_other_suffixes(tmp_path):
+    dest = tmp_path / "upload"
+    request = _multipart_request({"ok.csv": b"a,b\n", "payload.exe": b"MZ"})
+    with pytest.raises(ValueError, match="Unsupported file type"):
+        await save_multipart_files(request, str(dest))
+    assert not dest.exists()
+
+
+async def test_save_multipart_files_rejects_duplicate_names(tmp_path):
+    request = _multipart_request({"a/x.csv": b"1", "b/x.csv": b"2"})
+    with pytest.raises(ValueError, match="Duplicate"):
+        await save_multipart_files(request, str(tmp_path / "upload"))
+
+
+async def test_save_multipart_files_requires_multipart(tmp_path):
+    async def receive():
+        return {"type": "http.request", "body": b"{}", "more_body": False}
+
+    request = Request({"type": "http", "method": "POST", "headers": [(b"content-type", b"application/json")]}, receive)
+    with pytest.raises(ValueError, match="multipart"):
+        await save_multipart_files(request, str(tmp_path / "upload"))
+
+
+def test_extract_csv_members_flattens_member_paths(tmp_path):
+    wanted = {"dailyActivity_merged.csv", "sleepDay_merged.csv"}
+    with zipfile.ZipFile(tmp_path / "export.zip", "w") as zf:
+        zf.writestr("Fitabase 3.12-4.11/dailyActivity_merged.csv", "march")
+        zf.writestr("Fitabase 4.12-5.12/dailyActivity_merged.csv", "april")
+        zf.writestr("Fitabase 4.12-5.12/sleepDay_merged.csv", "sleep")
+        zf.writestr("../../outside/sleepDay_merged.csv", "escape")
+        zf.writestr("Fitabase 4.12-5.12/notes.txt", "ignored")
+
+    directories = extract_csv_members(str(tmp_path), wanted)
+
+    # Three distinct folders, numbered in name order; nothing is written outside the upload dir.
+    assert directories == [str(tmp_path / f"export_{i:03d}") for i in (1, 2, 3)]
+    assert (tmp_path / "export_001" / "sleepDay_merged.csv").read_text() == "escape"
+    assert (tmp_path / "export_002" / "dailyActivity_merged.csv").read_text() == "march"
+    assert sorted(os.listdir(tmp_path / "export_003")) == ["dailyActivity_merged.csv", "sleepDay_merged.csv"]
+    assert not (tmp_path.parent / "outside").exists()
+
+
+def test_extract_csv_members_orders_folders_numerically(tmp_path):
+    with zipfile.ZipFile(tmp_path / "export.zip", "w") as zf:
+        for month in range(1, 13):
+            zf.writestr(f"Fitabase 2016-{month:02d}/sleepDay_merged.csv", str(month))
+
+    directories = extract_csv_members(str(tmp_path), {"sleepDay_merged.csv"})
+
+    assert [open(os.path.join(d, "sleepDay_merged.csv")).read() for d in directories] == [
+        str(month) for month in range(1, 13)
+    ]
+
+
+def test_extract_csv_members_includes_directly_uploaded_csvs(tmp_path):
+    (tmp_path / "sleepDay_merged.csv").write_text("sleep")
+    assert extract_csv_members(str(tmp_path), {"sleepDay_merged.csv"}) == [str(tmp_path)]
@@ -0,0 +1,30 @@
+import numpy as np
+
+from utils.vad import SpeechMap, compact_speech
+
+SR = 16000
+
+
+def test_speech_map_shifts_times_back_to_each_region():
+    # Speech at 1-3 s and 10-11 s of the recording -> 0-2 s and 2-3 s of the compact timeline.
+    speech_map = SpeechMap([(1 * SR, 3 * SR), (10 * SR, 11 * SR)], sr=SR)
+    assert speech_map.to_original(0.0) == 1.0
+    assert speech_map.to_original(1.5) == 2.5
+    assert speech_map.to_original(2.0) == 10.0
+    assert speech_map.to_original(2.75) == 10.75
+
+
+def test_compact_speech_concatenates_regions():
+    speech = np.arange(10 * SR, dtype=np.float32)
+    regions = [(2 * SR, 3 * SR), (7 * SR, 9 * SR)]
+    compact, speech_map = compact_speech(speech, regions, sr=SR)
+    assert len(compact) == 3 * SR
+    assert compact[0] == 2 * SR
+    assert compact[SR] == 7 * SR
+    assert speech_map.to_original(len(compact) / SR) == 9.0
+
+
+def test_compact_speech_without_regions_is_empty():
+    compact, speech_map = compact_speech(np.ones(SR, dtype=np.float32), [], sr=SR)
+    assert len(compact) == 0
+    assert speech_map is None
@@ -0,0 +1,113 @@
+import hashlib
+import os
+import shutil
+import subprocess
+
+import numpy as np
+
+from utils.logger import logger
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PCM_CACHE_DIR = os.environ.get("PCM_CACHE_DIR", os.path.join(BASE_DIR, "data", "cache", "pcm"))
+# Size cap of the PCM cache; least recently used entries are pruned past it (about 2 h of 16 kHz audio per GB).
+PCM_CACHE_MAX_BYTES = int(os.environ.get("PCM_CACHE_MAX_MB", "2048")) * 1024 * 1024
+
+# (path, size, mtime) -> sha256, so unchanged files are only hashed once per process
+_hash_memo = {}
+
+
+def file_digest(path):
+    """SHA-256 of the file contents, memoised on (path, size, mtime)."""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if key in _hash_memo:
+        return _hash_memo[key]
+
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(block)
+    digest = sha.hexdigest()
+    _hash_memo[key] = digest
+    return digest
+
+
+def _cache_path(digest, target_sr):
+    return os.path.join(PCM_CACHE_DIR, f"{digest}_{target_sr}.npy")
+
+
+def get_cached_pcm(path, target_sr=16000):
+    """Return the cached PCM for `path` as a read-only memory map, or None."""
+    cache_file = _cache_path(file_digest(path), target_sr)
+    if not os.path.exists(cache_file):
+        return None
+    try:
+        pcm = np.load(cache_file, mmap_mode="r")
+        # mtime doubles as the last-use time for LRU pruning (atime is often disabled).
+        os.utime(cache_file)
+        return pcm
+    except Exception as e:
+        logger.warning(f"Discarding unreadable PCM cache entry {cache_file}: {e}")
+        os.remove(cache_file)
+        return None
+
+
+def store_pcm(path, pcm, target_sr=16000):
+    """Persist decoded PCM for `path` and return it memory-mapped from the cache."""
+    os.makedirs(PCM_CACHE_DIR, exist_ok=True)
+    cache_file = _cache_path(file_digest(path), target_sr)
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    with open(tmp_file, "wb") as f:
+        np.save(f, np.ascontiguousarray(pcm, dtype=np.float32))
+    os.replace(tmp_file, cache_file)
+    prune_cache(keep=cache_file)
+    return np.load(cache_file, mmap_mode="r")
+
+
+def prune_cache(max_bytes=None, keep=None):
+    """
+    Delete least recently used cache entries until the cache fits in
+    `max_bytes` (default PCM_CACHE_MAX_BYTES); `keep` is never deleted.
+    Returns the number of entries removed.
+    """
+    max_bytes = PCM_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries = []
+    for entry in os.scandir(PCM_CACHE_DIR):
+        if entry.name.endswith(".npy") and entry.is_file():
+            stat = entry.stat()
+            entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.warning(f"Could not prune PCM cache entry {path}: {e}")
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+
+def decode_with_ffmpeg(path, target_sr=16000):
+    """
+    Decode any ffmpeg-readable file straight to mono float32 PCM at
+    `target_sr` in a single pass (decode, downmix and resample in ffmpeg).
+    """
+    if shutil.which("ffmpeg") is None:
+        raise RuntimeError("ffmpeg not found on PATH")
+    cmd = [
+        "ffmpeg", "-nostdin", "-v", "error",
+        "-i", path,
+        "-ac", "1", "-ar", str(target_sr),
+        "-f", "f32le", "-acodec", "pcm_f32le",
+        "pipe:1",
+    ]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.decode(errors="ignore").strip() or f"ffmpeg exited with {proc.returncode}")
+    return np.frombuffer(proc.stdout, dtype=np.float32)
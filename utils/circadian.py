@@ -0,0 +1,230 @@
+import json
+import calendar
+from datetime import timedelta
+
+import numpy as np
+
+from utils.columnar import COLUMNAR_STORE, list_days, read_series
+
+# Rhythm metrics returned by compute_cohort_rhythm_features (None when there is not enough data).
+RHYTHM_KEYS = (
+    "interdaily_stability",
+    "intradaily_variability",
+    "l5",
+    "l5_onset_h",
+    "m10",
+    "m10_onset_h",
+    "relative_amplitude",
+    "sleep_midpoint_h",
+    "sleep_midpoint_var_h2",
+    "resting_hr",
+    "days",
+)
+
+STREAM_CHUNK_ROWS = 50_000
+RESTING_HR_WINDOW_MIN = 30   # resting HR = lowest rolling mean over this many minutes, per day
+MIN_VALID_FRACTION = 0.66    # share of a window that must have samples to count
+COHORT_BATCH_USERS = 256     # users per cohort query; bounds the dense (user, bin) arrays
+
+
+def _cohort_bins(conn, table, time_column, value_column, user_ids, window_days, bin_s):
+    """
+    Sum `value_column` into fixed `bin_s` bins over each user's window (the
+    `window_days` days up to their latest record) in one query. The window
+    starts are resolved first (one indexed MAX lookup per user, materialised)
+    and rows stream back as (user position, bin, value) chunks, each binned
+    with a single bincount over (user, bin). Returns {user_id: (sums, counts)}
+    for the users that have rows.
+    """
+    if not user_ids:
+        return {}
+    user_ids = [str(user_id) for user_id in user_ids]
+    n_bins = window_days * 86400 // bin_s
+    sums = np.zeros(len(user_ids) * n_bins, dtype=np.float64)
+    counts = np.zeros(len(user_ids) * n_bins, dtype=np.float64)
+
+    # DBAPI cursor: plain tuples convert to NumPy without the per-row Row overhead (see utils.metrics._fetch).
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute(
+            f"""
+            WITH w AS MATERIALIZED (
+                SELECT pos, user_id, since, CAST(strftime('%s', since) AS INTEGER) AS start_epoch FROM (
+                    SELECT u.key AS pos, u.value AS user_id,
+                           date((SELECT MAX({time_column}) FROM {table} WHERE user_id = u.value), :day_offset) AS since
+                    FROM json_each(:user_ids) u
+                )
+            )
+            SELECT w.pos, (CAST(strftime('%s', t.{time_column}) AS INTEGER) - w.start_epoch) / :bin_s, t.{value_column}
+            FROM w JOIN {table} t ON t.user_id = w.user_id AND t.{time_column} >= w.since
+            WHERE t.{value_column} IS NOT NULL
+            """,
+            {"user_ids": json.dumps(user_ids), "day_offset": f"-{window_days - 1} days", "bin_s": bin_s},
+        )
+        while chunk := cursor.fetchmany(STREAM_CHUNK_ROWS):
+            arr = np.array(chunk, dtype=np.float64)
+            index = arr[:, 1].astype(np.int64)
+            keep = (index >= 0) & (index < n_bins)
+            flat = arr[keep, 0].astype(np.int64) * n_bins + index[keep]
+            if not flat.size:
+                continue
+            # Rows arrive grouped by user, so a chunk only spans a narrow slice of the (user, bin) grid.
+            lo, hi = flat.min(), flat.max() + 1
+            sums[lo:hi] += np.bincount(flat - lo, weights=arr[keep, 2], minlength=hi - lo)
+            counts[lo:hi] += np.bincount(flat - lo, minlength=hi - lo)
+    finally:
+        cursor.close()
+
+    sums, counts = sums.reshape(-1, n_bins), counts.reshape(-1, n_bins)
+    return {user_id: (sums[i], counts[i]) for i, user_id in enumerate(user_ids) if counts[i].any()}
+
+
+def _columnar_bins(series, user_id, window_days, bin_s):
+    """`_cohort_bins` for one user over the Parquet tier: only the window's day partitions are read."""
+    days = list_days(series, user_id)
+    if not days:
+        return None
+    start = days[-1] - timedelta(days=window_days - 1)
+    epochs, values = read_series(series, user_id, start.isoformat(), (days[-1] + timedelta(days=1)).isoformat())
+    n_bins = window_days * 86400 // bin_s
+    index = (epochs - calendar.timegm(start.timetuple())) // bin_s
+    keep = (index >= 0) & (index < n_bins)
+    sums = np.bincount(index[keep], weights=values[keep].astype(np.float64), minlength=n_bins)
+    counts = np.bincount(index[keep], minlength=n_bins).astype(np.float64)
+    return sums, counts
+
+
+def _activity_series(binned):
+    """Hourly (sums, counts) bins as step totals, NaN where nothing was recorded; None without data."""
+    if binned is None or not binned[1].any():
+        return None
+    sums, counts = binned
+    return np.where(counts > 0, sums, np.nan)
+
+
+def _circular_window_means(profile, width):
+    """Mean of `width` consecutive hours starting at each hour of a 24 h profile (wrapping midnight)."""
+    wrapped = np.concatenate([profile, profile[: width - 1]])
+    csum = np.concatenate([[0.0], np.cumsum(wrapped)])
+    return (csum[width:] - csum[:-width]) / width
+
+
+def _nonparametric_rhythm(hourly):
+    """IS, IV, L5/M10 and relative amplitude (Van Someren et al.) from an hourly series."""
+    valid = ~np.isnan(hourly)
+    x = hourly[valid]
+    n = x.size
+    if n < 48:
+        return {}
+    mean = x.mean()
+    total_var = np.sum((x - mean) ** 2)
+    if total_var == 0:
+        return {}
+
+    by_hour = hourly.reshape(-1, 24)
+    profile = np.nanmean(by_hour, axis=0)
+    if np.isnan(profile).any():
+        return {}
+    interdaily = n * np.sum((profile - mean) ** 2) / (24 * total_var)
+
+    steps = np.diff(hourly)
+    steps = steps[~np.isnan(steps)]
+    intradaily = n * np.sum(steps ** 2) / ((n - 1) * total_var) if steps.size else None
+
+    l5_means = _circular_window_means(profile, 5)
+    m10_means = _circular_window_means(profile, 10)
+    l5, m10 = float(l5_means.min()), float(m10_means.max())
+    return {
+        "interdaily_stability": round(float(interdaily), 3),
+        "intradaily_variability": round(float(intradaily), 3) if intradaily is not None else None,
+        "l5": round(l5, 1),
+        "l5_onset_h": int(l5_means.argmin()),
+        "m10": round(m10, 1),
+        "m10_onset_h": int(m10_means.argmax()),
+        "relative_amplitude": round((m10 - l5) / (m10 + l5), 3) if m10 + l5 > 0 else None,
+    }
+
+
+def _sleep_midpoints(hourly):
+    """
+    Per-night midpoint of the least active 5 h (noon-to-noon days so nights
+    are not cut at midnight); returns (circular mean h, circular variance h^2).
+    """
+    noon_days = hourly[12: 12 + (hourly.size - 12) // 24 * 24].reshape(-1, 24)
+    noon_days = noon_days[~np.isnan(noon_days).any(axis=1)]
+    if len(noon_days) < 2:
+        return None, None
+    csum = np.concatenate([np.zeros((len(noon_days), 1)), np.cumsum(noon_days, axis=1)], axis=1)
+    five_hour = csum[:, 5:] - csum[:, :-5]
+    midpoints = (12 + five_hour.argmin(axis=1) + 2.5) % 24
+
+    angles = midpoints * 2 * np.pi / 24
+    resultant = np.mean(np.exp(1j * angles))
+    mean_h = (np.angle(resultant) * 24 / (2 * np.pi)) % 24
+    sd_h = np.sqrt(-2 * np.log(max(abs(resultant), 1e-12))) * 24 / (2 * np.pi)
+    return round(float(mean_h), 2), round(float(sd_h ** 2), 3)
+
+
+def _resting_hr_from_bins(binned):
+    """Median over days of the lowest rolling mean HR, from per-minute (sums, counts) bins of the minute rollup."""
+    if binned is None or not binned[1].any():
+        return None
+    sums, counts = binned
+    has = (counts > 0).astype(np.float64)
+    values = np.where(counts > 0, sums / np.maximum(counts, 1), 0.0).reshape(-1, 1440)
+    has = has.reshape(-1, 1440)
+
+    width = RESTING_HR_WINDOW_MIN
+    pad = np.zeros((values.shape[0], 1))
+    csum_v = np.concatenate([pad, np.cumsum(values, axis=1)], axis=1)
+    csum_n = np.concatenate([pad, np.cumsum(has, axis=1)], axis=1)
+    window_sum = csum_v[:, width:] - csum_v[:, :-width]
+    window_n = csum_n[:, width:] - csum_n[:, :-width]
+    enough = window_n >= MIN_VALID_FRACTION * width
+    window_mean = np.where(enough, window_sum / np.maximum(window_n, 1), np.inf)
+    daily_min = window_mean.min(axis=1)
+    daily_min = daily_min[np.isfinite(daily_min)]
+    if not daily_min.size:
+        return None
+    return round(float(np.median(daily_min)), 1)
+
+
+def compute_cohort_rhythm_features(conn, user_ids, window_days=14):
+    """
+    Circadian / activity-rhythm features for each user over the last
+    `window_days` of their data, with one query per source table (per
+    COHORT_BATCH_USERS users). Activity metrics come from hourly steps
+    (minute steps, then the columnar tier, as fallback), resting HR from the
+    heart_rate_minute rollup. Returns {user_id: features}; keys are
+    RHYTHM_KEYS, values None where data is insufficient.
+    """
+    user_ids = [str(user_id) for user_id in user_ids]
+    features = {}
+    for i in range(0, len(user_ids), COHORT_BATCH_USERS):
+        features.update(_cohort_rhythm_batch(conn, user_ids[i:i + COHORT_BATCH_USERS], window_days))
+    return features
+
+
+def _cohort_rhythm_batch(conn, user_ids, window_days):
+    activity = _cohort_bins(conn, "hourly_steps", "activity_hour", "step_total", user_ids, window_days, 3600)
+    missing = [user_id for user_id in user_ids if user_id not in activity]
+    activity.update(_cohort_bins(conn, "minute_steps", "activity_minute", "steps", missing, window_days, 3600))
+    heart = _cohort_bins(conn, "heart_rate_minute", "bucket", "hr_mean", user_ids, window_days, 60)
+
+    features = {}
+    for user_id in user_ids:
+        binned = activity.get(user_id)
+        if binned is None and COLUMNAR_STORE:
+            binned = _columnar_bins("minute_steps", user_id, window_days, 3600)
+        features[user_id] = _rhythm_features(_activity_series(binned), _resting_hr_from_bins(heart.get(user_id)))
+    return features
+
+
+def _rhythm_features(hourly, resting_hr):
+    features = dict.fromkeys(RHYTHM_KEYS)
+    if hourly is not None:
+        features.update(_nonparametric_rhythm(hourly))
+        features["sleep_midpoint_h"], features["sleep_midpoint_var_h2"] = _sleep_midpoints(hourly)
+        features["days"] = int(np.sum(~np.isnan(hourly).reshape(-1, 24).all(axis=1)))
+    features["resting_hr"] = resting_hr
+    return features
@@ -0,0 +1,153 @@
+import os
+import calendar
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+# Optional columnar tier for high-frequency wearable series. When enabled,
+# ingestion writes these series to Parquet instead of one SQLite row per sample.
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COLUMNAR_DIR = os.path.join(BASE_DIR, "data", "columnar")
+COLUMNAR_STORE = os.environ.get("COLUMNAR_STORE", "False") == "True"
+
+# series -> value dtype
+SERIES = {
+    "heart_rate": np.int16,
+    "minute_steps": np.int16,
+}
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise ImportError("The columnar store needs pyarrow (pip install pyarrow)") from e
+
+
+def _epoch(moment):
+    """UTC-naive date/datetime -> epoch seconds (timestamps are stored as recorded, without zone)."""
+    return calendar.timegm(moment.timetuple())
+
+
+def _partition_path(series, user_id, day):
+    return os.path.join(COLUMNAR_DIR, series, f"user={user_id}", f"{day.isoformat()}.parquet")
+
+
+def _read_day(path):
+    """(seconds-of-day int32, values) from one day partition, memory-mapped."""
+    import pyarrow.parquet as pq
+    table = pq.read_table(path, memory_map=True)
+    return table.column("t").to_numpy(), table.column("value").to_numpy()
+
+
+def _write_day(path, seconds, values, dtype):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.table({"t": pa.array(seconds, pa.int32()), "value": pa.array(values.astype(dtype))})
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    # Timestamps are sorted seconds-of-day, so delta encoding stores them in a few bits each.
+    pq.write_table(
+        table,
+        tmp_path,
+        compression="zstd",
+        use_dictionary=False,
+        column_encoding={"t": "DELTA_BINARY_PACKED", "value": "DELTA_BINARY_PACKED"},
+    )
+    os.replace(tmp_path, path)
+
+
+def write_series(series, df, replace=True):
+    """
+    Append samples (columns user_id, time, value) to the day partitions of
+    `series`. Each touched day is merged with what is already stored,
+    de-duplicated on timestamp and rewritten atomically: the last write wins,
+    or with `replace=False` stored samples are kept. Returns the rows of `df`
+    whose timestamps were not stored before.
+    """
+    _require_pyarrow()
+    import pandas as pd
+
+    dtype = SERIES[series]
+    frame = df[["user_id", "time", "value"]].copy()
+    frame["time"] = pd.to_datetime(frame["time"])
+    frame = frame.drop_duplicates(["user_id", "time"], keep="last")
+    frame["day"] = frame["time"].dt.date
+    frame["t"] = (frame["time"] - frame["time"].dt.normalize()).dt.total_seconds().astype(np.int32)
+
+    added = []
+    for (user_id, day), part in frame.groupby(["user_id", "day"], sort=False):
+        path = _partition_path(series, user_id, day)
+        seconds, values = part["t"].to_numpy(), part["value"].to_numpy()
+        if os.path.exists(path):
+            old_seconds, old_values = _read_day(path)
+            added.append(part.index[~np.isin(seconds, old_seconds)])
+            if replace:
+                seconds = np.concatenate([old_seconds, seconds])
+                values = np.concatenate([old_values, values])
+            else:
+                seconds = np.concatenate([seconds, old_seconds])
+                values = np.concatenate([values, old_values])
+        else:
+            added.append(part.index)
+        # Stable sort then keep the last sample per second.
+        order = np.argsort(seconds, kind="stable")
+        seconds, values = seconds[order], values[order]
+        last = np.append(seconds[1:] != seconds[:-1], True)
+        _write_day(path, seconds[last], values[last], dtype)
+    index = np.sort(np.concatenate(added)) if added else []
+    return df.loc[index]
+
+
+def list_days(series, user_id):
+    """Sorted dates with a stored partition for this user."""
+    directory = os.path.join(COLUMNAR_DIR, series, f"user={user_id}")
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        date.fromisoformat(name[: -len(".parquet")]) for name in os.listdir(directory) if name.endswith(".parquet")
+    )
+
+
+def read_series(series, user_id, start, end):
+    """
+    Samples of `series` for one user with start <= time < end (datetimes or
+    ISO strings). Only the day partitions overlapping the range are opened.
+    Returns (epoch_seconds int64, values) NumPy arrays sorted by time.
+    """
+    _require_pyarrow()
+    start = datetime.fromisoformat(str(start))
+    end = datetime.fromisoformat(str(end))
+    start_epoch, end_epoch = _epoch(start), _epoch(end)
+
+    times, values = [], []
+    day = start.date()
+    while day <= end.date():
+        path = _partition_path(series, user_id, day)
+        if os.path.exists(path):
+            seconds, day_values = _read_day(path)
+            epoch = _epoch(day) + seconds.astype(np.int64)
+            keep = (epoch >= start_epoch) & (epoch < end_epoch)
+            times.append(epoch[keep])
+            values.append(day_values[keep])
+        day += timedelta(days=1)
+
+    if not times:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=SERIES[series])
+    return np.concatenate(times), np.concatenate(values)
+
+
+def iter_partitions(series):
+    """Yield (user_id, day, epoch_seconds, values) for every stored day partition of `series`."""
+    _require_pyarrow()
+    root = os.path.join(COLUMNAR_DIR, series)
+    if not os.path.isdir(root):
+        return
+    for user_dir in sorted(os.listdir(root)):
+        if not user_dir.startswith("user="):
+            continue
+        user_id = user_dir[len("user="):]
+        for day in list_days(series, user_id):
+            seconds, values = _read_day(_partition_path(series, user_id, day))
+            yield user_id, day, _epoch(day) + seconds.astype(np.int64), values
@@ -0,0 +1,98 @@
+import os
+import threading
+from sqlalchemy import create_engine, event
+
+# Database configuration (shared by strategies and the Fitbit ingester)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_DIR = os.path.join(BASE_DIR, "data", "db")
+DB_PATH = os.path.join(DB_DIR, "health_companion.db")
+DATABASE_URL = f"sqlite:///{DB_PATH}"
+
+# Applied to every new SQLite connection. WAL lets readers proceed while the
+# ingester writes; NORMAL sync is durable in WAL mode except on power loss.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64000,       # ~64 MB page cache (negative = KiB)
+    "mmap_size": 268435456,     # 256 MB memory-mapped I/O
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,       # ms to wait on a locked database
+}
+
+# Lock wait of best-effort writers, which must not stall a request behind ingestion.
+CACHE_WRITE_TIMEOUT_MS = 500
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def create_sqlite_engine(database_url, read_only=False, pool_size=5, busy_timeout_ms=None, pool_timeout=30):
+    """
+    Pooled SQLAlchemy engine with the performance pragmas applied on connect.
+    Read-only engines additionally set `query_only`, so they can never take
+    the write lock. `busy_timeout_ms` overrides the lock wait and
+    `pool_timeout` (s) the wait for a free pooled connection.
+    """
+    if database_url.startswith("sqlite:///"):
+        os.makedirs(os.path.dirname(database_url[len("sqlite:///"):]), exist_ok=True)
+
+    engine = create_engine(
+        database_url,
+        pool_size=pool_size,
+        max_overflow=pool_size if read_only else 0,
+        pool_timeout=pool_timeout,
+        connect_args={"check_same_thread": False},
+    )
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        pragmas = dict(SQLITE_PRAGMAS)
+        if busy_timeout_ms is not None:
+            pragmas["busy_timeout"] = busy_timeout_ms
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+    return engine
+
+
+def _get_engine(kind, factory):
+    engine = _engines.get(kind)
+    if engine is None:
+        with _engines_lock:
+            engine = _engines.get(kind)
+            if engine is None:
+                engine = factory()
+                _engines[kind] = engine
+    return engine
+
+
+def get_read_engine():
+    """Shared pooled engine for queries (strategies, charts)."""
+    return _get_engine("read", lambda: create_sqlite_engine(DATABASE_URL, read_only=True, pool_size=5))
+
+
+def get_write_engine():
+    """Shared single-connection engine for writers (ingestion), so writes never contend with each other."""
+    return _get_engine("write", lambda: create_sqlite_engine(DATABASE_URL, pool_size=1))
+
+
+def get_cache_write_engine():
+    """
+    Own single connection for best-effort writes (caches). It does not queue
+    for the ingestion writer's connection and gives up on a locked database
+    (or a busy pool) after CACHE_WRITE_TIMEOUT_MS, so callers can skip the write.
+    """
+    return _get_engine("cache_write", lambda: create_sqlite_engine(
+        DATABASE_URL, pool_size=1, busy_timeout_ms=CACHE_WRITE_TIMEOUT_MS, pool_timeout=CACHE_WRITE_TIMEOUT_MS / 1000
+    ))
+
+
+def dispose_engines():
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
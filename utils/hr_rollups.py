@@ -0,0 +1,147 @@
+import pandas as pd
+from sqlalchemy import inspect, text
+
+from utils.columnar import COLUMNAR_STORE, iter_partitions
+
+# Heart-rate zones in bpm, [low, high). Time in each zone is accumulated in seconds.
+HR_ZONES = (
+    ("rest", 0, 100),
+    ("fat_burn", 100, 140),
+    ("cardio", 140, 170),
+    ("peak", 170, 1000),
+)
+ZONE_COLUMNS = [f"zone_{name}_s" for name, _, _ in HR_ZONES]
+
+# A sample is credited with the time until the next sample, capped so device
+# gaps (watch off the wrist) do not count as time in a zone.
+MAX_SAMPLE_GAP_S = 60
+DEFAULT_SAMPLE_S = 5
+
+# resolution -> (table, pandas floor frequency, bucket format)
+RESOLUTIONS = {
+    "minute": ("heart_rate_minute", "min", "%Y-%m-%d %H:%M:00"),
+    "hour": ("heart_rate_hour", "h", "%Y-%m-%d %H:00:00"),
+    "day": ("heart_rate_day", "D", "%Y-%m-%d"),
+}
+
+_STAT_COLUMNS = ["n", "hr_min", "hr_max", "hr_mean", "hr_sum", "hr_sumsq"] + ZONE_COLUMNS
+
+
+def ensure_rollup_tables(conn):
+    zone_ddl = ", ".join(f"{column} REAL NOT NULL DEFAULT 0" for column in ZONE_COLUMNS)
+    for table, _, _ in RESOLUTIONS.values():
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                user_id TEXT NOT NULL,
+                bucket TEXT NOT NULL,
+                n INTEGER NOT NULL,
+                hr_min INTEGER,
+                hr_max INTEGER,
+                hr_mean REAL,
+                hr_sum REAL NOT NULL,
+                hr_sumsq REAL NOT NULL,
+                {zone_ddl},
+                PRIMARY KEY (user_id, bucket)
+            )
+        """))
+
+
+def _upsert_sql(table):
+    columns = ["user_id", "bucket", "n", "hr_min", "hr_max", "hr_mean", "hr_sum", "hr_sumsq"] + ZONE_COLUMNS
+    zone_updates = ", ".join(f"{column} = {column} + excluded.{column}" for column in ZONE_COLUMNS)
+    # SET expressions see the pre-update row, so the mean is recomputed from the merged sums.
+    return f"""
+        INSERT INTO {table} ({", ".join(columns)})
+        VALUES ({", ".join(":" + column for column in columns)})
+        ON CONFLICT (user_id, bucket) DO UPDATE SET
+            n = n + excluded.n,
+            hr_min = MIN(hr_min, excluded.hr_min),
+            hr_max = MAX(hr_max, excluded.hr_max),
+            hr_mean = (hr_sum + excluded.hr_sum) / (n + excluded.n),
+            hr_sum = hr_sum + excluded.hr_sum,
+            hr_sumsq = hr_sumsq + excluded.hr_sumsq,
+            {zone_updates}
+    """
+
+
+def _prepare(df):
+    """Per-sample duration and zone seconds for a frame of (user_id, time, value)."""
+    df = df[["user_id", "time", "value"]].copy()
+    if not pd.api.types.is_datetime64_any_dtype(df["time"]):
+        df["time"] = pd.to_datetime(df["time"], format="ISO8601")
+    df["value"] = df["value"].astype("float64")
+    df = df.sort_values(["user_id", "time"], kind="stable")
+
+    gaps = (df.groupby("user_id", sort=False)["time"].shift(-1) - df["time"]).dt.total_seconds()
+    fallback = gaps.median() if gaps.notna().any() else DEFAULT_SAMPLE_S
+    duration = gaps.fillna(fallback).clip(lower=0, upper=MAX_SAMPLE_GAP_S)
+
+    for (_, low, high), column in zip(HR_ZONES, ZONE_COLUMNS):
+        in_zone = (df["value"] >= low) & (df["value"] < high)
+        df[column] = duration.where(in_zone, 0.0)
+    df["sq"] = df["value"] * df["value"]
+    return df
+
+
+def _aggregate(df, freq, fmt):
+    # Group on the floored timestamp and format only the buckets, not every sample.
+    grouped = df.assign(bucket=df["time"].dt.floor(freq)).groupby(["user_id", "bucket"], sort=False)
+    out = grouped.agg(
+        n=("value", "size"),
+        hr_min=("value", "min"),
+        hr_max=("value", "max"),
+        hr_sum=("value", "sum"),
+        hr_sumsq=("sq", "sum"),
+        **{column: (column, "sum") for column in ZONE_COLUMNS},
+    ).reset_index()
+    out["bucket"] = out["bucket"].dt.strftime(fmt)
+    out["hr_mean"] = out["hr_sum"] / out["n"]
+    out["hr_min"] = out["hr_min"].astype(int)
+    out["hr_max"] = out["hr_max"].astype(int)
+    return out
+
+
+def update_hr_rollups(conn, df):
+    """
+    Fold new heart-rate samples (columns user_id, time, value) into the
+    minute/hour/day rollups. Merging is additive, so batches can arrive in
+    any order; call inside the same transaction as the raw insert.
+    """
+    if df is None or len(df) == 0:
+        return
+    prepared = _prepare(df)
+    for table, freq, fmt in RESOLUTIONS.values():
+        rows = _aggregate(prepared, freq, fmt)
+        conn.execute(text(_upsert_sql(table)), rows.to_dict("records"))
+
+
+def rebuild_hr_rollups(conn, chunksize=200_000):
+    """Recompute all rollups from `heart_rate` (streamed in chunks) and the columnar tier, if enabled."""
+    ensure_rollup_tables(conn)
+    for table, _, _ in RESOLUTIONS.values():
+        conn.execute(text(f"DELETE FROM {table}"))
+    if "heart_rate" in inspect(conn).get_table_names():
+        chunks = pd.read_sql(
+            text("SELECT user_id, time, value FROM heart_rate ORDER BY user_id, time"), conn, chunksize=chunksize
+        )
+        for chunk in chunks:
+            update_hr_rollups(conn, chunk)
+    if COLUMNAR_STORE:
+        for user_id, _, epochs, values in iter_partitions("heart_rate"):
+            update_hr_rollups(conn, pd.DataFrame({
+                "user_id": user_id, "time": pd.to_datetime(epochs, unit="s"), "value": values
+            }))
+
+
+def query_hr_rollup(conn, user_id, resolution="hour", start=None, end=None):
+    """Rollup rows for one user, ordered by bucket; `start`/`end` are inclusive bucket strings."""
+    table = RESOLUTIONS[resolution][0]
+    sql = f"SELECT bucket, {', '.join(_STAT_COLUMNS)} FROM {table} WHERE user_id = :user_id"
+    params = {"user_id": user_id}
+    if start is not None:
+        sql += " AND bucket >= :start"
+        params["start"] = start
+    if end is not None:
+        sql += " AND bucket <= :end"
+        params["end"] = end
+    return [dict(row) for row in conn.execute(text(sql + " ORDER BY bucket"), params).mappings()]
@@ -0,0 +1,107 @@
+import hashlib
+from datetime import datetime, timezone
+from sqlalchemy import text
+
+# Manifest user_id of the entry recording that a file was ingested for every user in it.
+ALL_USERS = "*"
+
+
+def prefix_digests(path, sizes, block_size=1 << 20):
+    """
+    (sha256 of the whole file, {size: sha256 of its first `size` bytes}) in
+    one read; sizes beyond the end of the file are left out.
+    """
+    digest = hashlib.sha256()
+    prefixes, offset = {}, 0
+    boundaries = sorted(set(sizes))
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            while boundaries and boundaries[0] <= offset + len(block):
+                size = boundaries.pop(0)
+                prefix = digest.copy()
+                prefix.update(block[:size - offset])
+                prefixes[size] = prefix.hexdigest()
+            digest.update(block)
+            offset += len(block)
+    return digest.hexdigest(), prefixes
+
+
+def ensure_ingest_manifest_table(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS ingest_manifest (
+            source TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            file_hash TEXT NOT NULL,
+            file_size INTEGER,
+            last_time TEXT,
+            rows INTEGER NOT NULL DEFAULT 0,
+            ingested_at TEXT NOT NULL,
+            PRIMARY KEY (source, user_id)
+        )
+    """))
+
+
+def get_manifest(conn, source):
+    """{user_id: {"file_hash", "file_size", "last_time", "rows"}} recorded for one source file."""
+    rows = conn.execute(
+        text("SELECT user_id, file_hash, file_size, last_time, rows FROM ingest_manifest WHERE source = :source"),
+        {"source": source},
+    ).mappings()
+    return {row["user_id"]: {key: row[key] for key in ("file_hash", "file_size", "last_time", "rows")}
+            for row in rows}
+
+
+def is_unchanged(manifest, file_hash, user_ids=None):
+    """
+    True when a file with this hash was already ingested for all of `user_ids`
+    (None: every user in the file).
+    """
+    if manifest.get(ALL_USERS, {}).get("file_hash") == file_hash:
+        return True
+    return user_ids is not None and all(
+        manifest.get(str(user_id), {}).get("file_hash") == file_hash for user_id in user_ids
+    )
+
+
+def append_watermarks(manifest, prefixes):
+    """
+    {user_id: last_time} for the users whose recorded file is a prefix of the
+    current one (`prefixes` from prefix_digests), i.e. rows were only appended
+    since. Any other file - an older or edited export under the same name -
+    gets no watermark and is upserted in full.
+    """
+    return {
+        user: entry["last_time"]
+        for user, entry in manifest.items()
+        if user != ALL_USERS and entry["last_time"] and entry["file_size"] is not None
+        and prefixes.get(entry["file_size"]) == entry["file_hash"]
+    }
+
+
+def record_ingest(conn, source, file_hash, file_size, user_id, last_time, rows):
+    """
+    Record that `source` (`file_size` bytes with content `file_hash`) was
+    ingested for a user up to `last_time`. Call in the same transaction as the
+    data write so the watermark never runs ahead of what is stored.
+    """
+    conn.execute(
+        text("""
+            INSERT INTO ingest_manifest (source, user_id, file_hash, file_size, last_time, rows, ingested_at)
+            VALUES (:source, :user_id, :file_hash, :file_size, :last_time, :rows, :ingested_at)
+            ON CONFLICT (source, user_id) DO UPDATE SET
+                file_hash = excluded.file_hash,
+                file_size = excluded.file_size,
+                last_time = excluded.last_time,
+                rows = rows + excluded.rows,
+                ingested_at = excluded.ingested_at
+        """),
+        {
+            "source": source,
+            "user_id": str(user_id),
+            "file_hash": file_hash,
+            "file_size": file_size,
+            "last_time": last_time,
+            "rows": rows,
+            "ingested_at": datetime.now(timezone.utc).isoformat(),
+        },
+    )
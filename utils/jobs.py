@@ -0,0 +1,180 @@
+import os
+import json
+import uuid
+import threading
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import text
+
+from utils.database import create_sqlite_engine
+from utils.logger import logger
+
+# Job table lives in its own SQLite file so progress writes never contend with ingestion.
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+JOBS_DB_PATH = os.path.join(BASE_DIR, "data", "db", "jobs.db")
+JOBS_DATABASE_URL = f"sqlite:///{JOBS_DB_PATH}"
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "1"))
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+
+class JobManager:
+    """
+    Background runner for long actions (e.g. consult transcription).
+
+    Jobs are persisted in SQLite, executed on a bounded thread pool, report
+    fractional progress while running, and on success their result is
+    written to the Medical Vault. Jobs still queued or running when the
+    process stopped are re-queued by `resume()`.
+    """
+
+    def __init__(self, database_url=JOBS_DATABASE_URL, max_workers=JOB_WORKERS):
+        self.engine = create_sqlite_engine(database_url, pool_size=max(1, max_workers) + 2)
+        self._handlers = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="job")
+        self._init_db()
+
+    def _init_db(self):
+        with self.engine.begin() as conn:
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    progress REAL NOT NULL DEFAULT 0,
+                    message TEXT,
+                    payload TEXT,
+                    result TEXT,
+                    vault_entry_id INTEGER,
+                    error TEXT,
+                    details TEXT,
+                    created_at TEXT NOT NULL,
+                    started_at TEXT,
+                    finished_at TEXT
+                )
+            """))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_jobs_status ON jobs (status, created_at)"))
+
+    def register(self, kind, handler, vault_category=None, vault_tags=None):
+        """
+        Register `handler(payload, report)` for jobs of `kind`. The handler
+        calls `report(fraction, message=None, details=None)` to publish
+        progress (`details`: optional JSON-serialisable breakdown, e.g. rows
+        per table) and returns a JSON-serialisable result. If `vault_category` is set the
+        result is stored in the vault under it.
+        """
+        self._handlers[kind] = {"handler": handler, "vault_category": vault_category, "vault_tags": vault_tags or []}
+
+    def submit(self, kind, payload=None):
+        if kind not in self._handlers:
+            raise KeyError(f"Unknown job kind: {kind}")
+        job_id = uuid.uuid4().hex
+        with self.engine.begin() as conn:
+            conn.execute(
+                text("""
+                    INSERT INTO jobs (id, kind, status, progress, payload, created_at)
+                    VALUES (:id, :kind, :status, 0, :payload, :created_at)
+                """),
+                {
+                    "id": job_id,
+                    "kind": kind,
+                    "status": QUEUED,
+                    "payload": json.dumps(payload or {}),
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                },
+            )
+        logger.info(f"Job {job_id} ({kind}) queued")
+        self._executor.submit(self._run, job_id, kind, payload or {})
+        return job_id
+
+    def get(self, job_id):
+        with self.engine.connect() as conn:
+            row = conn.execute(text("SELECT * FROM jobs WHERE id = :id"), {"id": job_id}).mappings().fetchone()
+        return self._to_dict(row) if row else None
+
+    def list(self, limit=20):
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                text("SELECT * FROM jobs ORDER BY created_at DESC LIMIT :limit"), {"limit": limit}
+            ).mappings().fetchall()
+        return [self._to_dict(row, include_result=False) for row in rows]
+
+    def resume(self):
+        """Re-queue jobs interrupted by a restart."""
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                text("SELECT id, kind, payload FROM jobs WHERE status IN (:queued, :running) ORDER BY created_at"),
+                {"queued": QUEUED, "running": RUNNING},
+            ).fetchall()
+        for job_id, kind, payload in rows:
+            if kind not in self._handlers:
+                continue
+            self._update(job_id, status=QUEUED, progress=0, message="Re-queued after restart")
+            self._executor.submit(self._run, job_id, kind, json.loads(payload or "{}"))
+        if rows:
+            logger.info(f"Re-queued {len(rows)} interrupted job(s)")
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # ------------------------------------------------------------------
+
+    def _update(self, job_id, **fields):
+        assignments = ", ".join(f"{key} = :{key}" for key in fields)
+        with self._lock, self.engine.begin() as conn:
+            conn.execute(text(f"UPDATE jobs SET {assignments} WHERE id = :id"), {"id": job_id, **fields})
+
+    def _run(self, job_id, kind, payload):
+        spec = self._handlers[kind]
+        self._update(job_id, status=RUNNING, started_at=datetime.now(timezone.utc).isoformat(), error=None)
+
+        def report(fraction, message=None, details=None):
+            fields = {"progress": round(min(max(float(fraction), 0.0), 1.0), 4), "message": message}
+            if details is not None:
+                fields["details"] = json.dumps(details)
+            self._update(job_id, **fields)
+
+        try:
+            result = spec["handler"](payload, report)
+            vault_entry_id = None
+            if spec["vault_category"]:
+                from data.medical_vault import vault
+                vault_entry_id = vault.store_entry(
+                    category=spec["vault_category"], content=result, tags=spec["vault_tags"]
+                )
+            self._update(
+                job_id,
+                status=SUCCEEDED,
+                progress=1.0,
+                result=json.dumps(result),
+                vault_entry_id=vault_entry_id,
+                finished_at=datetime.now(timezone.utc).isoformat(),
+            )
+            logger.info(f"Job {job_id} ({kind}) succeeded")
+        except Exception as e:
+            logger.error(f"Job {job_id} ({kind}) failed: {e}")
+            self._update(job_id, status=FAILED, error=str(e), finished_at=datetime.now(timezone.utc).isoformat())
+
+    @staticmethod
+    def _to_dict(row, include_result=True):
+        job = {
+            "id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "progress": row["progress"],
+            "message": row["message"],
+            "vault_entry_id": row["vault_entry_id"],
+            "error": row["error"],
+            "details": json.loads(row["details"]) if row["details"] else None,
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+        }
+        if include_result:
+            job["result"] = json.loads(row["result"]) if row["result"] else None
+        return job
+
+
+# Default job manager instance
+job_manager = JobManager()
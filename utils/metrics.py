@@ -0,0 +1,204 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from sqlalchemy import text
+
+from utils.columnar import COLUMNAR_STORE, SERIES as COLUMNAR_SERIES, read_series
+from utils.hr_rollups import RESOLUTIONS
+
+# series -> raw table, time column, default value column, allowed value columns, date-only timestamps
+METRIC_SERIES = {
+    "heart_rate": {"table": "heart_rate", "time": "time", "field": "value", "fields": ["value"], "date_only": False},
+    "minute_steps": {
+        "table": "minute_steps", "time": "activity_minute", "field": "steps", "fields": ["steps"], "date_only": False,
+    },
+    "hourly_steps": {
+        "table": "hourly_steps", "time": "activity_hour", "field": "step_total", "fields": ["step_total"],
+        "date_only": False,
+    },
+    "daily_activity": {
+        "table": "daily_activity", "time": "activity_date", "field": "total_steps",
+        "fields": [
+            "total_steps", "total_distance", "very_active_minutes", "fairly_active_minutes",
+            "lightly_active_minutes", "sedentary_minutes", "calories",
+        ],
+        "date_only": True,
+    },
+    "sleep_log": {
+        "table": "sleep_log", "time": "sleep_day", "field": "total_minutes_asleep",
+        "fields": ["total_minutes_asleep", "total_time_in_bed", "total_sleep_records"], "date_only": True,
+    },
+}
+
+DOWNSAMPLE_METHODS = ("lttb", "minmax")
+DEFAULT_SPAN_DAYS = 7
+
+# Heart-rate rollups by bucket width, coarsest first.
+_HR_ROLLUPS = (("day", 86400), ("hour", 3600), ("minute", 60))
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets downsampling; returns indices of the kept points."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean() if next_end > end else x[-1]
+        avg_y = y[end:next_end].mean() if next_end > end else y[-1]
+        bucket_x, bucket_y = x[start:end], y[start:end]
+        area = np.abs((x[a] - avg_x) * (bucket_y - y[a]) - (x[a] - bucket_x) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        kept[i + 1] = a
+    return kept
+
+
+def minmax(x, y_min, y_max, buckets):
+    """
+    Min/max bucket downsampling over equal time buckets. Returns (indices of
+    bucket minima, indices of bucket maxima); plotting both preserves peaks.
+    """
+    n = len(x)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    span = max(float(x[-1] - x[0]), 1.0)
+    bucket = np.minimum(((x - x[0]) * buckets / span).astype(np.int64), buckets - 1)
+    starts = np.flatnonzero(np.concatenate([[True], bucket[1:] != bucket[:-1]]))
+    ends = np.append(starts[1:], n)
+    lo = np.array([s + int(np.argmin(y_min[s:e])) for s, e in zip(starts, ends)], dtype=np.int64)
+    hi = np.array([s + int(np.argmax(y_max[s:e])) for s, e in zip(starts, ends)], dtype=np.int64)
+    return lo, hi
+
+
+def _parse(moment):
+    return datetime.fromisoformat(str(moment).replace("Z", ""))
+
+
+def _fetch(conn, sql, params):
+    """
+    Rows of (epoch seconds, value[, min, max]) as a float64 array. Uses the
+    DBAPI cursor directly: plain tuples convert to NumPy without the per-row
+    Row overhead, which dominates on tens of thousands of rows.
+    """
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        rows = cursor.execute(sql, params).fetchall()
+    finally:
+        cursor.close()
+    if not rows:
+        return np.zeros((0, 2))
+    return np.array(rows, dtype=np.float64)
+
+
+def _default_user(conn):
+    row = conn.execute(text(
+        "SELECT user_id FROM daily_activity GROUP BY user_id ORDER BY COUNT(*) DESC LIMIT 1"
+    )).fetchone()
+    return row[0] if row else None
+
+
+def _default_end(conn, spec, user_id):
+    row = conn.execute(
+        text(f"SELECT MAX({spec['time']}) FROM {spec['table']} WHERE user_id = :user_id"), {"user_id": user_id}
+    ).fetchone()
+    if row and row[0]:
+        return _parse(row[0]) + (timedelta(days=1) if spec["date_only"] else timedelta(seconds=1))
+    if spec["table"] == "heart_rate":
+        row = conn.execute(
+            text("SELECT MAX(bucket) FROM heart_rate_minute WHERE user_id = :user_id"), {"user_id": user_id}
+        ).fetchone()
+        if row and row[0]:
+            return _parse(row[0]) + timedelta(minutes=1)
+    # Naive like the stored timestamps, so it compares with a parsed `start`.
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _has_rows(conn, spec, params):
+    row = conn.execute(text(f"""
+        SELECT 1 FROM {spec['table']} WHERE user_id = :user_id AND {spec['time']} >= :start LIMIT 1
+    """), params).fetchone()
+    return row is not None
+
+
+def _heart_rate_source(span_s, points):
+    """Coarsest rollup that still yields at least `points` buckets over the span, else raw samples."""
+    for resolution, width in _HR_ROLLUPS:
+        if span_s / width >= points:
+            return resolution
+    return None
+
+
+def query_metrics(conn, series, user_id=None, start=None, end=None, points=1000, method="lttb", field=None):
+    """
+    Time-range query of a wearable series, downsampled to about `points`
+    points. Heart rate is read from the coarsest rollup that still has enough
+    buckets (raw samples, from SQLite or the columnar tier, only for short
+    spans). Returns {"t": [ISO times], "v": [values], ...}.
+    """
+    spec = METRIC_SERIES[series]
+    field = field or spec["field"]
+    if field not in spec["fields"]:
+        raise ValueError(f"Unknown field '{field}' for {series}")
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"Unknown downsampling method '{method}'")
+    points = max(3, int(points))
+
+    user_id = user_id or _default_user(conn)
+    end = _parse(end) if end else _default_end(conn, spec, user_id)
+    start = _parse(start) if start else end - timedelta(days=DEFAULT_SPAN_DAYS)
+    time_format = "%Y-%m-%d" if spec["date_only"] else "%Y-%m-%d %H:%M:%S"
+    params = {"user_id": user_id, "start": start.strftime(time_format), "end": end.strftime(time_format)}
+
+    source = spec["table"]
+    if series == "heart_rate" and (resolution := _heart_rate_source((end - start).total_seconds(), points)):
+        source = RESOLUTIONS[resolution][0]
+        if resolution == "day":
+            params.update(start=start.strftime("%Y-%m-%d"), end=end.strftime("%Y-%m-%d"))
+        data = _fetch(conn, f"""
+            SELECT CAST(strftime('%s', bucket) AS INTEGER), hr_mean, hr_min, hr_max FROM {source}
+            WHERE user_id = :user_id AND bucket >= :start AND bucket < :end ORDER BY bucket
+        """, params)
+    elif COLUMNAR_STORE and series in COLUMNAR_SERIES and not _has_rows(conn, spec, params):
+        source = f"columnar:{series}"
+        epochs, values = read_series(series, user_id, start.isoformat(), end.isoformat())
+        data = np.column_stack([epochs.astype(np.float64), values.astype(np.float64)])
+    else:
+        data = _fetch(conn, f"""
+            SELECT CAST(strftime('%s', {spec['time']}) AS INTEGER), {field} FROM {spec['table']}
+            WHERE user_id = :user_id AND {spec['time']} >= :start AND {spec['time']} < :end
+              AND {field} IS NOT NULL
+            ORDER BY {spec['time']}
+        """, params)
+
+    x, y = data[:, 0], data[:, 1]
+    y_min = data[:, 2] if data.shape[1] > 2 else y
+    y_max = data[:, 3] if data.shape[1] > 3 else y
+    if method == "minmax" and len(x) > points:
+        lo, hi = minmax(x, y_min, y_max, points // 2)
+        kept = np.concatenate([lo, hi])
+        values = np.concatenate([y_min[lo], y_max[hi]])
+        order = np.lexsort((values, x[kept]))
+        kept, values = kept[order], values[order]
+    else:
+        kept = lttb(x, y, points)
+        values = y[kept]
+
+    timestamps = x[kept].astype("datetime64[s]").astype(str)
+    return {
+        "series": series,
+        "field": field,
+        "user_id": user_id,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "source": source,
+        "method": method,
+        "raw_points": int(len(x)),
+        "t": timestamps.tolist(),
+        "v": [round(float(v), 2) for v in values],
+    }
+
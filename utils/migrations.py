@@ -0,0 +1,113 @@
+from datetime import datetime, timezone
+from sqlalchemy import inspect, text
+
+from utils.hr_rollups import rebuild_hr_rollups
+from utils.ingest_manifest import ensure_ingest_manifest_table
+from utils.logger import logger
+from utils.triage_cache import ensure_triage_cache_table
+
+# Composite (user_id, time) indexes that back the per-user windowed queries
+# (superseded by the unique NATURAL_KEYS below).
+USER_TIME_INDEXES = {
+    "daily_activity": ("ix_daily_activity_user_date", "activity_date"),
+    "hourly_steps": ("ix_hourly_steps_user_hour", "activity_hour"),
+    "minute_steps": ("ix_minute_steps_user_minute", "activity_minute"),
+    "sleep_log": ("ix_sleep_log_user_day", "sleep_day"),
+    "heart_rate": ("ix_heart_rate_user_time", "time"),
+}
+
+# Unique (user_id, time) natural keys that make ingestion upserts idempotent.
+# Kept in sync with the __table_args__ of the ORM models in scripts/ingest_fitbit.py.
+NATURAL_KEYS = {
+    "daily_activity": ("ux_daily_activity_user_date", "activity_date"),
+    "hourly_steps": ("ux_hourly_steps_user_hour", "activity_hour"),
+    "minute_steps": ("ux_minute_steps_user_minute", "activity_minute"),
+    "sleep_log": ("ux_sleep_log_user_day", "sleep_day"),
+    "heart_rate": ("ux_heart_rate_user_time", "time"),
+}
+
+
+def _existing_tables(conn):
+    return set(inspect(conn).get_table_names())
+
+
+def _001_user_time_indexes(conn):
+    """Composite (user_id, time) indexes; drop the single-column user_id indexes they make redundant."""
+    tables = _existing_tables(conn)
+    for table, (index_name, time_column) in USER_TIME_INDEXES.items():
+        if table not in tables:
+            continue
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} (user_id, {time_column})"))
+        conn.execute(text(f"DROP INDEX IF EXISTS ix_{table}_user_id"))
+        conn.execute(text(f"ANALYZE {table}"))
+
+
+def _002_heart_rate_rollups(conn):
+    """Minute/hour/day heart-rate rollups, backfilled from existing samples."""
+    rebuild_hr_rollups(conn)
+
+
+def _003_triage_cache(conn):
+    """Fingerprint-keyed Home Triage result cache."""
+    ensure_triage_cache_table(conn)
+
+
+def _004_ingest_natural_keys(conn):
+    """
+    Unique (user_id, time) per raw table plus the ingestion manifest.
+    Duplicates from earlier re-imports are removed first (latest row wins);
+    heart-rate rollups are rebuilt if any samples were dropped.
+    """
+    tables = _existing_tables(conn)
+    removed_heart_rate = 0
+    for table, (index_name, time_column) in NATURAL_KEYS.items():
+        if table not in tables:
+            continue
+        removed = conn.execute(text(f"""
+            DELETE FROM {table} WHERE id NOT IN (
+                SELECT MAX(id) FROM {table} GROUP BY user_id, {time_column}
+            )
+        """)).rowcount
+        if removed:
+            logger.info(f"Removed {removed} duplicate rows from {table}")
+        if table == "heart_rate":
+            removed_heart_rate = removed
+        conn.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS {index_name} ON {table} (user_id, {time_column})"))
+        conn.execute(text(f"DROP INDEX IF EXISTS {USER_TIME_INDEXES[table][0]}"))
+    if removed_heart_rate:
+        rebuild_hr_rollups(conn)
+    ensure_ingest_manifest_table(conn)
+
+
+# Ordered list of (version, migration). Migrations must be idempotent and
+# tolerate missing tables: fresh databases get the same schema from the ORM.
+MIGRATIONS = [
+    (1, _001_user_time_indexes),
+    (2, _002_heart_rate_rollups),
+    (3, _003_triage_cache),
+    (4, _004_ingest_natural_keys),
+]
+
+
+def run_migrations(engine):
+    """Apply pending migrations in order, recording each in `schema_migrations`."""
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TEXT NOT NULL
+            )
+        """))
+        applied = {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+    for version, migration in MIGRATIONS:
+        if version in applied:
+            continue
+        with engine.begin() as conn:
+            logger.info(f"Applying migration {version}: {migration.__name__}")
+            migration(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:v, :n, :t)"),
+                {"v": version, "n": migration.__name__, "t": datetime.now(timezone.utc).isoformat()},
+            )
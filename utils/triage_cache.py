@@ -0,0 +1,103 @@
+import json
+import hashlib
+from datetime import datetime, timezone
+from sqlalchemy import bindparam, text
+
+from utils.database import get_cache_write_engine, get_read_engine
+
+
+def fingerprint(*parts):
+    """Stable sha256 of JSON-serialisable parts."""
+    payload = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def ensure_triage_cache_table(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS triage_cache (
+            user_id TEXT NOT NULL,
+            window_days INTEGER NOT NULL,
+            context TEXT NOT NULL,
+            fingerprint TEXT NOT NULL,
+            result TEXT NOT NULL,
+            stale INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL,
+            PRIMARY KEY (user_id, window_days)
+        )
+    """))
+
+
+def mark_triage_stale(conn, user_ids):
+    """Called by ingestion in its write transaction for every user whose data changed."""
+    user_ids = [str(user_id) for user_id in user_ids]
+    if not user_ids:
+        return
+    conn.execute(
+        text("UPDATE triage_cache SET stale = 1 WHERE user_id IN :user_ids").bindparams(
+            bindparam("user_ids", expanding=True)
+        ),
+        {"user_ids": user_ids},
+    )
+
+
+class TriageCache:
+    """
+    Home Triage results keyed by (user, window).
+
+    Each entry records the `context` (prompt templates + model revision) and
+    the full `fingerprint` (context + metrics) it was computed from. A fresh
+    entry with the current context is served without touching the metrics
+    tables; a stale one (ingestion touched the user) is reused only if the
+    recomputed metrics fingerprint still matches. Writes are best effort:
+    while ingestion holds the write lock they fail fast instead of waiting.
+    """
+
+    def get(self, user_id, window_days):
+        with get_read_engine().connect() as conn:
+            row = conn.execute(
+                text("""
+                    SELECT context, fingerprint, result, stale FROM triage_cache
+                    WHERE user_id = :user_id AND window_days = :window_days
+                """),
+                {"user_id": str(user_id), "window_days": window_days},
+            ).mappings().fetchone()
+        if not row:
+            return None
+        entry = dict(row)
+        entry["result"] = json.loads(entry["result"])
+        return entry
+
+    def put(self, user_id, window_days, context, fingerprint, result):
+        with get_cache_write_engine().begin() as conn:
+            conn.execute(
+                text("""
+                    INSERT INTO triage_cache (user_id, window_days, context, fingerprint, result, stale, created_at)
+                    VALUES (:user_id, :window_days, :context, :fingerprint, :result, 0, :created_at)
+                    ON CONFLICT (user_id, window_days) DO UPDATE SET
+                        context = excluded.context,
+                        fingerprint = excluded.fingerprint,
+                        result = excluded.result,
+                        stale = 0,
+                        created_at = excluded.created_at
+                """),
+                {
+                    "user_id": str(user_id),
+                    "window_days": window_days,
+                    "context": context,
+                    "fingerprint": fingerprint,
+                    "result": json.dumps(result),
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                },
+            )
+
+    def refresh(self, user_id, window_days):
+        """Clear the stale flag after the metrics fingerprint was found unchanged."""
+        with get_cache_write_engine().begin() as conn:
+            conn.execute(
+                text("UPDATE triage_cache SET stale = 0 WHERE user_id = :user_id AND window_days = :window_days"),
+                {"user_id": str(user_id), "window_days": window_days},
+            )
+
+
+# Default cache instance
+triage_cache = TriageCache()
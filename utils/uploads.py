@@ -0,0 +1,124 @@
+import os
+import re
+import shutil
+import zipfile
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+UPLOAD_SUFFIXES = (".csv", ".zip")
+COPY_BUFFER_BYTES = 1 << 20
+
+
+def _safe_name(filename):
+    """Base name only (no client-supplied directories), restricted to a safe character set."""
+    name = os.path.basename(filename.replace("\\", "/"))
+    return re.sub(r"[^A-Za-z0-9._-]", "_", name).lstrip(".")
+
+
+async def save_multipart_files(request, dest_dir, suffixes=UPLOAD_SUFFIXES):
+    """
+    Stream the file parts of a multipart/form-data request into `dest_dir`
+    as the body arrives: each chunk is written to its file immediately, so
+    no upload is held in memory or spooled to a temporary file first.
+    Non-file fields are ignored. Returns [{"name", "bytes"}]; raises
+    ValueError for a non-multipart body, a disallowed file type or a
+    duplicate file name (the partial upload is removed).
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise ValueError("Expected a multipart/form-data upload")
+
+    os.makedirs(dest_dir, exist_ok=True)
+    saved = []
+    part = {"headers": {}, "field": b"", "value": b"", "file": None}
+
+    def on_part_begin():
+        part.update(headers={}, field=b"", value=b"", file=None)
+
+    def on_header_field(data, start, end):
+        part["field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        part["value"] += data[start:end]
+
+    def on_header_end():
+        part["headers"][part["field"].decode("latin-1").lower()] = part["value"]
+        part["field"], part["value"] = b"", b""
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(part["headers"].get("content-disposition", b""))
+        filename = disposition.get(b"filename")
+        if filename is None:
+            return
+        name = _safe_name(filename.decode("utf-8", "replace"))
+        if not name.lower().endswith(suffixes):
+            raise ValueError(f"Unsupported file type: {name or filename!r} (expected {', '.join(suffixes)})")
+        if any(entry["name"] == name for entry in saved):
+            raise ValueError(f"Duplicate file name in upload: {name}")
+        part["file"] = open(os.path.join(dest_dir, name), "wb")
+        saved.append({"name": name, "bytes": 0})
+
+    def on_part_data(data, start, end):
+        if part["file"] is not None:
+            part["file"].write(data[start:end])
+            saved[-1]["bytes"] += end - start
+
+    def on_part_end():
+        if part["file"] is not None:
+            part["file"].close()
+            part["file"] = None
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+        parser.finalize()
+    except Exception:
+        if part["file"] is not None:
+            part["file"].close()
+        shutil.rmtree(dest_dir, ignore_errors=True)
+        raise
+    return saved
+
+
+def extract_csv_members(upload_dir, wanted):
+    """
+    Unpack the CSVs named in `wanted` from every ZIP in `upload_dir`,
+    streaming each member to disk. Members are flattened to their base name
+    (no path traversal); each archive folder gets its own zero-padded
+    numbered subdirectory so same-named files from different export periods
+    do not collide. Returns the sorted directories that contain wanted CSVs
+    (by archive name, then folder name), `upload_dir` itself first when CSVs
+    were uploaded directly.
+    """
+    directories = set()
+    if any(name in wanted for name in os.listdir(upload_dir)):
+        directories.add(upload_dir)
+    for archive in sorted(name for name in os.listdir(upload_dir) if name.lower().endswith(".zip")):
+        with zipfile.ZipFile(os.path.join(upload_dir, archive)) as zf:
+            members = [
+                (member, *os.path.split(member.filename.replace("\\", "/")))
+                for member in zf.infolist()
+                if not member.is_dir()
+            ]
+            members = [(member, folder, name) for member, folder, name in members if name in wanted]
+            # Numbered in folder-name order; zero-padded so the returned order matches past nine folders.
+            folders = {folder: i for i, folder in enumerate(sorted({folder for _, folder, _ in members}), 1)}
+            for member, folder, name in members:
+                target_dir = os.path.join(upload_dir, f"{archive[:-4]}_{folders[folder]:03d}")
+                os.makedirs(target_dir, exist_ok=True)
+                with zf.open(member) as src, open(os.path.join(target_dir, name), "wb") as dst:
+                    shutil.copyfileobj(src, dst, COPY_BUFFER_BYTES)
+                directories.add(target_dir)
+    return sorted(directories)
@@ -0,0 +1,81 @@
+import numpy as np
+
+
+def detect_speech_regions(
+    speech,
+    sr=16000,
+    frame_ms=30,
+    margin_db=12.0,
+    min_speech_s=0.25,
+    min_silence_s=0.6,
+    pad_s=0.2,
+):
+    """
+    Energy-based voice activity detection.
+
+    Frames are marked voiced when their log energy is `margin_db` above the
+    recording's noise floor (10th percentile of frame energy). Gaps shorter
+    than `min_silence_s` are bridged, blips shorter than `min_speech_s` are
+    dropped and every region is padded by `pad_s` on both sides.
+    Returns a list of (start_sample, end_sample) speech regions.
+    """
+    frame = int(sr * frame_ms / 1000)
+    n_frames = len(speech) // frame
+    if n_frames < 2:
+        return [(0, len(speech))] if len(speech) else []
+
+    frames = np.asarray(speech[: n_frames * frame], dtype=np.float32).reshape(n_frames, frame)
+    energy_db = 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+    noise_floor = np.percentile(energy_db, 10)
+    # Cap the margin at half the dynamic range so near-continuous speech is not clipped.
+    threshold = noise_floor + min(margin_db, 0.5 * (np.percentile(energy_db, 95) - noise_floor))
+    voiced = energy_db > threshold
+    if not voiced.any():
+        return []
+
+    # Run boundaries of the voiced mask, in frames.
+    edges = np.diff(np.concatenate([[0], voiced.astype(np.int8), [0]]))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    frame_s = frame / sr
+    regions = []
+    for start, end in zip(starts, ends):
+        if regions and (start - regions[-1][1]) * frame_s < min_silence_s:
+            regions[-1][1] = end
+        else:
+            regions.append([start, end])
+
+    pad = int(pad_s * sr)
+    merged = []
+    for start, end in regions:
+        if (end - start) * frame_s < min_speech_s:
+            continue
+        s = max(0, start * frame - pad)
+        e = min(len(speech), end * frame + pad)
+        if merged and s <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], e)
+        else:
+            merged.append((s, e))
+    return merged
+
+
+class SpeechMap:
+    """Maps times on the compacted (speech-only) timeline back to the original recording."""
+
+    def __init__(self, regions, sr=16000):
+        lengths = np.array([e - s for s, e in regions], dtype=np.int64)
+        self.compact_starts = np.concatenate([[0], np.cumsum(lengths)[:-1]]) / sr
+        self.original_starts = np.array([s for s, _ in regions], dtype=np.float64) / sr
+
+    def to_original(self, t):
+        i = max(0, int(np.searchsorted(self.compact_starts, t, side="right")) - 1)
+        return round(float(self.original_starts[i] + t - self.compact_starts[i]), 2)
+
+
+def compact_speech(speech, regions, sr=16000):
+    """Concatenate the speech regions; returns (compact_waveform, SpeechMap)."""
+    if not regions:
+        return np.zeros(0, dtype=np.float32), None
+    compact = np.concatenate([np.asarray(speech[s:e], dtype=np.float32) for s, e in regions])
+    return compact, SpeechMap(regions, sr)